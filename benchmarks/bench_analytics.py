@@ -0,0 +1,75 @@
+"""
+Benchmarks the incremental rolling analytics of stock_data_visualizer.
+
+Times every indicator over 16 random walk price series of growing history
+length, up to 50 years of daily bars, and prints the results as JSON. The time
+per bar stays flat when the indicators scale linearly.
+"""
+
+import json
+import time
+import pathlib
+import argparse
+import numpy as np
+
+from synthetic import random_walk_prices
+
+from analytics import INDICATORS, TRADING_DAYS_PER_YEAR, AnalyticsEngine
+
+
+def bench_history(tickers, years, append_bars):
+    bars = years * TRADING_DAYS_PER_YEAR
+    prices = random_walk_prices(tickers, bars)
+    dates = np.arange(bars).astype("datetime64[D]")
+
+    results = []
+    for label in INDICATORS:
+        engine = AnalyticsEngine({label: INDICATORS[label]})
+
+        start = time.perf_counter()
+        for n in range(tickers):
+            engine.append(n, dates, prices[:, n])
+        full_time = time.perf_counter() - start
+
+        # Appending a few new bars costs the same regardless of the history
+        new_dates = dates[-1] + np.arange(1, append_bars + 1)
+        start = time.perf_counter()
+        for n in range(tickers):
+            engine.append(n, new_dates, prices[-append_bars:, n])
+        append_time = time.perf_counter() - start
+
+        results.append(
+            {
+                "indicator": label,
+                "tickers": tickers,
+                "years": years,
+                "bars": bars * tickers,
+                "seconds": full_time,
+                "ns_per_bar": 1e9 * full_time / (bars * tickers),
+                "append_bars": append_bars * tickers,
+                "append_seconds": append_time,
+            }
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=16)
+    parser.add_argument("--years", type=int, nargs="+", default=[5, 10, 25, 50])
+    parser.add_argument("--append-bars", type=int, default=5)
+    parser.add_argument("--output", type=pathlib.Path, default=None)
+    args = parser.parse_args()
+
+    results = []
+    for years in args.years:
+        results.extend(bench_history(args.tickers, years, args.append_bars))
+
+    report = json.dumps({"benchmark": "analytics", "results": results}, indent=2)
+    if args.output is not None:
+        args.output.write_text(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Benchmarks fetching stock data from a throttling source.
+
+Fetches the intraday bars of a watchlist from StubChartServer, a local stand-in
+for the Yahoo chart API that answers requests beyond its rate with 429. Every
+scheduler setting is run by one draw and by several concurrent draws of the
+same watchlist: sending every request once, retrying with backoff, and
+retrying behind a rate limit. Prints how long every run took, how many tickers
+failed and how many requests the server saw, as JSON.
+"""
+
+import json
+import time
+import pathlib
+import argparse
+import threading
+from datetime import datetime
+
+from synthetic import synthetic_tickers
+from stub_server import StubChartServer
+
+from handling import FetchScheduler, StockDataHandling
+from providers import YahooProvider
+from time_frames import StockTimeFrame
+from tracing import enable_tracing, disable_tracing
+
+
+DEFAULT_END_DATE = datetime(2024, 12, 31, 16)
+
+
+def fetch(server, scheduler, tickers, draws, end_time):
+    """
+    Returns the results of fetching the tickers from the server by the given
+    number of concurrent draws
+    """
+    sdh = StockDataHandling(
+        provider=YahooProvider(chart_url=server.chart_url),
+        memory_budget=None,
+        scheduler=scheduler,
+    )
+    server.counters.clear()
+    tracer = enable_tracing()
+    results = []
+
+    def draw():
+        results.append(sdh.get_many(tickers, StockTimeFrame.WEEK, end_time=end_time))
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=draw) for _ in range(draws)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    counters = tracer.get_counters()
+    disable_tracing()
+
+    errors = [result.error for fetched in results for result in fetched.values() if not result.ok]
+    return {
+        "seconds": seconds,
+        "failed": len(errors),
+        "error_kinds": sorted({error.kind for error in errors}),
+        "server_requests": server.counters["requests"],
+        "server_throttled": server.counters["throttled"],
+        "retries": counters.get("request_retries", 0),
+        "coalesced": counters.get("requests_coalesced", 0),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tickers", type=int, default=64)
+    parser.add_argument("--draws", type=int, default=4, help="concurrent draws of the watchlist")
+    parser.add_argument(
+        "--server-rate", type=float, default=20.0, help="requests per second the server answers"
+    )
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds per request")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--end-date", type=datetime.fromisoformat, default=DEFAULT_END_DATE)
+    parser.add_argument("--output", type=pathlib.Path, default=None)
+    args = parser.parse_args()
+
+    tickers = synthetic_tickers(args.tickers)
+    schedulers = {
+        "single attempt": lambda: FetchScheduler(max_attempts=1),
+        "retries": lambda: FetchScheduler(),
+        "rate limited retries": lambda: FetchScheduler(rate=args.server_rate, burst=4),
+    }
+
+    results = []
+    with StubChartServer(
+        rate=args.server_rate, latency=args.latency, failure_rate=args.failure_rate
+    ) as server:
+        for label, create_scheduler in schedulers.items():
+            for draws in sorted({1, args.draws}):
+                result = fetch(server, create_scheduler(), tickers, draws, args.end_date)
+                results.append(
+                    {"scheduler": label, "tickers": args.tickers, "draws": draws, **result}
+                )
+
+    report = json.dumps(
+        {
+            "benchmark": "fetching",
+            "parameters": {
+                "server_rate": args.server_rate,
+                "latency": args.latency,
+                "failure_rate": args.failure_rate,
+            },
+            "results": results,
+        },
+        indent=2,
+    )
+    if args.output is not None:
+        args.output.write_text(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Benchmarks the cold start of the stock_data_visualizer GUI.
+
+Every run starts a fresh interpreter, so nothing is shared between the runs.
+Measures the import time of the GUI modules with -X importtime, the time until
+the main window has been painted and the time until the data and plot stack
+has been warmed up in the background, then prints the results as JSON.
+"""
+
+import os
+import sys
+import json
+import time
+import pathlib
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+PACKAGE_DIR = pathlib.Path(__file__).resolve().parents[1] / "stock_data_visualizer"
+
+# Modules that shouldn't be loaded before the main window is shown
+HEAVY_MODULES = (
+    "pandas",
+    "pandas_datareader",
+    "matplotlib",
+    "matplotlib.backends.backend_qtagg",
+)
+
+FIRST_WINDOW_SCRIPT = """
+import sys, json, time
+start = time.perf_counter()
+sys.path.insert(0, {package_dir!r})
+
+from PySide2.QtCore import QTimer
+from PySide2.QtWidgets import QApplication
+import visualizing
+
+app = QApplication(sys.argv)
+window = visualizing.MainWindow(app, "Benchmark", None, {config_file!r}, {cache_file!r})
+window.show()
+
+
+def on_shown():
+    shown = time.perf_counter() - start
+    loaded = [module for module in {heavy_modules!r} if module in sys.modules]
+    visualizing.warm_up_modules().join()
+    warmed_up = time.perf_counter() - start
+    print(json.dumps([shown, warmed_up, loaded]), flush=True)
+    app.quit()
+
+
+# Runs once the event loop has painted the window
+QTimer.singleShot(0, on_shown)
+app.exec_()
+"""
+
+
+def run_python(args, env):
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=PACKAGE_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def bench_import_time(env):
+    """
+    Returns the import time of the GUI modules and the modules taking the most
+    time of their own, in seconds
+    """
+    result = run_python(["-X", "importtime", "-c", "import __cli__, visualizing"], env)
+
+    total, self_times = 0.0, {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_time, cumulative, name = line[len("import time:") :].split("|")
+        self_times[name.strip()] = int(self_time) / 1e6
+        # Nested imports are indented, top level imports include them
+        if not name.startswith("  "):
+            total += int(cumulative) / 1e6
+
+    slowest = sorted(self_times.items(), key=lambda item: item[1], reverse=True)[:10]
+    return total, dict(slowest)
+
+
+def bench_first_window(env, work_dir):
+    script = FIRST_WINDOW_SCRIPT.format(
+        package_dir=str(PACKAGE_DIR),
+        config_file=str(work_dir / "configuration.conf"),
+        cache_file=str(work_dir / "stock_data.sqlite"),
+        heavy_modules=HEAVY_MODULES,
+    )
+    start = time.perf_counter()
+    result = run_python(["-c", script], env)
+    process_time = time.perf_counter() - start
+    shown, warmed_up, loaded = json.loads(result.stdout.strip().splitlines()[-1])
+    return process_time, shown, warmed_up, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--platform", default="offscreen", help="QT_QPA_PLATFORM of the runs"
+    )
+    parser.add_argument("--output", type=pathlib.Path, default=None)
+    args = parser.parse_args()
+
+    env = dict(os.environ, QT_QPA_PLATFORM=args.platform)
+
+    import_times, slowest_imports = [], {}
+    first_windows = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for _ in range(args.runs):
+            import_time, slowest_imports = bench_import_time(env)
+            import_times.append(import_time)
+            first_windows.append(bench_first_window(env, pathlib.Path(work_dir)))
+
+    results = {
+        "runs": args.runs,
+        "import_seconds": statistics.median(import_times),
+        "slowest_imports": slowest_imports,
+        # Whole runs, including interpreter startup and shutdown
+        "process_seconds": statistics.median(run[0] for run in first_windows),
+        "time_to_first_window_seconds": statistics.median(run[1] for run in first_windows),
+        "time_to_warm_up_seconds": statistics.median(run[2] for run in first_windows),
+        "heavy_modules_before_window": first_windows[-1][3],
+    }
+
+    report = json.dumps({"benchmark": "startup", "results": results}, indent=2)
+    if args.output is not None:
+        args.output.write_text(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,471 @@
+"""
+Benchmarks the draw path of stock_data_visualizer on synthetic stock data.
+
+Covers converting time frames to dates, fetching, aligning and normalizing the
+stock data, comparing it to an index, analyzing its profits and correlations,
+exporting it, drawing it with every graph layout, rendering it with the render
+server and loading and saving the user configuration, for every combination
+of ticker count and time frame. Stock data comes from the deterministic
+SyntheticProvider instead of Yahoo, so runs are comparable. Prints the results
+as JSON, --compare prints how they changed against the JSON of an earlier run.
+"""
+
+import os
+import sys
+import json
+import time
+import pathlib
+import argparse
+import platform
+import tempfile
+import statistics
+from datetime import datetime
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from synthetic import SyntheticProvider, synthetic_tickers
+
+import numpy as np
+import pandas as pd
+import matplotlib
+from PySide2 import __version__ as pyside_version
+from PySide2.QtWidgets import QApplication
+
+from handling import MAX_FETCH_WORKERS, FetchScheduler, StockDataHandling
+from store import DEFAULT_MEMORY_BUDGET, PRICE_DTYPES
+from panel import PricePanel
+from profit import analyze_profit
+from correlation import CorrelationMatrix, cluster_order
+from charting import GRAPH_LAYOUTS, LEGEND_GRAPHS, MAX_SINGLE_CHART_STOCKS, RenderedGraph
+from rendering import ChartJob, render_chart_rgba
+from render_server import RenderServer
+from exporting import EXPORT_FORMATS, export_stock_data
+from normalization import NormalizationMode
+from time_frames import StockTimeFrame, get_available_time_frames
+from visualizing import MainWindow
+
+
+# Time frames end here, so every run reads the same bars
+DEFAULT_END_DATE = "2024-12-31"
+CANVAS_SIZE = (900, 600)
+COMPARISON_INDEX = "^GSPC"
+
+
+def timed(function, repeat):
+    """
+    Returns the median time of calling function repeat times, in seconds, and
+    what its last call returned
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), value
+
+
+def result(name, params, seconds, **extra):
+    return {"name": name, "params": params, "seconds": seconds, **extra}
+
+
+def bench_time_frames(sdh, end_time, calls):
+    results = []
+    for label in get_available_time_frames():
+        if label == "Custom":
+            continue
+        time_frame = StockTimeFrame.from_str(label)
+        seconds, _ = timed(
+            lambda: [sdh.convert_time_frame_to_datetime(time_frame, end_time) for _ in range(calls)],
+            repeat=5,
+        )
+        results.append(
+            result(
+                "convert_time_frame_to_datetime",
+                {"time_frame": label},
+                seconds,
+                ns_per_call=1e9 * seconds / calls,
+            )
+        )
+    return results
+
+
+def bench_data(sdh, provider, tickers, label, end_time, repeat, max_workers):
+    """
+    Returns the results of fetching, aligning and normalizing the stock data of
+    tickers, and the fetched stock data
+    """
+    params = {"tickers": len(tickers), "time_frame": label}
+    time_frame = StockTimeFrame.from_str(label)
+
+    def get_many(clear_store):
+        if clear_store and sdh.store is not None:
+            sdh.store.clear()
+        return sdh.get_many(tickers, time_frame, max_workers, end_time=end_time)
+
+    provider.requests = 0
+    seconds, fetched = timed(lambda: get_many(True), repeat)
+    stock_frames = {ticker: fetched[ticker].data for ticker in tickers if fetched[ticker].ok}
+    bars = sum(len(stock_df) for stock_df in stock_frames.values())
+    results = [
+        result(
+            "get_many",
+            params,
+            seconds,
+            bars=bars,
+            failed=len(tickers) - len(stock_frames),
+            requests=provider.requests // repeat,
+        )
+    ]
+
+    # Fetches of stock data kept in memory don't read it again
+    if sdh.store is not None:
+        requests = provider.requests
+        seconds, _ = timed(lambda: get_many(False), repeat)
+        results.append(
+            result(
+                "get_many_stored",
+                params,
+                seconds,
+                requests=provider.requests - requests,
+                store_bytes=sdh.store.nbytes,
+            )
+        )
+
+    # The concatenated frame is what the graphs were drawn from before PricePanel
+    seconds, stock_data_df = timed(
+        lambda: pd.concat(
+            [stock_df["Close"].rename(ticker) for ticker, stock_df in stock_frames.items()],
+            axis=1,
+        ),
+        repeat,
+    )
+    results.append(result("concat", params, seconds, bars=bars))
+
+    seconds, _ = timed(lambda: sdh.normalize_stock_data(stock_data_df), repeat)
+    results.append(result("normalize_stock_data", params, seconds, bars=bars))
+
+    seconds, price_panel = timed(lambda: PricePanel.from_frames(stock_frames), repeat)
+    results.append(result("PricePanel.from_frames", params, seconds, bars=bars))
+
+    # The index is fetched by the first comparison only, the rest share it
+    requests = provider.requests
+    seconds, comparison = timed(
+        lambda: sdh.get_index_comparison(COMPARISON_INDEX, time_frame, end_time), repeat
+    )
+    results.append(
+        result(
+            "get_index_comparison",
+            params,
+            seconds,
+            requests=provider.requests - requests,
+        )
+    )
+    seconds, _ = timed(lambda: comparison.compare(price_panel), repeat)
+    results.append(result("IndexComparison.compare", params, seconds, bars=bars))
+
+    seconds, _ = timed(lambda: analyze_profit(price_panel), repeat)
+    results.append(result("analyze_profit", params, seconds, bars=bars))
+
+    def correlate():
+        matrix = CorrelationMatrix()
+        matrix.add_many({ticker: price_panel.valid_column(ticker) for ticker in price_panel.tickers})
+        return cluster_order(matrix.correlations())
+
+    seconds, _ = timed(correlate, repeat)
+    results.append(result("correlate", params, seconds, bars=bars))
+
+    for mode in NormalizationMode:
+        if mode == NormalizationMode.RELATIVE:
+            continue
+        seconds, _ = timed(lambda: price_panel.normalized(mode), repeat)
+        results.append(
+            result("PricePanel.normalized", {**params, "mode": mode.name}, seconds, bars=bars)
+        )
+    return results, stock_frames
+
+
+def bench_draw(stock_frames, ticker_count, label, repeat):
+    """
+    Returns the results of drawing the stock data with every graph layout,
+    failed tickers are left out like they are by the GUI
+    """
+    results = []
+    stock_panels = {
+        ticker: PricePanel.from_frames({ticker: stock_df})
+        for ticker, stock_df in stock_frames.items()
+    }
+    tickers = list(stock_panels)
+
+    for layout, graph_class in GRAPH_LAYOUTS.items():
+        if graph_class in LEGEND_GRAPHS and len(tickers) > MAX_SINGLE_CHART_STOCKS:
+            continue
+        if graph_class is RenderedGraph:
+            # Rendered charts are measured by bench_render
+            continue
+        graph = graph_class()
+        graph.canvas.resize(*CANVAS_SIZE)
+
+        def draw():
+            graph.begin_draw(tickers)
+            for ticker, stock_panel in stock_panels.items():
+                graph.add_stock(ticker, stock_panel)
+            graph.canvas.draw()
+
+        def draw_from_scratch():
+            graph.begin_draw([])
+            draw()
+
+        params = {"tickers": ticker_count, "time_frame": label, "layout": layout}
+        seconds, _ = timed(draw_from_scratch, repeat)
+        results.append(result("draw", params, seconds))
+        # Redraws of the same stocks update the existing artists in place
+        seconds, _ = timed(draw, repeat)
+        results.append(result("redraw", params, seconds))
+    return results
+
+
+def bench_render(server, stock_frames, ticker_count, label, repeat, charts):
+    """
+    Returns the results of rendering the chart of the stock data to pixels in
+    this process and of rendering several charts with the render server
+    """
+    width, height = CANVAS_SIZE
+    job = ChartJob(None, label, PricePanel.from_frames(stock_frames))
+    buffers = [server.create_buffer(width, height) for _ in range(charts)]
+
+    def render_parallel():
+        for future in [server.render(job, buffer) for buffer in buffers]:
+            future.result()
+
+    try:
+        # Workers import matplotlib when they start, which isn't measured
+        render_parallel()
+        params = {"tickers": ticker_count, "time_frame": label}
+        seconds, _ = timed(
+            lambda: render_chart_rgba(job, buffers[0].name, width, height), repeat
+        )
+        results = [result("render_chart_rgba", params, seconds)]
+        seconds, _ = timed(render_parallel, repeat)
+        results.append(result("render_server", {**params, "charts": charts}, seconds))
+    finally:
+        for buffer in buffers:
+            server.release_buffer(buffer)
+    return results
+
+
+def bench_export(sdh, tickers, label, end_time, repeat, work_dir, export_formats):
+    """
+    Returns the results of exporting the stock data of tickers in every format,
+    the stock data is already in memory when the store keeps it
+    """
+    params = {"tickers": len(tickers), "time_frame": label}
+    time_frame = StockTimeFrame.from_str(label)
+    suffixes = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv.gz"}
+    results = []
+    for export_format in export_formats:
+        output_file = work_dir / f"export{suffixes[export_format]}"
+
+        def export():
+            for _ in export_stock_data(
+                sdh,
+                tickers,
+                time_frame,
+                output_file,
+                normalization=NormalizationMode.REBASED,
+                end_time=end_time,
+            ):
+                pass
+
+        seconds, _ = timed(export, repeat)
+        results.append(
+            result(
+                "export",
+                {**params, "format": export_format},
+                seconds,
+                bytes=output_file.stat().st_size,
+            )
+        )
+        output_file.unlink()
+    return results
+
+
+def bench_config(app, tickers, work_dir, repeat):
+    config_file = str(work_dir / f"configuration_{len(tickers)}.conf")
+    with open(config_file, "w") as file:
+        file.writelines("%s\n" % ticker for ticker in tickers)
+
+    window = MainWindow(app, "Benchmark", None, config_file, None)
+    stock_list = window._custom_list_widget
+
+    def load():
+        stock_list.model.clear()
+        window._init_stock_list(window._check_user_config())
+
+    params = {"tickers": len(tickers)}
+    seconds, _ = timed(load, repeat)
+    results = [result("config_load", params, seconds)]
+    seconds, _ = timed(window._save_user_config, repeat)
+    results.append(result("config_save", params, seconds))
+    window.deleteLater()
+    return results
+
+
+def get_environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "matplotlib": matplotlib.__version__,
+        "pyside2": pyside_version,
+    }
+
+
+def result_key(entry):
+    return entry["name"], json.dumps(entry["params"], sort_keys=True)
+
+
+def compare(baseline, report):
+    """
+    Prints the time of every result relative to the same result of baseline
+    """
+    baseline_results = {result_key(entry): entry for entry in baseline["results"]}
+    for entry in report["results"]:
+        before = baseline_results.get(result_key(entry))
+        if before is None or not before["seconds"]:
+            continue
+        params = ", ".join(f"{key}={value}" for key, value in entry["params"].items())
+        ratio = entry["seconds"] / before["seconds"]
+        print(
+            f"{entry['name']:<32} {params:<60} "
+            f"{before['seconds']:>10.6f}s -> {entry['seconds']:>10.6f}s  x{ratio:.2f}",
+            file=sys.stderr,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tickers", type=int, nargs="+", default=[1, 16, 128])
+    parser.add_argument(
+        "--time-frames",
+        nargs="+",
+        default=["1 Year", "5 Years", "Max"],
+        choices=[label for label in get_available_time_frames() if label != "Custom"],
+        help="time frames, i.e., history lengths of the stock data",
+    )
+    parser.add_argument("--end-date", type=datetime.fromisoformat, default=DEFAULT_END_DATE)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per request")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--max-attempts",
+        type=int,
+        default=1,
+        help="times a failed request is sent, synthetic failures fail again on every attempt",
+    )
+    parser.add_argument("--workers", type=int, default=MAX_FETCH_WORKERS, help="fetch workers")
+    parser.add_argument(
+        "--memory-budget",
+        type=float,
+        default=DEFAULT_MEMORY_BUDGET / 2**20,
+        help="MiB of stock data kept in memory, negative keeps nothing",
+    )
+    parser.add_argument("--price-dtype", choices=PRICE_DTYPES, default=PRICE_DTYPES[0])
+    parser.add_argument("--no-draw", action="store_true", help="skip the graph benchmarks")
+    parser.add_argument(
+        "--render-charts",
+        type=int,
+        default=4,
+        help="charts rendered at once by the render server, 0 skips it",
+    )
+    parser.add_argument(
+        "--export-formats",
+        nargs="*",
+        default=["parquet", "arrow"],
+        choices=EXPORT_FORMATS,
+        help="formats the stock data is exported to, CSV takes long for long time frames",
+    )
+    parser.add_argument("--output", type=pathlib.Path, default=None)
+    parser.add_argument(
+        "--compare", type=pathlib.Path, default=None, help="JSON of an earlier run"
+    )
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+    provider = SyntheticProvider(args.seed, args.latency, args.failure_rate)
+    sdh = StockDataHandling(
+        provider=provider,
+        memory_budget=int(args.memory_budget * 2**20) if args.memory_budget >= 0 else None,
+        price_dtype=args.price_dtype,
+        scheduler=FetchScheduler(max_attempts=args.max_attempts),
+    )
+
+    render_server = RenderServer() if args.render_charts > 0 else None
+
+    results = bench_time_frames(sdh, args.end_date, calls=10000)
+    with tempfile.TemporaryDirectory() as work_dir:
+        for ticker_count in args.tickers:
+            tickers = synthetic_tickers(ticker_count)
+            for label in args.time_frames:
+                data_results, stock_frames = bench_data(
+                    sdh, provider, tickers, label, args.end_date, args.repeat, args.workers
+                )
+                results.extend(data_results)
+                results.extend(
+                    bench_export(
+                        sdh,
+                        tickers,
+                        label,
+                        args.end_date,
+                        args.repeat,
+                        pathlib.Path(work_dir),
+                        args.export_formats,
+                    )
+                )
+                if not args.no_draw:
+                    results.extend(bench_draw(stock_frames, ticker_count, label, args.repeat))
+                if render_server is not None:
+                    results.extend(
+                        bench_render(
+                            render_server,
+                            stock_frames,
+                            ticker_count,
+                            label,
+                            args.repeat,
+                            args.render_charts,
+                        )
+                    )
+            results.extend(bench_config(app, tickers, pathlib.Path(work_dir), args.repeat))
+    if render_server is not None:
+        render_server.shutdown()
+
+    report = {
+        "benchmark": "suite",
+        "environment": get_environment(),
+        "parameters": {
+            "tickers": args.tickers,
+            "time_frames": args.time_frames,
+            "end_date": args.end_date.date().isoformat(),
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "latency": args.latency,
+            "failure_rate": args.failure_rate,
+            "max_attempts": args.max_attempts,
+            "memory_budget": args.memory_budget,
+            "price_dtype": args.price_dtype,
+        },
+        "results": results,
+    }
+    if args.compare is not None:
+        compare(json.loads(args.compare.read_text()), report)
+
+    report = json.dumps(report, indent=2)
+    if args.output is not None:
+        args.output.write_text(report)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
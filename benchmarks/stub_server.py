@@ -0,0 +1,155 @@
+"""
+Local stand-in for the Yahoo chart API, serving synthetic stock data.
+
+StubChartServer answers chart requests with the synthetic daily bars of the
+ticker, whatever the interval asked for, and throttles clients like Yahoo does:
+requests beyond the allowed rate are answered with 429 Too Many Requests and a
+Retry-After header. Unknown tickers get 404 and a share of the requests can be
+made to fail with 503.
+"""
+
+import json
+import time
+import zlib
+import threading
+import collections
+import urllib.parse
+import pandas as pd
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from synthetic import synthetic_ohlcv
+
+
+CHART_PATH = "/v8/finance/chart/"
+
+
+class StubChartServer:
+    """
+    Chart API server on a free local port, running in a background thread
+    while used as a context manager.
+
+    rate is the number of requests per second answered before the server
+    throttles, None answers all of them. Requests wait for latency seconds
+    and fail with the probability failure_rate. Tickers not starting with
+    ticker_prefix are unknown.
+    """
+
+    def __init__(
+        self, rate=None, retry_after=1, latency=0.0, failure_rate=0.0, ticker_prefix="SYN", seed=0
+    ):
+        self.rate = rate
+        self.retry_after = retry_after
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.ticker_prefix = ticker_prefix
+        self.seed = seed
+        self.counters = collections.Counter()
+        self._answered = collections.deque()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _create_handler(self))
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def chart_url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}{CHART_PATH}{{}}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def is_throttled(self):
+        # Requests answered during the last second are counted against the rate
+        if self.rate is None:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            while self._answered and self._answered[0] <= now - 1.0:
+                self._answered.popleft()
+            if len(self._answered) >= self.rate:
+                return True
+            self._answered.append(now)
+            return False
+
+    def respond(self, path, query):
+        """
+        Returns the HTTP status, headers and JSON body answering a request
+        """
+        self.count("requests")
+        if self.is_throttled():
+            self.count("throttled")
+            return 429, {"Retry-After": str(self.retry_after)}, {"error": "Too Many Requests"}
+
+        if self.latency > 0.0:
+            time.sleep(self.latency)
+        if not path.startswith(CHART_PATH):
+            return 404, {}, {"error": "Not Found"}
+        ticker = urllib.parse.unquote(path[len(CHART_PATH) :])
+        start = pd.Timestamp(int(query["period1"][0]), unit="s")
+        end = pd.Timestamp(int(query["period2"][0]), unit="s")
+
+        # Failures are decided by the request and its number, retries can pass
+        request = f"{self.seed}:{ticker}:{start:%Y-%m-%d}:{self.counters['requests']}"
+        if zlib.crc32(request.encode()) / 2**32 < self.failure_rate:
+            self.count("failed")
+            return 503, {}, {"error": "Service Unavailable"}
+        if not ticker.startswith(self.ticker_prefix):
+            self.count("not_found")
+            body = {"chart": {"result": None, "error": {"description": "No data found"}}}
+            return 404, {}, body
+
+        self.count("answered")
+        return 200, {}, {"chart": {"result": [chart_result(ticker, start, end, self.seed)]}}
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+
+def chart_result(ticker, start_time, end_time, seed=0):
+    """
+    Returns the synthetic daily bars of ticker as a chart API result
+    """
+    bars_df = synthetic_ohlcv(ticker, start_time, end_time, seed)
+    return {
+        "meta": {"symbol": ticker, "gmtoffset": 0},
+        "timestamp": (bars_df.index.values.astype("datetime64[s]").astype("int64")).tolist(),
+        "indicators": {
+            "quote": [
+                {
+                    "open": bars_df["Open"].tolist(),
+                    "high": bars_df["High"].tolist(),
+                    "low": bars_df["Low"].tolist(),
+                    "close": bars_df["Close"].tolist(),
+                    "volume": bars_df["Volume"].tolist(),
+                }
+            ]
+        },
+    }
+
+
+def _create_handler(server):
+    class ChartRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            status, headers, body = server.respond(url.path, urllib.parse.parse_qs(url.query))
+            content = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(content)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(content)
+
+        def log_message(self, format, *args):
+            pass
+
+    return ChartRequestHandler
@@ -0,0 +1,116 @@
+"""
+Deterministic synthetic market data for the benchmarks of stock_data_visualizer.
+
+SyntheticProvider stands in for pdd.DataReader: it returns daily OHLCV bars in
+the layout Yahoo gives, optionally with a latency and a failure rate per
+request. The bars of a ticker only depend on the seed and the ticker, so any
+two requests overlapping in time agree on the bars they share.
+"""
+
+import sys
+import time
+import zlib
+import pathlib
+import threading
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1] / "stock_data_visualizer"))
+
+from handling import MIN_READABLE_YEAR
+from providers import StockDataProvider, register_provider
+
+
+# Every synthetic history starts here, requests are slices of it
+ORIGIN = pd.Timestamp(MIN_READABLE_YEAR, 1, 1)
+
+
+def ticker_seed(ticker, seed=0):
+    return [seed, zlib.crc32(ticker.encode())]
+
+
+def random_walk_prices(tickers, bars, seed=0):
+    """
+    Returns a (bars, tickers) matrix of random walk close prices starting at 100
+    """
+    rng = np.random.default_rng(seed)
+    log_returns = rng.normal(0.0003, 0.02, size=(bars, tickers))
+    return 100.0 * np.exp(np.cumsum(log_returns, axis=0))
+
+
+def synthetic_ohlcv(ticker, start_time, end_time, seed=0):
+    """
+    Returns the daily OHLCV bars of ticker on the business days between
+    start_time and end_time, as a DataFrame like the ones of pdd.DataReader
+    """
+    start = max(pd.Timestamp(start_time).normalize(), ORIGIN)
+    end = pd.Timestamp(end_time).normalize()
+    if end < start:
+        return pd.DataFrame(
+            columns=["High", "Low", "Open", "Close", "Volume", "Adj Close"],
+            index=pd.DatetimeIndex([], name="Date"),
+        )
+
+    # The whole history up to end is generated, so slices don't depend on start
+    days = np.arange(ORIGIN.to_datetime64(), end.to_datetime64() + 1, dtype="datetime64[D]")
+    dates = pd.DatetimeIndex(days[np.is_busday(days)], name="Date")
+    rng = np.random.default_rng(ticker_seed(ticker, seed))
+    drift, volatility = rng.uniform(-0.0001, 0.0003), rng.uniform(0.008, 0.03)
+    noise = rng.standard_normal((len(dates), 4))
+
+    close = 100.0 * np.exp(np.cumsum(drift + volatility * noise[:, 0]))
+    open_ = np.empty_like(close)
+    open_[0] = 100.0
+    open_[1:] = close[:-1] * np.exp(0.25 * volatility * noise[1:, 1])
+    high = np.maximum(open_, close) * np.exp(0.5 * volatility * np.abs(noise[:, 2]))
+    low = np.minimum(open_, close) * np.exp(-0.5 * volatility * np.abs(noise[:, 3]))
+    volume = np.round(1e6 * np.exp(0.5 * noise[:, 2]))
+
+    first = dates.searchsorted(start)
+    return pd.DataFrame(
+        {
+            "High": high[first:],
+            "Low": low[first:],
+            "Open": open_[first:],
+            "Close": close[first:],
+            "Volume": volume[first:],
+            "Adj Close": close[first:],
+        },
+        index=dates[first:],
+    )
+
+
+@register_provider
+class SyntheticProvider(StockDataProvider):
+    """
+    Provider of synthetic stock data.
+
+    Every request waits for latency seconds and fails with the probability
+    failure_rate. Failures are decided by the request itself, so the same
+    requests fail on every run.
+    """
+
+    name = "synthetic"
+    source = "synthetic"
+
+    def __init__(self, seed=0, latency=0.0, failure_rate=0.0):
+        self.seed = seed
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def read(self, stock_ticker, start_time, end_time):
+        with self._lock:
+            self.requests += 1
+        if self.latency > 0.0:
+            time.sleep(self.latency)
+
+        request = f"{self.seed}:{stock_ticker}:{start_time:%Y-%m-%d}:{end_time:%Y-%m-%d}"
+        if zlib.crc32(request.encode()) / 2**32 < self.failure_rate:
+            raise IOError(f"Synthetic failure of '{stock_ticker}'")
+        return synthetic_ohlcv(stock_ticker, start_time, end_time, self.seed)
+
+
+def synthetic_tickers(count):
+    return [f"SYN{n:04d}" for n in range(count)]
@@ -6,3 +6,6 @@ This is the principal module of the stock_data_visualizer project.
 WINDOW_TITLE = "Stock Data Visualizer"
 VERSION_FILE = "VERSION"
 CONFIG_FILE = "configuration.conf"
+CACHE_FILE = "stock_data.sqlite"
+SYMBOL_INDEX_FILE = "symbols.npy"
+SESSION_DIR = "session"
@@ -5,11 +5,26 @@ CLI interface for stock_data_visualizer project.
 import io
 import os
 import sys
+import atexit
 import ctypes
 import pathlib
+import argparse
+from datetime import datetime
 
-from __base__ import WINDOW_TITLE, VERSION_FILE, CONFIG_FILE
-from visualizing import MainWindow, MainApplication
+from __base__ import (
+    WINDOW_TITLE,
+    VERSION_FILE,
+    CONFIG_FILE,
+    CACHE_FILE,
+    SYMBOL_INDEX_FILE,
+    SESSION_DIR,
+)
+from time_frames import StockTimeFrame, get_available_time_frames
+from analytics import get_available_indicators
+from normalization import NormalizationMode, get_available_normalization_modes
+from rendering import RENDER_FORMATS, create_chart_jobs, read_watchlist, render_charts
+from exporting import EXPORT_FORMATS, export_stock_data, get_export_file
+from tracing import enable_tracing
 
 
 def read_version(*paths, **kwargs):
@@ -57,25 +72,192 @@ def os_specific_adaptation() -> pathlib.Path:
     return project_user_data_dir
 
 
+def parse_arguments(args=None):
+    """
+    Parse command line arguments, the GUI is run unless charts are rendered or
+    stock data is exported
+    """
+    parser = argparse.ArgumentParser(description=WINDOW_TITLE)
+    parser.add_argument(
+        "--trace",
+        metavar="TRACE_FILE",
+        help="record a performance trace and save it as a Chrome trace file on exit",
+    )
+    replay_group = parser.add_argument_group("live replay")
+    replay_group.add_argument(
+        "--replay",
+        metavar="DIRECTORY",
+        help="read stock data from the recorded files of a directory and replay "
+        "their bars to live charts",
+    )
+    replay_group.add_argument(
+        "--replay-start",
+        type=datetime.fromisoformat,
+        help="time the replay starts at, e.g., 2024-12-30T09:30",
+    )
+    replay_group.add_argument(
+        "--replay-speed",
+        type=float,
+        default=1.0,
+        help="how many times faster than real time the bars are replayed",
+    )
+    render_group = parser.add_argument_group("headless rendering")
+    render_group.add_argument(
+        "--render",
+        nargs="+",
+        metavar="WATCHLIST",
+        help="render a chart of every watchlist file instead of running the GUI",
+    )
+    render_group.add_argument(
+        "--output-dir", default=".", help="directory the charts are written to"
+    )
+    render_group.add_argument("--format", choices=RENDER_FORMATS, default="png")
+    render_group.add_argument(
+        "--time-frame",
+        choices=[frame for frame in get_available_time_frames() if frame != "Custom"],
+        default="1 Year",
+    )
+    render_group.add_argument(
+        "--normalization",
+        choices=["None"] + get_available_normalization_modes(),
+        default="None",
+    )
+    render_group.add_argument("--indicator", choices=get_available_indicators())
+    render_group.add_argument(
+        "--end-date",
+        type=datetime.fromisoformat,
+        help="end the time frame at this date instead of now, e.g., 2024-12-31",
+    )
+    render_group.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="number of processes rendering the charts",
+    )
+    export_group = parser.add_argument_group(
+        "bulk export",
+        "exports use the time frame, normalization, indicator and end date options "
+        "of headless rendering",
+    )
+    export_group.add_argument(
+        "--export",
+        nargs="+",
+        metavar="WATCHLIST",
+        help="export the stock data of the watchlist files instead of running the GUI",
+    )
+    export_group.add_argument(
+        "--export-file",
+        default="stocks.parquet",
+        help="file the stock data is exported to, its suffix picks the format, "
+        "e.g., stocks.parquet, stocks.arrow or stocks.csv.gz, CSV is always gzipped",
+    )
+    export_group.add_argument(
+        "--export-format", choices=EXPORT_FORMATS, help="format regardless of the suffix"
+    )
+    arguments = parser.parse_args(args)
+    if arguments.replay and arguments.replay_start is None:
+        parser.error("--replay requires --replay-start")
+    return arguments
+
+
+def render(arguments, user_cache_file):
+    """
+    Render the charts of the given watchlists without a GUI
+    """
+    # The data stack is loaded only when there is something to render
+    from handling import StockDataHandling
+
+    pathlib.Path(arguments.output_dir).mkdir(parents=True, exist_ok=True)
+    jobs = create_chart_jobs(
+        StockDataHandling(cache_file=user_cache_file),
+        arguments.render,
+        StockTimeFrame.from_str(arguments.time_frame),
+        arguments.output_dir,
+        output_format=arguments.format,
+        normalization=NormalizationMode.from_str(arguments.normalization),
+        indicator=arguments.indicator,
+        end_time=arguments.end_date,
+    )
+    for output_file in render_charts(jobs, max_workers=arguments.workers):
+        print(f"Rendered {output_file}")
+
+
+def export(arguments, user_cache_file):
+    """
+    Export the stock data of the given watchlists without a GUI
+    """
+    from handling import StockDataHandling
+
+    stock_tickers = [
+        ticker for watchlist_file in arguments.export for ticker in read_watchlist(watchlist_file)
+    ]
+    results = export_stock_data(
+        StockDataHandling(cache_file=user_cache_file),
+        stock_tickers,
+        StockTimeFrame.from_str(arguments.time_frame),
+        arguments.export_file,
+        export_format=arguments.export_format,
+        normalization=NormalizationMode.from_str(arguments.normalization),
+        indicator=arguments.indicator,
+        end_time=arguments.end_date,
+    )
+    exported = 0
+    for result in results:
+        if result.ok:
+            exported += 1
+        else:
+            print(f"Couldn't read '{result.ticker}' stock data: {result.error}")
+    export_file = get_export_file(arguments.export_file, arguments.export_format)
+    print(f"Exported {exported} stocks to {export_file}")
+
+
 def main():
     """
     Main function
     """
+    arguments = parse_arguments()
+    if arguments.trace:
+        atexit.register(enable_tracing().export, arguments.trace)
 
     # Any and all operating system specific adaptation is done prior to running the app
     user_data_dir = os_specific_adaptation()
     user_config_file = user_data_dir / CONFIG_FILE
+    user_cache_file = user_data_dir / CACHE_FILE
+    user_symbol_index_file = user_data_dir / SYMBOL_INDEX_FILE
     print(f"Config file: {user_config_file}")
+    print(f"Cache file: {user_cache_file}")
+
+    if arguments.render:
+        render(arguments, user_cache_file)
+        return
+    if arguments.export:
+        export(arguments, user_cache_file)
+        return
 
     # Read version
     version = read_version(VERSION_FILE)
     print(f"App version: {version}")
 
-    # Run main application
+    provider = live_feed = None
+    if arguments.replay:
+        from providers import LocalFileProvider
+        from live import ReplayFeed
+
+        provider = LocalFileProvider(arguments.replay)
+        live_feed = ReplayFeed(provider, arguments.replay_start, arguments.replay_speed)
+
+    # Run main application, Qt is only loaded for the GUI
+    from visualizing import MainApplication
+
     MainApplication(
         title=WINDOW_TITLE,
         version=version,
         user_config_file=user_config_file,
+        user_cache_file=user_cache_file,
+        user_symbol_index_file=user_symbol_index_file,
+        provider=provider,
+        live_feed=live_feed,
+        user_session_dir=user_data_dir / SESSION_DIR,
         x=0,
         y=0,
     )
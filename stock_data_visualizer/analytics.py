@@ -0,0 +1,349 @@
+"""
+Rolling analytics of stock data.
+
+Every indicator keeps an incremental state with constant cost per bar, so new
+bars from the cache or a live feed are appended without recomputing the
+history. Missing values (NaN) are passed through without touching the state.
+"""
+
+import math
+import numpy as np
+from collections import deque
+
+
+TRADING_DAYS_PER_YEAR = 252
+
+
+class Indicator:
+    """
+    Base class of the incremental indicators
+    """
+
+    # Indicators in the scale of the price can share the axes of the price
+    price_scale = True
+
+    def update(self, value):
+        """
+        Feeds one bar to the indicator and returns the indicator value of it
+        """
+        raise NotImplementedError
+
+    def extend(self, values):
+        """
+        Feeds several bars to the indicator and returns their indicator values
+        """
+        values = np.asarray(values, dtype="float64")
+        result = np.empty(len(values))
+        update = self.update
+        for n, value in enumerate(values.tolist()):
+            result[n] = update(value)
+        return result
+
+
+class _RollingSums:
+    """
+    Sum and sum of squares of the last window values
+    """
+
+    def __init__(self, window):
+        if window < 1:
+            raise ValueError("Window has to be at least one bar")
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self.total_squares = 0.0
+
+    def push(self, value):
+        self.values.append(value)
+        self.total += value
+        self.total_squares += value * value
+        if len(self.values) > self.window:
+            dropped = self.values.popleft()
+            self.total -= dropped
+            self.total_squares -= dropped * dropped
+
+    def is_full(self):
+        return len(self.values) == self.window
+
+    def mean(self):
+        return self.total / len(self.values)
+
+    def std(self, ddof=1):
+        count = len(self.values)
+        if count <= ddof:
+            return math.nan
+        mean = self.total / count
+        variance = (self.total_squares - count * mean * mean) / (count - ddof)
+        return math.sqrt(max(variance, 0.0))
+
+
+class SimpleMovingAverage(Indicator):
+    """
+    Mean of the last window bars
+    """
+
+    def __init__(self, window):
+        self._sums = _RollingSums(window)
+
+    def update(self, value):
+        if math.isnan(value):
+            return math.nan
+        self._sums.push(value)
+        return self._sums.mean() if self._sums.is_full() else math.nan
+
+
+class ExponentialMovingAverage(Indicator):
+    """
+    Exponentially weighted mean with the smoothing factor 2 / (span + 1)
+    """
+
+    def __init__(self, span):
+        if span < 1:
+            raise ValueError("Span has to be at least one bar")
+        self._alpha = 2.0 / (span + 1.0)
+        self._average = None
+
+    def update(self, value):
+        if math.isnan(value):
+            return math.nan
+        if self._average is None:
+            self._average = value
+        else:
+            self._average += self._alpha * (value - self._average)
+        return self._average
+
+
+class RollingStd(Indicator):
+    """
+    Sample standard deviation of the last window bars
+    """
+
+    price_scale = False
+
+    def __init__(self, window, ddof=1):
+        self._sums = _RollingSums(window)
+        self._ddof = ddof
+
+    def update(self, value):
+        if math.isnan(value):
+            return math.nan
+        self._sums.push(value)
+        return self._sums.std(self._ddof) if self._sums.is_full() else math.nan
+
+
+class RollingVolatility(Indicator):
+    """
+    Annualized standard deviation of the log returns of the last window bars
+    """
+
+    price_scale = False
+
+    def __init__(self, window, periods_per_year=TRADING_DAYS_PER_YEAR):
+        self._std = RollingStd(window)
+        self._scale = math.sqrt(periods_per_year)
+        self._previous = None
+
+    def update(self, value):
+        if math.isnan(value) or value <= 0.0:
+            return math.nan
+        previous, self._previous = self._previous, value
+        if previous is None:
+            return math.nan
+        return self._std.update(math.log(value / previous)) * self._scale
+
+
+class Drawdown(Indicator):
+    """
+    Relative drop of the value from its running peak, the deepest drop seen so
+    far is kept in max_drawdown
+    """
+
+    price_scale = False
+
+    def __init__(self):
+        self._peak = -math.inf
+        self.max_drawdown = 0.0
+
+    def update(self, value):
+        if math.isnan(value):
+            return math.nan
+        self._peak = max(self._peak, value)
+        drawdown = value / self._peak - 1.0 if self._peak > 0.0 else 0.0
+        self.max_drawdown = min(self.max_drawdown, drawdown)
+        return drawdown
+
+
+class RollingZScore(Indicator):
+    """
+    Distance of the value from the mean of the last window bars, in standard
+    deviations
+    """
+
+    price_scale = False
+
+    def __init__(self, window):
+        self._sums = _RollingSums(window)
+
+    def update(self, value):
+        if math.isnan(value):
+            return math.nan
+        self._sums.push(value)
+        if not self._sums.is_full():
+            return math.nan
+        std = self._sums.std()
+        return (value - self._sums.mean()) / std if std > 0.0 else math.nan
+
+
+INDICATORS = {
+    "SMA 50": lambda: SimpleMovingAverage(50),
+    "SMA 200": lambda: SimpleMovingAverage(200),
+    "EMA 20": lambda: ExponentialMovingAverage(20),
+    "Volatility 21": lambda: RollingVolatility(21),
+    "Drawdown": Drawdown,
+    "Z-score 50": lambda: RollingZScore(50),
+}
+
+
+def get_available_indicators():
+    return list(INDICATORS)
+
+
+class IndicatorSeries:
+    """
+    Values of one indicator for one stock, grown as new bars are appended and
+    trimmed to the latest values of a live chart
+    """
+
+    def __init__(self, indicator):
+        self.indicator = indicator
+        self._dates = np.empty(0, dtype="datetime64[ns]")
+        self._values = np.empty(0)
+        # Values before start have been trimmed
+        self._start = 0
+        self._length = 0
+
+    def __len__(self):
+        return self._length - self._start
+
+    @property
+    def dates(self):
+        return self._dates[self._start : self._length]
+
+    @property
+    def values(self):
+        return self._values[self._start : self._length]
+
+    def append(self, dates, values):
+        """
+        Appends bars to the series, only the new bars are fed to the indicator
+        """
+        dates = np.asarray(dates, dtype="datetime64[ns]")
+        new_values = self.indicator.extend(values)
+        self._reserve(self._length + len(new_values))
+
+        end = self._length + len(new_values)
+        self._dates[self._length : end] = dates
+        self._values[self._length : end] = new_values
+        self._length = end
+        return new_values
+
+    def trim(self, length):
+        """
+        Drops all but the latest length values, the state of the indicator is
+        kept so later bars are computed as before
+        """
+        self._start = max(self._start, self._length - length)
+
+    def _reserve(self, length):
+        # Capacity doubles to keep appending amortized constant per bar
+        if length <= len(self._values):
+            return
+        if self._start:
+            # Trimmed values make room before the arrays grow
+            kept = self._length - self._start
+            self._dates[:kept] = self._dates[self._start : self._length]
+            self._values[:kept] = self._values[self._start : self._length]
+            length -= self._start
+            self._start, self._length = 0, kept
+            if length <= len(self._values):
+                return
+        capacity = max(length, 2 * len(self._values))
+        self._dates = np.resize(self._dates, capacity)
+        self._values = np.resize(self._values, capacity)
+
+
+class AnalyticsEngine:
+    """
+    Keeps indicator series per stock ticker and updates them incrementally
+    """
+
+    def __init__(self, indicators=None):
+        # Indicator factories keyed by the indicator label
+        self._factories = dict(INDICATORS if indicators is None else indicators)
+        self._series = {}
+
+    def append(self, ticker, dates, values):
+        """
+        Appends new bars of ticker to all of its indicators
+        """
+        ticker_series = self._series.setdefault(ticker, {})
+        for label, factory in self._factories.items():
+            if label not in ticker_series:
+                ticker_series[label] = IndicatorSeries(factory())
+            ticker_series[label].append(dates, values)
+        return ticker_series
+
+    def get(self, ticker, label):
+        return self._series[ticker][label]
+
+    def trim(self, ticker, length):
+        """
+        Drops all but the latest length values of every indicator of ticker
+        """
+        for series in self._series.get(ticker, {}).values():
+            series.trim(length)
+
+    def get_all(self, ticker):
+        return self._series.get(ticker, {})
+
+    def remove(self, ticker):
+        self._series.pop(ticker, None)
+
+    def clear(self):
+        self._series.clear()
+
+
+def overlay_indicators(axes, engine, ticker, labels=None, color=None, secondary_axes=None):
+    """
+    Draws the indicators of ticker on the given axes. Indicators that aren't in
+    the scale of the price go to secondary_axes, or are skipped without one.
+
+    Returns the created lines keyed by indicator label, they can be kept up to
+    date with update_overlay().
+    """
+    lines = {}
+    for label, series in engine.get_all(ticker).items():
+        if labels is not None and label not in labels:
+            continue
+        target_axes = axes if series.indicator.price_scale else secondary_axes
+        if target_axes is None:
+            continue
+
+        (lines[label],) = target_axes.plot(
+            series.dates,
+            series.values,
+            color=color,
+            linestyle="--",
+            linewidth=1,
+            label=f"{ticker} {label}",
+        )
+    return lines
+
+
+def update_overlay(lines, engine, ticker):
+    """
+    Updates lines created by overlay_indicators() with the latest indicator values
+    """
+    for label, line in lines.items():
+        series = engine.get(ticker, label)
+        line.set_data(series.dates, series.values)
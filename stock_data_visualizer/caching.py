@@ -0,0 +1,220 @@
+"""
+Persistent on-disk cache for stock price history
+"""
+
+import sqlite3
+import threading
+import pandas as pd
+from datetime import datetime, timedelta
+
+from tracing import span, count
+
+
+STOCK_DATA_COLUMNS = ["High", "Low", "Open", "Close", "Volume", "Adj Close"]
+
+
+class CachePolicy:
+    """
+    Staleness rules for cached stock data.
+
+    Historical bars never go stale, only the tail of a series does. The tail is
+    refetched once the requested end is more than tail_max_age past the end of
+    the cached coverage.
+    """
+
+    def __init__(self, tail_max_age=timedelta(hours=1)):
+        self.tail_max_age = tail_max_age
+
+    def is_head_missing(self, covered_start, start_time):
+        return start_time < covered_start
+
+    def is_tail_stale(self, covered_end, end_time):
+        return end_time - covered_end > self.tail_max_age
+
+
+class StockDataCache:
+    """
+    SQLite backed store of OHLCV bars keyed by data source and stock ticker.
+
+    Alongside the bars the cache records the time range that has been fetched
+    for each ticker, so that weekends and holidays without bars are not
+    mistaken for missing data.
+    """
+
+    def __init__(self, cache_file, policy=None):
+        self.cache_file = cache_file
+        self.policy = policy if policy is not None else CachePolicy()
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(cache_file), check_same_thread=False)
+        self._create_tables()
+
+    def _create_tables(self):
+        value_columns = ", ".join(f'"{column}" REAL' for column in STOCK_DATA_COLUMNS)
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"""CREATE TABLE IF NOT EXISTS bars (
+                source TEXT NOT NULL,
+                ticker TEXT NOT NULL,
+                date INTEGER NOT NULL,
+                {value_columns},
+                PRIMARY KEY (source, ticker, date)
+                ) WITHOUT ROWID"""
+            )
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS coverage (
+                source TEXT NOT NULL,
+                ticker TEXT NOT NULL,
+                start INTEGER NOT NULL,
+                end INTEGER NOT NULL,
+                PRIMARY KEY (source, ticker)
+                )"""
+            )
+
+    def get(self, stock_ticker, source, start_time, end_time, fetch):
+        """
+        Returns the bars of stock_ticker between start_time and end_time.
+
+        Only the parts of the range that are not yet stored are requested by
+        calling fetch(stock_ticker, start, end), the rest is read from disk.
+        """
+        for fetch_start, fetch_end in self.get_missing_ranges(
+            stock_ticker, source, start_time, end_time
+        ):
+            self.store(
+                stock_ticker,
+                source,
+                fetch(stock_ticker, fetch_start, fetch_end),
+                fetch_start,
+                fetch_end,
+            )
+
+        return self.read(stock_ticker, source, start_time, end_time)
+
+    def get_missing_ranges(self, stock_ticker, source, start_time, end_time):
+        """
+        Returns the (start, end) ranges that have to be fetched before the bars
+        between start_time and end_time can be read from the cache
+        """
+        coverage = self.get_coverage(stock_ticker, source)
+        if coverage is None:
+            count("cache_misses")
+            return [(start_time, end_time)]
+
+        covered_start, covered_end = coverage
+        missing_ranges = []
+        if self.policy.is_head_missing(covered_start, start_time):
+            missing_ranges.append((start_time, covered_start))
+        if self.policy.is_tail_stale(covered_end, end_time):
+            # Refetch the last covered day too, its bar may have been partial
+            tail_start = datetime(covered_end.year, covered_end.month, covered_end.day)
+            missing_ranges.append((tail_start, end_time))
+        count("cache_misses" if missing_ranges else "cache_hits")
+        return missing_ranges
+
+    def store(self, stock_ticker, source, stock_data_df, start_time, end_time):
+        """
+        Merges freshly fetched bars into the stored series and marks the range
+        between start_time and end_time as covered. Ranges without bars only
+        extend a coverage, a ticker that has never had bars, e.g., a mistyped
+        one, isn't covered and is fetched again the next time.
+        """
+        self.put(stock_ticker, source, stock_data_df)
+
+        coverage = self.get_coverage(stock_ticker, source)
+        if coverage is None and (stock_data_df is None or stock_data_df.empty):
+            return
+        if coverage is not None:
+            start_time = min(start_time, coverage[0])
+            end_time = max(end_time, coverage[1])
+        self._set_coverage(stock_ticker, source, start_time, end_time)
+
+    def get_coverage(self, stock_ticker, source):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT start, end FROM coverage WHERE source = ? AND ticker = ?",
+                (source, stock_ticker),
+            ).fetchone()
+
+        if row is None:
+            return None
+        return _from_timestamp(row[0]), _from_timestamp(row[1])
+
+    def _set_coverage(self, stock_ticker, source, start_time, end_time):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO coverage VALUES (?, ?, ?, ?)",
+                (source, stock_ticker, _to_timestamp(start_time), _to_timestamp(end_time)),
+            )
+
+    def put(self, stock_ticker, source, stock_data_df):
+        """
+        Merges the bars of stock_data_df into the stored series
+        """
+        if stock_data_df is None or stock_data_df.empty:
+            return
+
+        stock_data_df = stock_data_df.reindex(columns=STOCK_DATA_COLUMNS)
+        dates = stock_data_df.index.values.astype("datetime64[s]").astype("int64")
+        values = stock_data_df.to_numpy(dtype="float64")
+        rows = [
+            (source, stock_ticker, int(date), *(None if pd.isna(v) else float(v) for v in row))
+            for date, row in zip(dates, values)
+        ]
+
+        placeholders = ", ".join("?" * (3 + len(STOCK_DATA_COLUMNS)))
+        with self._lock, self._connection:
+            self._connection.executemany(
+                f"INSERT OR REPLACE INTO bars VALUES ({placeholders})", rows
+            )
+
+    def read(self, stock_ticker, source, start_time, end_time):
+        """
+        Reads the stored bars of stock_ticker between start_time and end_time
+        """
+        value_columns = ", ".join(f'"{column}"' for column in STOCK_DATA_COLUMNS)
+        # Whole days are included like the remote readers do
+        start_time = pd.Timestamp(start_time).normalize()
+        with span("cache_read", "cache", ticker=stock_ticker), self._lock:
+            rows = self._connection.execute(
+                f"""SELECT date, {value_columns} FROM bars
+                WHERE source = ? AND ticker = ? AND date BETWEEN ? AND ?
+                ORDER BY date""",
+                (source, stock_ticker, _to_timestamp(start_time), _to_timestamp(end_time)),
+            ).fetchall()
+
+        stock_data_df = pd.DataFrame.from_records(
+            rows, columns=["Date"] + STOCK_DATA_COLUMNS
+        )
+        stock_data_df["Date"] = pd.to_datetime(stock_data_df["Date"], unit="s")
+        return stock_data_df.set_index("Date").astype("float64")
+
+    def clear(self, stock_ticker=None, source=None):
+        """
+        Removes the stored data of one ticker, or everything if no ticker is
+        given. Without a source the data of every source is removed.
+        """
+        with self._lock, self._connection:
+            for table in ("bars", "coverage"):
+                if stock_ticker is None:
+                    self._connection.execute(f"DELETE FROM {table}")
+                elif source is None:
+                    self._connection.execute(
+                        f"DELETE FROM {table} WHERE ticker = ?", (stock_ticker,)
+                    )
+                else:
+                    self._connection.execute(
+                        f"DELETE FROM {table} WHERE source = ? AND ticker = ?",
+                        (source, stock_ticker),
+                    )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def _to_timestamp(time):
+    return int(pd.Timestamp(time).timestamp())
+
+
+def _from_timestamp(timestamp):
+    return pd.Timestamp(timestamp, unit="s").to_pydatetime()
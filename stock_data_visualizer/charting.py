@@ -0,0 +1,945 @@
+"""
+Stock graphs that are kept alive and updated in place between draws.
+"""
+
+import functools
+import numpy as np
+
+from styling import FIGURE_FACECOLOR, set_axes_styles
+from decimation import LineDecimator, date2num, minmax_indices
+from analytics import AnalyticsEngine, INDICATORS, overlay_indicators
+from profit import HOLDING_PERIOD_DAYS, analyze_profit
+from correlation import CorrelationMatrix, cluster_order
+from normalization import NormalizationMode, get_normalization_axis_label
+from tracing import span
+
+
+# Streamed stocks are gathered for this long before the figure is redrawn
+REDRAW_INTERVAL_MS = 100
+# Bars kept per line of a live chart, a week of one minute bars
+LIVE_BUFFER_BARS = 5000
+
+
+def create_figure_canvas():
+    """
+    Returns a new figure and the Qt canvas showing it. Matplotlib is imported
+    on the first call, which keeps it out of the startup of the GUI.
+    """
+    from matplotlib.figure import Figure
+
+    figure = Figure(facecolor=FIGURE_FACECOLOR)
+    return figure, _get_canvas_class()(figure)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_canvas_class():
+    from matplotlib.backends.backend_qtagg import FigureCanvas
+
+    class TracedFigureCanvas(FigureCanvas):
+        """
+        Qt canvas whose full redraws are spans of the trace
+        """
+
+        def draw(self):
+            with span("canvas_draw", "plot"):
+                super().draw()
+
+    return TracedFigureCanvas
+
+
+@functools.lru_cache(maxsize=None)
+def _get_rendered_view_class():
+    from PySide2.QtCore import QTimer, Signal
+    from PySide2.QtGui import QColor, QImage, QPainter
+    from PySide2.QtWidgets import QWidget
+
+    class RenderedChartView(QWidget):
+        """
+        Qt view of the charts rendered by the render server, the pixels of
+        the shared memory buffer are shown as a QImage without copying them
+        """
+
+        # Emitted with the future and the buffer of a finished render from any
+        # thread, it's delivered on the GUI thread
+        rendered = Signal(object)
+        # Emitted with the message of a failed render
+        render_failed = Signal(str)
+
+        def __init__(self):
+            super().__init__()
+            self.setMinimumSize(320, 240)
+            self._image = None
+            self.render_timer = QTimer(self)
+            self.render_timer.setSingleShot(True)
+            self.render_timer.setInterval(REDRAW_INTERVAL_MS)
+
+        def pixel_size(self):
+            ratio = self.devicePixelRatioF()
+            return max(1, round(self.width() * ratio)), max(1, round(self.height() * ratio))
+
+        def set_buffer(self, buffer):
+            self._image = QImage(
+                buffer.memory, buffer.width, buffer.height, buffer.stride, QImage.Format_RGBA8888
+            )
+            self._image.setDevicePixelRatio(self.devicePixelRatioF())
+            self.update()
+
+        def paintEvent(self, event):
+            painter = QPainter(self)
+            painter.fillRect(self.rect(), QColor(FIGURE_FACECOLOR))
+            if self._image is not None:
+                # Renders of the previous size are stretched until the new one is done
+                painter.drawImage(self.rect(), self._image)
+            painter.end()
+
+        def resizeEvent(self, event):
+            super().resizeEvent(event)
+            self.render_timer.start()
+
+    return RenderedChartView
+
+
+def autoscale_to_limits(axes, limits):
+    """
+    Scales axes to the (x_min, x_max, y_min, y_max) limits of its full data,
+    returns True if the view changed
+    """
+    if limits is None:
+        return False
+
+    x_min, x_max, y_min, y_max = limits
+    old_view = (axes.get_xlim(), axes.get_ylim())
+    axes.ignore_existing_data_limits = True
+    axes.update_datalim(np.array([[x_min, y_min], [x_max, y_max]]))
+    axes.autoscale_view()
+    return (axes.get_xlim(), axes.get_ylim()) != old_view
+
+
+class StockGraph:
+    """
+    Stock graph controller.
+
+    The figure, the canvas and the lines of the stocks are reused by every
+    draw. Lines of stocks that stay selected get their data replaced in place,
+    only stocks that were added or removed create or remove artists. Stock
+    lines are animated, so updates that don't move the axes limits are blitted
+    on top of the cached background instead of redrawing the whole figure.
+    """
+
+    def __init__(self):
+        self._sought_stocks = []
+        self._normalization = NormalizationMode.NONE
+        self._stock_lines = {}
+        self._indicator_lines = {}
+        self._background = None
+
+        self.figure, self.canvas = create_figure_canvas()
+        self.axes = self.figure.add_subplot(1, 1, 1)
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+        self._set_styles()
+
+        # Long time frames are drawn with as many points as the canvas can show
+        self._decimator = LineDecimator(self.axes)
+
+        # Indicator overlaid on every stock, indicators not in the scale of the
+        # stock value are drawn against a secondary y axis
+        self._indicator = None
+        self._analytics = None
+        self._analytics_price_scale = True
+        self._secondary_axes = None
+
+    def _set_styles(self):
+        set_axes_styles(
+            self.axes,
+            "Stock development during chosen time frame",
+            get_normalization_axis_label(self._normalization),
+        )
+
+    @property
+    def sought_stocks(self):
+        return list(self._sought_stocks)
+
+    def begin_draw(self, sought_stocks, normalization=NormalizationMode.NONE, indicator=None):
+        """
+        Prepares the graph for a new selection, stocks that are no longer
+        selected are removed and the rest wait for their new data
+        """
+        self._sought_stocks = list(sought_stocks)
+
+        for ticker in list(self._stock_lines):
+            if ticker not in self._sought_stocks:
+                self.remove_stock(ticker)
+
+        if normalization != self._normalization:
+            self._normalization = normalization
+            self.axes.set_ylabel(get_normalization_axis_label(normalization))
+
+        if indicator != self._indicator:
+            self._set_indicator(indicator)
+
+        self._update_legend()
+        self.canvas.draw_idle()
+
+    def _set_indicator(self, indicator):
+        for ticker in list(self._indicator_lines):
+            for line in self._indicator_lines.pop(ticker).values():
+                self._decimator.remove(line)
+                line.remove()
+
+        if self._secondary_axes is not None:
+            self._secondary_axes.remove()
+            self._secondary_axes = None
+
+        self._indicator = indicator
+        self._analytics = None
+        self._analytics_price_scale = True
+        if indicator is not None:
+            self._analytics = AnalyticsEngine({indicator: INDICATORS[indicator]})
+            self._analytics_price_scale = INDICATORS[indicator]().price_scale
+            if not self._analytics_price_scale:
+                self._secondary_axes = self.axes.twinx()
+                self._secondary_axes.set_ylabel(indicator, color="white")
+                self._secondary_axes.tick_params(axis="y", colors="white")
+                self._decimator.connect_axes(self._secondary_axes)
+
+    def remove_stock(self, ticker):
+        if ticker not in self._stock_lines:
+            return
+
+        line = self._stock_lines.pop(ticker)
+        self._decimator.remove(line)
+        line.remove()
+
+        for line in self._indicator_lines.pop(ticker, {}).values():
+            self._decimator.remove(line)
+            line.remove()
+        if self._analytics is not None:
+            self._analytics.remove(ticker)
+
+        self._update_legend()
+        self.canvas.draw_idle()
+
+    def add_stock(self, ticker, stock_panel, price_panel=None):
+        """
+        Sets the data of a selected stock, reusing its line when it has one.
+
+        Indicators in the scale of the price follow the drawn stock_panel, the
+        rest are computed from the unnormalized price_panel when it's given.
+        """
+        if ticker not in self._sought_stocks:
+            return
+
+        # Colors follow the order of selection rather than the order of arrival
+        color = f"C{self._sought_stocks.index(ticker) % 10}"
+        dates, values = stock_panel.valid_column(ticker)
+
+        # Lines start out empty, so the date units come from the data set later
+        self.axes.xaxis.update_units(dates)
+
+        line = self._stock_lines.get(ticker)
+        new_artists = line is None
+        if new_artists:
+            (line,) = self.axes.plot([], [], label=ticker, animated=True)
+            self._stock_lines[ticker] = line
+        if line.get_color() != color:
+            # The legend has to follow the new color
+            line.set_color(color)
+            new_artists = True
+        self._decimator.set_data(line, dates, values)
+
+        if self._analytics is not None:
+            indicator_dates, indicator_values = dates, values
+            if price_panel is not None and not self._analytics_price_scale:
+                indicator_dates, indicator_values = price_panel.valid_column(ticker)
+            self._analytics.remove(ticker)
+            self._analytics.append(ticker, indicator_dates, indicator_values)
+            indicator_lines = self._indicator_lines.get(ticker)
+            if indicator_lines is None:
+                indicator_lines = overlay_indicators(
+                    self.axes,
+                    self._analytics,
+                    ticker,
+                    color=color,
+                    secondary_axes=self._secondary_axes,
+                )
+                for indicator_line in indicator_lines.values():
+                    indicator_line.set_animated(True)
+                self._indicator_lines[ticker] = indicator_lines
+                new_artists = True
+            for label, indicator_line in indicator_lines.items():
+                series = self._analytics.get(ticker, label)
+                indicator_line.set_color(color)
+                self._decimator.set_data(indicator_line, series.dates, series.values)
+
+        if new_artists:
+            self._update_legend()
+        self._refresh(full=new_artists)
+
+    def append_bars(self, ticker, dates, values, price_values=None, capacity=LIVE_BUFFER_BARS):
+        """
+        Appends new bars to the line of a drawn stock, the latest capacity bars
+        are kept. Indicators not in the scale of the stock value follow the
+        unnormalized price_values when they're given.
+        """
+        line = self._stock_lines.get(ticker)
+        if line is None or not len(dates):
+            return
+
+        self._decimator.extend(line, dates, values, capacity)
+        if self._analytics is not None and ticker in self._indicator_lines:
+            indicator_values = values
+            if price_values is not None and not self._analytics_price_scale:
+                indicator_values = price_values
+            self._analytics.append(ticker, dates, indicator_values)
+            # Indicator history is bounded like the lines are
+            self._analytics.trim(ticker, capacity)
+            for label, indicator_line in self._indicator_lines[ticker].items():
+                series = self._analytics.get(ticker, label)
+                self._decimator.extend(
+                    indicator_line,
+                    series.dates[-len(dates) :],
+                    series.values[-len(dates) :],
+                    capacity,
+                )
+        self._refresh()
+
+    def _update_legend(self):
+        # Set colors and texts for the legend, keeping the order of selection
+        legend_tickers = [
+            ticker for ticker in self._sought_stocks if ticker in self._stock_lines
+        ]
+        legend = self.axes.get_legend()
+        if legend is not None:
+            legend.remove()
+        if not legend_tickers:
+            return
+
+        self.axes.legend(
+            [self._stock_lines[ticker] for ticker in legend_tickers],
+            legend_tickers,
+            loc="best",
+            labelcolor="white",
+            shadow=True,
+            facecolor="#3F4042",
+        )
+
+    def _refresh(self, full=False):
+        limits_changed = self._autoscale(self.axes)
+        if self._secondary_axes is not None:
+            limits_changed |= self._autoscale(self._secondary_axes)
+
+        if full or limits_changed or self._background is None:
+            self.canvas.draw_idle()
+        else:
+            self._blit()
+
+    def _autoscale(self, axes):
+        return autoscale_to_limits(axes, self._decimator.data_limits(axes))
+
+    def _animated_artists(self):
+        artists = list(self._stock_lines.values())
+        for indicator_lines in self._indicator_lines.values():
+            artists.extend(indicator_lines.values())
+        return artists
+
+    def _on_draw(self, event):
+        # The background is everything but the animated stock lines
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        for artist in self._animated_artists():
+            self.figure.draw_artist(artist)
+
+    def _blit(self):
+        with span("canvas_blit", "plot"):
+            self.canvas.restore_region(self._background)
+            for artist in self._animated_artists():
+                self.figure.draw_artist(artist)
+            self.canvas.blit(self.figure.bbox)
+
+
+class SmallMultiplesGraph:
+    """
+    Stock graph controller drawing every stock on its own small axes.
+
+    The grid of axes is created once and paged through, so the cost of a
+    redraw depends on the size of the grid instead of the number of stocks.
+    """
+
+    def __init__(self, rows=4, columns=4):
+        self._sought_stocks = []
+        self._normalization = NormalizationMode.NONE
+        self._stock_data = {}
+        self._page = 0
+
+        self.figure, self.canvas = create_figure_canvas()
+        self._axes = list(self.figure.subplots(rows, columns, sharex=True).ravel())
+        self._lines = []
+        self._decimators = []
+        for axes in self._axes:
+            set_axes_styles(axes, "", "", xlabel="", max_ticks=4)
+            axes.tick_params(labelsize="x-small")
+            # Skip the minor tick overlap check and the automatic title placement,
+            # both lay out the date ticks of every shared axes over again
+            axes.xaxis.remove_overlapping_locs = False
+            (line,) = axes.plot([], [])
+            self._lines.append(line)
+            self._decimators.append(LineDecimator(axes, points_per_pixel=1))
+        self.figure.subplots_adjust(
+            left=0.06, right=0.98, bottom=0.06, top=0.9, hspace=0.4, wspace=0.3
+        )
+
+        self._redraw_timer = self.canvas.new_timer(interval=REDRAW_INTERVAL_MS)
+        self._redraw_timer.single_shot = True
+        self._redraw_timer.add_callback(self._render_page)
+
+    @property
+    def sought_stocks(self):
+        return list(self._sought_stocks)
+
+    @property
+    def page(self):
+        return self._page
+
+    @property
+    def page_count(self):
+        return max(1, -(-len(self._sought_stocks) // len(self._axes)))
+
+    def set_page(self, page):
+        self._page = min(max(0, page), self.page_count - 1)
+        self._render_page()
+
+    def begin_draw(self, sought_stocks, normalization=NormalizationMode.NONE, indicator=None):
+        self._sought_stocks = list(sought_stocks)
+        self._normalization = normalization
+        for ticker in list(self._stock_data):
+            if ticker not in self._sought_stocks:
+                del self._stock_data[ticker]
+        self._page = min(self._page, self.page_count - 1)
+        self._render_page()
+
+    def add_stock(self, ticker, stock_panel, price_panel=None):
+        if ticker not in self._sought_stocks:
+            return
+
+        self._stock_data[ticker] = stock_panel.valid_column(ticker)
+        # Stocks on other pages are drawn when their page is shown
+        if ticker in self._page_stocks():
+            self._redraw_timer.start()
+
+    def remove_stock(self, ticker):
+        # The following stocks move up to fill the freed axes
+        self._stock_data.pop(ticker, None)
+        if ticker in self._sought_stocks:
+            self._sought_stocks.remove(ticker)
+            self._page = min(self._page, self.page_count - 1)
+            self._redraw_timer.start()
+
+    def _page_stocks(self):
+        start = self._page * len(self._axes)
+        return self._sought_stocks[start : start + len(self._axes)]
+
+    def _render_page(self):
+        page_stocks = self._page_stocks()
+        for n, (axes, line, decimator) in enumerate(
+            zip(self._axes, self._lines, self._decimators)
+        ):
+            ticker = page_stocks[n] if n < len(page_stocks) else None
+            axes.set_visible(ticker is not None)
+            if ticker is None:
+                continue
+
+            axes.set_title(ticker, color="white", fontsize="small", y=1.0)
+            line.set_color(f"C{self._sought_stocks.index(ticker) % 10}")
+            dates, values = self._stock_data.get(ticker, ([], []))
+            axes.xaxis.update_units(np.asarray(dates))
+            decimator.set_data(line, dates, values)
+            autoscale_to_limits(axes, decimator.data_limits(axes))
+
+        self.figure.suptitle(
+            f"{get_normalization_axis_label(self._normalization)}, "
+            f"page {self._page + 1}/{self.page_count}",
+            color="white",
+        )
+        self.canvas.draw_idle()
+
+
+class CollectionGraph:
+    """
+    Stock graph controller drawing all stocks on one axes as a single
+    LineCollection, which keeps hundreds of stocks cheap to render. There's
+    no legend, the stocks are told apart by their colors only.
+    """
+
+    def __init__(self, points_per_pixel=2):
+        self._sought_stocks = []
+        self._normalization = NormalizationMode.NONE
+        self._stock_data = {}
+        self.points_per_pixel = points_per_pixel
+
+        from matplotlib.collections import LineCollection
+
+        self.figure, self.canvas = create_figure_canvas()
+        self.axes = self.figure.add_subplot(1, 1, 1)
+        self._set_styles()
+
+        self._collection = LineCollection([], linewidths=0.8)
+        self.axes.add_collection(self._collection)
+        self.axes.callbacks.connect("xlim_changed", self._on_view_changed)
+        self.canvas.mpl_connect("resize_event", self._on_view_changed)
+
+        self._redraw_timer = self.canvas.new_timer(interval=REDRAW_INTERVAL_MS)
+        self._redraw_timer.single_shot = True
+        self._redraw_timer.add_callback(self._redraw)
+
+    def _set_styles(self):
+        set_axes_styles(
+            self.axes,
+            "Stock development during chosen time frame",
+            get_normalization_axis_label(self._normalization),
+        )
+
+    @property
+    def sought_stocks(self):
+        return list(self._sought_stocks)
+
+    def begin_draw(self, sought_stocks, normalization=NormalizationMode.NONE, indicator=None):
+        self._sought_stocks = list(sought_stocks)
+        if normalization != self._normalization:
+            self._normalization = normalization
+            self.axes.set_ylabel(get_normalization_axis_label(normalization))
+        for ticker in list(self._stock_data):
+            if ticker not in self._sought_stocks:
+                del self._stock_data[ticker]
+        self._redraw_timer.start()
+
+    def add_stock(self, ticker, stock_panel, price_panel=None):
+        if ticker not in self._sought_stocks:
+            return
+
+        dates, values = stock_panel.valid_column(ticker)
+        self._stock_data[ticker] = (date2num(dates.values), values)
+        # Streamed stocks are batched into one update of the collection
+        self._redraw_timer.start()
+
+    def remove_stock(self, ticker):
+        if self._stock_data.pop(ticker, None) is not None:
+            self._redraw_timer.start()
+
+    def _redraw(self):
+        limits = [
+            (x[0], x[-1], values.min(), values.max())
+            for x, values in self._stock_data.values()
+            if len(x)
+        ]
+        if limits:
+            limits = np.array(limits)
+            autoscale_to_limits(
+                self.axes,
+                (limits[:, 0].min(), limits[:, 1].max(), limits[:, 2].min(), limits[:, 3].max()),
+            )
+        self._update_segments()
+        self.canvas.draw_idle()
+
+    def _on_view_changed(self, *args):
+        self._update_segments()
+
+    def _update_segments(self):
+        x_min, x_max = self.axes.get_xlim()
+        max_points = max(1, int(self.axes.bbox.width)) * self.points_per_pixel
+
+        segments, colors = [], []
+        for n, ticker in enumerate(self._sought_stocks):
+            if ticker not in self._stock_data:
+                continue
+            x, values = self._stock_data[ticker]
+            start = max(0, int(np.searchsorted(x, x_min)) - 1)
+            end = min(len(x), int(np.searchsorted(x, x_max, side="right")) + 1)
+            indices = start + minmax_indices(values[start:end], max_points // 2)
+            segments.append(np.column_stack((x[indices], values[indices])))
+            colors.append(f"C{n % 10}")
+
+        self._collection.set_segments(segments)
+        self._collection.set_color(colors)
+
+
+class ProfitGraph:
+    """
+    Stock graph controller drawing the profit analysis of every stock: its
+    cumulative profit during the time frame with the best window to buy and
+    sell it marked, and next to it the distribution of the returns of holding
+    it for a fixed number of days.
+
+    Profits are computed from the unnormalized prices, so the normalization
+    doesn't change them.
+    """
+
+    def __init__(self, holding_period=HOLDING_PERIOD_DAYS):
+        self._sought_stocks = []
+        self._analyses = {}
+        self._profit_lines = {}
+        self._artists = []
+        self.holding_period = holding_period
+
+        self.figure, self.canvas = create_figure_canvas()
+        self.axes, self.returns_axes = self.figure.subplots(
+            1, 2, sharey=True, gridspec_kw={"width_ratios": (3, 1)}
+        )
+        set_axes_styles(self.axes, "Profit during chosen time frame", "Profit (%)")
+        set_axes_styles(
+            self.returns_axes,
+            f"Returns of {holding_period} day holds",
+            "",
+            xlabel="Share of holds (%)",
+        )
+        self._reset_returns_ticks()
+        self._decimator = LineDecimator(self.axes)
+
+        self._redraw_timer = self.canvas.new_timer(interval=REDRAW_INTERVAL_MS)
+        self._redraw_timer.single_shot = True
+        self._redraw_timer.add_callback(self._redraw)
+
+    def _reset_returns_ticks(self):
+        # The returns aren't plotted against dates
+        from matplotlib.ticker import AutoLocator, ScalarFormatter
+
+        self.returns_axes.xaxis.set_major_locator(AutoLocator())
+        self.returns_axes.xaxis.set_major_formatter(ScalarFormatter())
+
+    @property
+    def sought_stocks(self):
+        return list(self._sought_stocks)
+
+    def begin_draw(self, sought_stocks, normalization=NormalizationMode.NONE, indicator=None):
+        self._sought_stocks = list(sought_stocks)
+        for ticker in list(self._analyses):
+            if ticker not in self._sought_stocks:
+                self.remove_stock(ticker)
+        self._redraw_timer.start()
+
+    def add_stock(self, ticker, stock_panel, price_panel=None):
+        if ticker not in self._sought_stocks:
+            return
+
+        panel = price_panel if price_panel is not None else stock_panel
+        with span("analyze_profit", "data", ticker=ticker):
+            self._analyses[ticker] = analyze_profit(panel, self.holding_period)
+        self._redraw_timer.start()
+
+    def remove_stock(self, ticker):
+        self._analyses.pop(ticker, None)
+        line = self._profit_lines.pop(ticker, None)
+        if line is not None:
+            self._decimator.remove(line)
+            line.remove()
+        self._redraw_timer.start()
+
+    def _redraw(self):
+        for artist in self._artists:
+            artist.remove()
+        self._artists = []
+
+        tickers = [ticker for ticker in self._sought_stocks if ticker in self._analyses]
+        legend_lines, legend_labels, returns, colors = [], [], [], []
+        for ticker in tickers:
+            analysis = self._analyses[ticker]
+            color = f"C{self._sought_stocks.index(ticker) % 10}"
+            dates, profits = analysis.profit(ticker)
+            self.axes.xaxis.update_units(dates)
+
+            line = self._profit_lines.get(ticker)
+            if line is None:
+                (line,) = self.axes.plot([], [])
+                self._profit_lines[ticker] = line
+            line.set_color(color)
+            self._decimator.set_data(line, dates, 100.0 * profits)
+
+            label = f"{ticker} {profits[-1]:+.0%}" if len(profits) else ticker
+            best = analysis.best_window(ticker)
+            if best is not None and best[2] > 0.0:
+                buy_date, sell_date, best_profit = best
+                # Buy and sell are marked on the profit curve
+                buy_profit, sell_profit = profits[dates.get_indexer([buy_date, sell_date])]
+                self._artists.extend(
+                    self.axes.plot(
+                        [buy_date, sell_date],
+                        [100.0 * buy_profit, 100.0 * sell_profit],
+                        color=color,
+                        linestyle="none",
+                        marker="o",
+                        markeredgecolor="white",
+                    )
+                )
+                label += f", best {best_profit:+.0%} {buy_date:%Y-%m-%d} - {sell_date:%Y-%m-%d}"
+            worst = analysis.worst_window(ticker)
+            if worst is not None and worst[2] < 0.0:
+                label += f", worst {worst[2]:+.0%}"
+            legend_lines.append(line)
+            legend_labels.append(label)
+
+            holding_returns = analysis.holding_return_values(ticker)
+            if len(holding_returns):
+                returns.append(100.0 * holding_returns)
+                colors.append(color)
+
+        if returns:
+            # Profits and hold returns share the y axis, so both are in percents
+            bins = np.histogram_bin_edges(np.concatenate(returns), bins=50)
+            for values, color in zip(returns, colors):
+                _, _, patches = self.returns_axes.hist(
+                    values,
+                    bins=bins,
+                    weights=np.full(len(values), 100.0 / len(values)),
+                    color=color,
+                    histtype="step",
+                    orientation="horizontal",
+                )
+                self._artists.extend(patches)
+            self.returns_axes.relim()
+            self.returns_axes.autoscale_view()
+
+        legend = self.axes.get_legend()
+        if legend is not None:
+            legend.remove()
+        if legend_lines:
+            self.axes.legend(
+                legend_lines,
+                legend_labels,
+                loc="best",
+                labelcolor="white",
+                shadow=True,
+                facecolor="#3F4042",
+                fontsize="small",
+            )
+        autoscale_to_limits(self.axes, self._decimator.data_limits(self.axes))
+        self.canvas.draw_idle()
+
+
+class CorrelationGraph:
+    """
+    Stock graph controller drawing the correlations between the daily returns
+    of the stocks as a heatmap, ordered so that clusters of similar stocks are
+    next to each other.
+
+    Correlations are computed from the unnormalized prices on the dates both
+    stocks of a pair traded. Streamed stocks are added to the matrix in one
+    batch per redraw, stocks already in it are only computed again when their
+    prices change.
+    """
+
+    # Stocks are labelled on the axes up to this many
+    MAX_LABELLED_STOCKS = 40
+
+    def __init__(self):
+        self._sought_stocks = []
+        self._pending = {}
+        self._matrix = CorrelationMatrix()
+
+        self.figure, self.canvas = create_figure_canvas()
+        self.axes = self.figure.add_subplot(1, 1, 1)
+        set_axes_styles(self.axes, "Correlation of daily returns", "", xlabel="")
+        self.axes.grid(False)
+        from matplotlib import colormaps
+
+        # Pairs without a correlation are left blank
+        cmap = colormaps["RdBu_r"].with_extremes(bad=FIGURE_FACECOLOR)
+        self._heatmap = self.axes.imshow(
+            np.full((1, 1), np.nan), cmap=cmap, vmin=-1.0, vmax=1.0, interpolation="nearest"
+        )
+        colorbar = self.figure.colorbar(self._heatmap, ax=self.axes)
+        colorbar.ax.tick_params(colors="white")
+        self._set_tickers([])
+
+        self._redraw_timer = self.canvas.new_timer(interval=REDRAW_INTERVAL_MS)
+        self._redraw_timer.single_shot = True
+        self._redraw_timer.add_callback(self._redraw)
+
+    @property
+    def sought_stocks(self):
+        return list(self._sought_stocks)
+
+    def begin_draw(self, sought_stocks, normalization=NormalizationMode.NONE, indicator=None):
+        self._sought_stocks = list(sought_stocks)
+        for ticker in list(self._pending):
+            if ticker not in self._sought_stocks:
+                del self._pending[ticker]
+        self._redraw_timer.start()
+
+    def add_stock(self, ticker, stock_panel, price_panel=None):
+        if ticker not in self._sought_stocks:
+            return
+
+        panel = price_panel if price_panel is not None else stock_panel
+        dates, values = panel.valid_column(ticker)
+        self._pending[ticker] = (dates.values, values)
+        self._redraw_timer.start()
+
+    def remove_stock(self, ticker):
+        self._pending.pop(ticker, None)
+        if ticker in self._matrix:
+            self._matrix.remove(ticker)
+        self._redraw_timer.start()
+
+    def _redraw(self):
+        self._matrix.remove_many(
+            [ticker for ticker in self._matrix.tickers if ticker not in self._sought_stocks]
+        )
+        if self._pending:
+            with span("correlate", "data", stocks=len(self._pending)):
+                self._matrix.add_many(self._pending)
+            self._pending = {}
+
+        correlations = self._matrix.correlations()
+        with span("cluster", "data", stocks=len(correlations)):
+            order = cluster_order(correlations)
+        tickers = [self._matrix.tickers[n] for n in order]
+        if len(tickers):
+            self._heatmap.set_data(correlations[np.ix_(order, order)])
+        else:
+            self._heatmap.set_data(np.full((1, 1), np.nan))
+        size = max(len(tickers), 1)
+        self._heatmap.set_extent((-0.5, size - 0.5, size - 0.5, -0.5))
+        self._set_tickers(tickers)
+        self.canvas.draw_idle()
+
+    def _set_tickers(self, tickers):
+        from matplotlib.ticker import FixedFormatter, FixedLocator, NullFormatter, NullLocator
+
+        for axis in (self.axes.xaxis, self.axes.yaxis):
+            if 0 < len(tickers) <= self.MAX_LABELLED_STOCKS:
+                axis.set_major_locator(FixedLocator(range(len(tickers))))
+                axis.set_major_formatter(FixedFormatter(tickers))
+            else:
+                axis.set_major_locator(NullLocator())
+                axis.set_major_formatter(NullFormatter())
+        self.axes.tick_params(axis="x", labelrotation=90, labelsize="small")
+        self.axes.tick_params(axis="y", labelsize="small")
+        self.axes.set_xlim(-0.5, max(len(tickers), 1) - 0.5)
+        self.axes.set_ylim(max(len(tickers), 1) - 0.5, -0.5)
+
+
+class RenderedGraph:
+    """
+    Stock graph controller rendering the chart of the stocks in the processes
+    of the render server, so heavy charts don't stall the event loop. The
+    chart is a static image without navigation, figure is None.
+
+    The aligned stocks are sent to the server once they have stopped
+    streaming in. While a render is in progress the view keeps showing the
+    previous one, changes made meanwhile are rendered once it's done. Renders
+    alternate between two buffers, so the one shown is never written to.
+    Failed renders are emitted with the render_failed signal of the view.
+    """
+
+    def __init__(self, render_server=None):
+        self._sought_stocks = []
+        self._normalization = NormalizationMode.NONE
+        self._indicator = None
+        self._stock_panels = {}
+        self._price_panels = {}
+        self._render_server = render_server
+        self._shown_buffer = None
+        self._render_buffer = None
+        self._rendering = False
+        self._render_again = False
+
+        self.figure = None
+        self.canvas = _get_rendered_view_class()()
+        self.canvas.rendered.connect(self._on_rendered)
+        self.canvas.render_timer.timeout.connect(self._render)
+
+    @property
+    def sought_stocks(self):
+        return list(self._sought_stocks)
+
+    def begin_draw(self, sought_stocks, normalization=NormalizationMode.NONE, indicator=None):
+        self._sought_stocks = list(sought_stocks)
+        self._normalization = normalization
+        self._indicator = indicator
+        for ticker in list(self._stock_panels):
+            if ticker not in self._sought_stocks:
+                self.remove_stock(ticker)
+        self.canvas.render_timer.start()
+
+    def add_stock(self, ticker, stock_panel, price_panel=None):
+        if ticker not in self._sought_stocks:
+            return
+
+        self._stock_panels[ticker] = stock_panel
+        self._price_panels[ticker] = price_panel if price_panel is not None else stock_panel
+        self.canvas.render_timer.start()
+
+    def remove_stock(self, ticker):
+        self._price_panels.pop(ticker, None)
+        if self._stock_panels.pop(ticker, None) is not None:
+            self.canvas.render_timer.start()
+
+    def _render(self):
+        if self._rendering:
+            self._render_again = True
+            return
+
+        from panel import PricePanel
+        from rendering import ChartJob
+        from render_server import get_render_server
+
+        if self._render_server is None:
+            self._render_server = get_render_server()
+        width, height = self.canvas.pixel_size()
+        if self._render_buffer is None or (
+            self._render_buffer.width,
+            self._render_buffer.height,
+        ) != (width, height):
+            if self._render_buffer is not None:
+                self._render_server.release_buffer(self._render_buffer)
+            self._render_buffer = self._render_server.create_buffer(width, height)
+
+        tickers = [ticker for ticker in self._sought_stocks if ticker in self._stock_panels]
+        with span("align_render_job", "plot", tickers=len(tickers)):
+            job = ChartJob(
+                None,
+                "Stock development during chosen time frame",
+                PricePanel.from_panels(self._stock_panels[ticker] for ticker in tickers),
+                PricePanel.from_panels(self._price_panels[ticker] for ticker in tickers),
+                self._normalization,
+                self._indicator,
+            )
+
+        self._rendering = True
+        buffer = self._render_buffer
+        future = self._render_server.render(job, buffer)
+        future.add_done_callback(lambda future: self.canvas.rendered.emit((future, buffer)))
+
+    def _on_rendered(self, render):
+        future, buffer = render
+        self._rendering = False
+        try:
+            future.result()
+        except Exception as error:
+            self.canvas.render_failed.emit(f"Couldn't render the chart: {error}")
+        else:
+            if buffer is self._render_buffer:
+                self.canvas.set_buffer(buffer)
+                self._shown_buffer, self._render_buffer = buffer, self._shown_buffer
+
+        if self._render_again:
+            self._render_again = False
+            self._render()
+
+
+# Stocks drawn to a single chart with a legend before it becomes unreadable
+MAX_SINGLE_CHART_STOCKS = 16
+
+GRAPH_LAYOUTS = {
+    "Single chart": StockGraph,
+    "Small multiples": SmallMultiplesGraph,
+    "Collection": CollectionGraph,
+    "Profit analysis": ProfitGraph,
+    "Correlation heatmap": CorrelationGraph,
+    "Rendered chart": RenderedGraph,
+}
+
+# Layouts with a legend entry for every stock, they draw MAX_SINGLE_CHART_STOCKS at most
+LEGEND_GRAPHS = (StockGraph, ProfitGraph)
+
+
+def get_available_graph_layouts():
+    return list(GRAPH_LAYOUTS)
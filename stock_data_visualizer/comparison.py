@@ -0,0 +1,154 @@
+"""
+Comparison of stocks to a reference index, e.g., how a stock did relative to
+the S&P 500 during the chosen time frame.
+
+The index is aligned to the dates of a whole price panel at once and every
+ticker is compared to it with the same matrix operations, so comparing many
+tickers costs a single index series.
+"""
+
+import numpy as np
+
+
+COMPARISON_INDICES = {
+    "S&P 500": "^GSPC",
+    "Nasdaq Composite": "^IXIC",
+    "Dow Jones": "^DJI",
+    "OMX Stockholm 30": "^OMX",
+    "Nikkei 225": "^N225",
+    "DAX": "^GDAXI",
+    "FTSE 100": "^FTSE",
+}
+
+
+class ComparisonResult:
+    """
+    Comparison of the tickers of a panel to an index.
+
+    relative is a panel of every ticker relative to the index, both rebased to
+    100 on the first date the ticker has a value for. Returns are the total
+    returns between the first and last date of every ticker, index_returns the
+    returns of the index between the same dates. Betas are estimated from the
+    log returns between the trading days of every ticker.
+    """
+
+    def __init__(self, index_symbol, relative, returns, index_returns, betas):
+        self.index_symbol = index_symbol
+        self.relative = relative
+        self.tickers = relative.tickers
+        self.returns = returns
+        self.index_returns = index_returns
+        self.excess_returns = returns - index_returns
+        self.betas = betas
+
+    def rows(self):
+        """
+        Yields the ticker, return, index return, excess return and beta of
+        every ticker
+        """
+        yield from zip(
+            self.tickers,
+            self.returns.tolist(),
+            self.index_returns.tolist(),
+            self.excess_returns.tolist(),
+            self.betas.tolist(),
+        )
+
+
+class IndexComparison:
+    """
+    Compares panels of stocks to the values of an index
+    """
+
+    def __init__(self, index_symbol, dates, values):
+        self.index_symbol = index_symbol
+        self.dates = np.asarray(dates, dtype="datetime64[ns]")
+        self.values = np.asarray(values, dtype="float64")
+
+    def align(self, dates):
+        """
+        Returns the index values as of the given dates, i.e., the last value on
+        or before every date. Calendars of different exchanges don't have to
+        match, dates before the first index value are NaN.
+        """
+        dates = np.asarray(dates, dtype="datetime64[ns]")
+        if not len(self.values):
+            return np.full(len(dates), np.nan)
+        positions = np.searchsorted(self.dates, dates, side="right") - 1
+        return np.where(positions >= 0, self.values[np.maximum(positions, 0)], np.nan)
+
+    def compare(self, panel):
+        """
+        Returns the ComparisonResult of every ticker of panel
+        """
+        values = panel.values
+        if not len(values):
+            missing = np.full(values.shape[1], np.nan)
+            return ComparisonResult(self.index_symbol, panel, missing, missing, missing)
+
+        index_values = np.broadcast_to(self.align(panel.dates.values)[:, None], values.shape)
+        # Only the trading days of a ticker with an index value are compared
+        valid = ~np.isnan(values) & ~np.isnan(index_values)
+        has_valid = valid.any(axis=0)
+        columns = np.arange(values.shape[1])
+
+        first_rows = np.argmax(valid, axis=0)
+        last_rows = len(values) - 1 - np.argmax(valid[::-1], axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            first_values = np.where(has_valid, values[first_rows, columns], np.nan)
+            first_index_values = np.where(has_valid, index_values[first_rows, columns], np.nan)
+
+            relative = np.where(
+                valid,
+                100.0 * (values / first_values) / (index_values / first_index_values),
+                np.nan,
+            )
+            returns = values[last_rows, columns] / first_values - 1.0
+            index_returns = index_values[last_rows, columns] / first_index_values - 1.0
+
+        betas = estimate_betas(
+            log_returns_between_valid_rows(values, valid),
+            log_returns_between_valid_rows(index_values, valid),
+        )
+        return ComparisonResult(
+            self.index_symbol,
+            type(panel)(panel.dates, panel.tickers, relative, field=panel.field),
+            returns,
+            index_returns,
+            betas,
+        )
+
+
+def log_returns_between_valid_rows(values, valid):
+    """
+    Returns the log returns of every column from its previous valid row, rows
+    that aren't valid or have no previous valid row are NaN
+    """
+    rows = np.where(valid, np.arange(len(values))[:, None], -1)
+    last_valid_rows = np.maximum.accumulate(rows, axis=0)
+    previous_rows = np.vstack([np.full((1, values.shape[1]), -1), last_valid_rows[:-1]])
+    previous_values = np.take_along_axis(values, np.maximum(previous_rows, 0), axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(valid & (previous_rows >= 0), np.log(values / previous_values), np.nan)
+
+
+def estimate_betas(returns, index_returns):
+    """
+    Returns the beta of every column of returns against index_returns, i.e.,
+    their covariance divided by the variance of index_returns
+    """
+    mask = ~np.isnan(returns) & ~np.isnan(index_returns)
+    count = mask.sum(axis=0)
+    returns = np.where(mask, returns, 0.0)
+    index_returns = np.where(mask, index_returns, 0.0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        deviations = np.where(mask, returns - returns.sum(axis=0) / count, 0.0)
+        index_deviations = np.where(mask, index_returns - index_returns.sum(axis=0) / count, 0.0)
+        covariance = (deviations * index_deviations).sum(axis=0)
+        variance = (index_deviations * index_deviations).sum(axis=0)
+        return np.where((count > 1) & (variance > 0.0), covariance / variance, np.nan)
+
+
+def get_available_comparison_indices():
+    return list(COMPARISON_INDICES)
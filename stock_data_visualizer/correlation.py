@@ -0,0 +1,242 @@
+"""
+Correlations and covariances between the returns of many stocks.
+
+Stocks trading on different calendars are compared on the dates both of them
+have a return for, i.e., pairwise-complete. The sums the correlations are made
+of are kept per pair of stocks and computed with matrix products over blocks
+of stocks, so adding or removing a stock only computes its own row and column
+and the temporaries stay small even for a thousand stocks.
+"""
+
+import numpy as np
+
+
+# Stocks are multiplied against each other this many at a time
+BLOCK_SIZE = 256
+# Pairs of stocks with fewer returns on shared dates have no correlation
+MIN_PAIRED_RETURNS = 20
+
+
+class CorrelationMatrix:
+    """
+    Pairwise-complete correlations and covariances of the log returns of
+    stocks, updated incrementally as stocks are added and removed.
+
+    Returns are kept as a date by stock matrix, NaN where a stock has no
+    return. For every pair of stocks the count of shared returns and the sums
+    of their returns, squared returns and products over those are kept.
+    """
+
+    def __init__(self, block_size=BLOCK_SIZE, min_paired_returns=MIN_PAIRED_RETURNS):
+        self.block_size = block_size
+        self.min_paired_returns = min_paired_returns
+        self.tickers = []
+        self._dates = np.empty(0, dtype="datetime64[ns]")
+        self._returns = np.empty((0, 0))
+        # Sums over the shared returns of stocks i and j, sums and squares of
+        # the returns of stock i in row i
+        self._counts = np.empty((0, 0))
+        self._sums = np.empty((0, 0))
+        self._squares = np.empty((0, 0))
+        self._products = np.empty((0, 0))
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __contains__(self, ticker):
+        return ticker in self.tickers
+
+    def add(self, ticker, dates, values):
+        """
+        Adds or replaces the prices of a stock
+        """
+        self.add_many({ticker: (dates, values)})
+
+    def add_many(self, stock_prices):
+        """
+        Adds or replaces the prices of several stocks, given as a dict of
+        (dates, values) keyed by ticker. Adding many stocks at once is cheaper
+        than adding them one at a time.
+        """
+        self.remove_many([ticker for ticker in stock_prices if ticker in self.tickers])
+
+        stock_returns = {
+            ticker: log_returns(dates, values) for ticker, (dates, values) in stock_prices.items()
+        }
+        if not stock_returns:
+            return
+        self._align_dates(
+            np.concatenate([dates for dates, _ in stock_returns.values()])
+        )
+
+        count = len(self.tickers)
+        added = len(stock_returns)
+        self._reserve(count + added)
+        for n, (ticker, (dates, returns)) in enumerate(stock_returns.items()):
+            column = np.full(len(self._dates), np.nan)
+            column[self._dates.searchsorted(dates)] = returns
+            self._returns[:, count + n] = column
+            self.tickers.append(ticker)
+
+        # Only the rows and columns of the added stocks are computed
+        self._update_sums(count, count + added)
+
+    def remove(self, ticker):
+        self.remove_many([ticker])
+
+    def remove_many(self, tickers):
+        """
+        Removes several stocks, the remaining ones are moved together once
+        """
+        removed = set(tickers)
+        if not removed:
+            return
+        kept = [n for n, ticker in enumerate(self.tickers) if ticker not in removed]
+        self.tickers = [self.tickers[n] for n in kept]
+
+        count = len(kept)
+        self._returns[:, :count] = self._returns[:, kept]
+        for sums in (self._counts, self._sums, self._squares, self._products):
+            sums[:count, :count] = sums[np.ix_(kept, kept)]
+
+    def correlations(self):
+        """
+        Returns the correlation matrix of the stocks, in the order of tickers.
+        Pairs with too few shared returns are NaN.
+        """
+        count = len(self.tickers)
+        counts = self._counts[:count, :count]
+        sums = self._sums[:count, :count]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            covariance = self._products[:count, :count] - sums * sums.T / counts
+            variance = self._squares[:count, :count] - sums * sums / counts
+            correlations = covariance / np.sqrt(variance * variance.T)
+        correlations = np.clip(correlations, -1.0, 1.0)
+        correlations[counts < self.min_paired_returns] = np.nan
+        return correlations
+
+    def covariances(self):
+        """
+        Returns the covariance matrix of the daily log returns of the stocks
+        """
+        count = len(self.tickers)
+        counts = self._counts[:count, :count]
+        sums = self._sums[:count, :count]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            covariances = (self._products[:count, :count] - sums * sums.T / counts) / (
+                counts - 1
+            )
+        covariances[counts < self.min_paired_returns] = np.nan
+        return covariances
+
+    def _align_dates(self, dates):
+        # Dates new to the matrix get rows without returns of the stocks so far
+        dates = np.union1d(self._dates, np.asarray(dates, dtype="datetime64[ns]"))
+        if len(dates) == len(self._dates):
+            return
+        returns = np.full((len(dates), self._returns.shape[1]), np.nan)
+        returns[dates.searchsorted(self._dates)] = self._returns
+        self._dates = dates
+        self._returns = returns
+
+    def _reserve(self, count):
+        # Capacity doubles to keep adding stocks one at a time amortized
+        capacity = self._returns.shape[1]
+        if count <= capacity:
+            return
+        capacity = max(count, 2 * capacity)
+
+        returns = np.full((len(self._dates), capacity), np.nan)
+        returns[:, : len(self.tickers)] = self._returns[:, : len(self.tickers)]
+        self._returns = returns
+        for name in ("_counts", "_sums", "_squares", "_products"):
+            sums = np.zeros((capacity, capacity))
+            previous = getattr(self, name)
+            sums[: len(previous), : len(previous)] = previous
+            setattr(self, name, sums)
+
+    def _update_sums(self, start_column, end_column):
+        # Every block of new stocks is multiplied with the blocks of stocks
+        # before its end, pairs of two new stocks are computed once
+        for new_start in range(start_column, end_column, self.block_size):
+            new_slice = slice(new_start, min(new_start + self.block_size, end_column))
+            new_valid, new_returns = _split(self._returns[:, new_slice])
+
+            for start in range(0, new_slice.stop, self.block_size):
+                block_slice = slice(start, min(start + self.block_size, new_slice.stop))
+                valid, returns = _split(self._returns[:, block_slice])
+
+                counts = valid.T @ new_valid
+                products = returns.T @ new_returns
+                self._counts[block_slice, new_slice] = counts
+                self._counts[new_slice, block_slice] = counts.T
+                self._products[block_slice, new_slice] = products
+                self._products[new_slice, block_slice] = products.T
+                self._sums[block_slice, new_slice] = returns.T @ new_valid
+                self._sums[new_slice, block_slice] = new_returns.T @ valid
+                self._squares[block_slice, new_slice] = (returns * returns).T @ new_valid
+                self._squares[new_slice, block_slice] = (new_returns * new_returns).T @ valid
+
+
+def _split(returns):
+    # Returns the validity of the returns as floats and the returns with zeros
+    # in place of NaN, both multiply as BLAS matrices
+    valid = ~np.isnan(returns)
+    return valid.astype("float64"), np.where(valid, returns, 0.0)
+
+
+def log_returns(dates, values):
+    """
+    Returns the dates and the log returns between the valid values of a stock
+    """
+    dates = np.asarray(dates, dtype="datetime64[ns]")
+    values = np.asarray(values, dtype="float64")
+    valid = ~np.isnan(values) & (values > 0.0)
+    dates, values = dates[valid], values[valid]
+    return dates[1:], np.log(values[1:] / values[:-1])
+
+
+def cluster_order(correlations):
+    """
+    Returns the order of the stocks that places similar stocks next to each
+    other, the leaf order of an average linkage clustering with 1 - correlation
+    as the distance. Pairs without a correlation are as far as uncorrelated
+    stocks.
+    """
+    count = len(correlations)
+    if count < 3:
+        return np.arange(count)
+
+    distances = 1.0 - np.where(np.isnan(correlations), 0.0, correlations)
+    np.fill_diagonal(distances, np.inf)
+    sizes = np.ones(count)
+    leaves = [[n] for n in range(count)]
+    rows = np.arange(count)
+
+    # Every cluster remembers its nearest cluster, only the clusters whose
+    # nearest one was merged look for it again
+    nearest = distances.argmin(axis=1)
+    nearest_distances = distances[rows, nearest]
+    for _ in range(count - 1):
+        first = int(nearest_distances.argmin())
+        second = int(nearest[first])
+
+        merged = (sizes[first] * distances[first] + sizes[second] * distances[second]) / (
+            sizes[first] + sizes[second]
+        )
+        merged[[first, second]] = np.inf
+        distances[first], distances[:, first] = merged, merged
+        distances[second], distances[:, second] = np.inf, np.inf
+        sizes[first] += sizes[second]
+        leaves[first] += leaves[second]
+        leaves[second] = []
+        nearest_distances[second] = np.inf
+
+        stale = np.flatnonzero(
+            ((nearest == first) | (nearest == second) | (rows == first))
+            & np.isfinite(nearest_distances)
+        )
+        nearest[stale] = distances[stale].argmin(axis=1)
+        nearest_distances[stale] = distances[stale, nearest[stale]]
+
+    return np.array(leaves[first])
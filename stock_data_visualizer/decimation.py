@@ -0,0 +1,251 @@
+"""
+Level of detail for long time series, i.e., decimating the drawn points to
+what the canvas is able to show.
+"""
+
+import numpy as np
+
+
+# Series this short are always drawn in full
+MIN_DECIMATED_POINTS = 1000
+
+
+def date2num(dates):
+    """
+    Converts dates to the float days of Matplotlib date axes, Matplotlib is
+    only imported once there's something to draw
+    """
+    import matplotlib.dates as mdates
+
+    return mdates.date2num(dates)
+
+
+def minmax_indices(y, buckets):
+    """
+    Returns the indices of the first, the last, and the minimum and maximum
+    value of every bucket of y. Buckets hold an equal count of points, which
+    matches the evenly spaced bars of a trading calendar.
+    """
+    length = len(y)
+    if length <= 2 * buckets:
+        return np.arange(length)
+
+    bucket_size = -(-length // buckets)
+    padded_length = bucket_size * buckets
+    # NaN never gets picked as an extreme unless the whole bucket is missing
+    low = np.full(padded_length, np.inf)
+    high = np.full(padded_length, -np.inf)
+    low[:length] = np.where(np.isnan(y), np.inf, y)
+    high[:length] = np.where(np.isnan(y), -np.inf, y)
+
+    offsets = np.arange(buckets) * bucket_size
+    argmins = offsets + low.reshape(buckets, bucket_size).argmin(axis=1)
+    argmaxs = offsets + high.reshape(buckets, bucket_size).argmax(axis=1)
+
+    indices = np.concatenate(([0, length - 1], argmins, argmaxs))
+    return np.unique(indices[indices < length])
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Returns the indices of the points picked by the Largest-Triangle-Three-
+    Buckets algorithm, which keeps the visual shape of the series with
+    threshold points
+    """
+    length = len(y)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+
+    x = np.asarray(x, dtype="float64")
+    y = np.asarray(y, dtype="float64")
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, length - 1
+
+    # The first and the last point are kept, the rest are split into buckets
+    bucket_size = (length - 2) / (threshold - 2)
+    selected = 0
+    for n in range(threshold - 2):
+        start = int(n * bucket_size) + 1
+        end = int((n + 1) * bucket_size) + 1
+
+        # Average of the next bucket is the third corner of the triangles
+        next_end = min(int((n + 2) * bucket_size) + 1, length)
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+
+        areas = np.abs(
+            (x[selected] - next_x) * (y[start:end] - y[selected])
+            - (x[selected] - x[start:end]) * (next_y - y[selected])
+        )
+        areas[np.isnan(areas)] = -1.0
+        selected = start + int(areas.argmax())
+        indices[n + 1] = selected
+
+    return indices
+
+
+DECIMATION_METHODS = ("minmax", "lttb")
+
+
+class RingBuffer:
+    """
+    Fixed-size buffer of the latest values appended to it.
+
+    Every value is written twice, capacity apart, so the buffered values are
+    always a contiguous slice of the storage and view() doesn't copy.
+    """
+
+    def __init__(self, capacity, dtype="float64"):
+        if capacity < 1:
+            raise ValueError("Ring buffers need a capacity of at least one value")
+        self.capacity = capacity
+        self._data = np.empty(2 * capacity, dtype=dtype)
+        self._position = 0
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def extend(self, values):
+        values = np.asarray(values, dtype=self._data.dtype)[-self.capacity :]
+        count = len(values)
+        if not count:
+            return
+
+        positions = (self._position + np.arange(count)) % self.capacity
+        self._data[positions] = values
+        self._data[positions + self.capacity] = values
+        self._position = (self._position + count) % self.capacity
+        self._length = min(self._length + count, self.capacity)
+
+    def view(self):
+        """
+        Returns the buffered values, oldest first, as a view of the buffer
+        """
+        end = self._position + self.capacity
+        return self._data[end - self._length : end]
+
+    def clear(self):
+        self._position = 0
+        self._length = 0
+
+
+class LineDecimator:
+    """
+    Keeps the full data of lines drawn on the axes and shows only the points
+    the visible x range and the width of the axes call for. Lines are
+    decimated again whenever the view is zoomed, panned or resized, so zooming
+    in shows the full detail again.
+    """
+
+    def __init__(self, axes, method="minmax", points_per_pixel=2):
+        if method not in DECIMATION_METHODS:
+            raise ValueError(f"Unknown decimation method '{method}'")
+        self.axes = axes
+        self.method = method
+        self.points_per_pixel = points_per_pixel
+        self._lines = {}
+        # Ring buffers of the lines that are appended to
+        self._buffers = {}
+
+        self.connect_axes(axes)
+        if axes.figure.canvas is not None:
+            axes.figure.canvas.mpl_connect("resize_event", self._on_view_changed)
+
+    def connect_axes(self, axes):
+        """
+        Follows the view of axes sharing the x axis, e.g., a twinx() of the axes
+        """
+        axes.callbacks.connect("xlim_changed", self._on_view_changed)
+
+    def add(self, line, dates, values):
+        """
+        Starts decimating line, dates and values are its full data
+        """
+        dates = np.asarray(dates)
+        x = date2num(dates) if np.issubdtype(dates.dtype, np.datetime64) else dates
+        self._lines[line] = (np.asarray(x, dtype="float64"), dates, np.asarray(values))
+        self._buffers.pop(line, None)
+        self._update_line(line, *self._get_view())
+
+    def extend(self, line, dates, values, capacity):
+        """
+        Appends points to the full data of line, keeping its latest capacity
+        points. Only the appended dates are converted.
+        """
+        dates = np.asarray(dates)
+        buffers = self._buffers.get(line)
+        if buffers is None:
+            x, line_dates, line_values = self._lines.get(
+                line, (np.empty(0), dates[:0], np.empty(0))
+            )
+            buffers = (
+                RingBuffer(capacity),
+                RingBuffer(capacity, line_dates.dtype),
+                RingBuffer(capacity, line_values.dtype),
+            )
+            for buffer, data in zip(buffers, (x, line_dates, line_values)):
+                buffer.extend(data)
+            self._buffers[line] = buffers
+
+        x = date2num(dates) if np.issubdtype(dates.dtype, np.datetime64) else dates
+        for buffer, data in zip(buffers, (x, dates, values)):
+            buffer.extend(data)
+        self._lines[line] = tuple(buffer.view() for buffer in buffers)
+        self._update_line(line, *self._get_view())
+
+    def remove(self, line):
+        self._lines.pop(line, None)
+        self._buffers.pop(line, None)
+
+    def set_data(self, line, dates, values):
+        """
+        Replaces the full data of a decimated line
+        """
+        self.add(line, dates, values)
+
+    def data_limits(self, axes):
+        """
+        Returns the (x_min, x_max, y_min, y_max) limits of the full data of the
+        lines drawn on axes, or None when there's nothing to limit
+        """
+        limits = []
+        for line, (x, _, values) in self._lines.items():
+            if line.axes is not axes or len(x) == 0 or np.isnan(values).all():
+                continue
+            limits.append((x[0], x[-1], np.nanmin(values), np.nanmax(values)))
+
+        if not limits:
+            return None
+        limits = np.array(limits)
+        return limits[:, 0].min(), limits[:, 1].max(), limits[:, 2].min(), limits[:, 3].max()
+
+    def update(self):
+        view = self._get_view()
+        for line in list(self._lines):
+            self._update_line(line, *view)
+
+    def _on_view_changed(self, *args):
+        self.update()
+
+    def _get_view(self):
+        x_min, x_max = self.axes.get_xlim()
+        width = max(1, int(self.axes.bbox.width))
+        return x_min, x_max, width * self.points_per_pixel
+
+    def _update_line(self, line, x_min, x_max, max_points):
+        x, dates, values = self._lines[line]
+
+        # The points just outside of the view keep the line running to the edges
+        start = max(0, int(np.searchsorted(x, x_min, side="left")) - 1)
+        end = min(len(x), int(np.searchsorted(x, x_max, side="right")) + 1)
+        visible = end - start
+
+        if visible <= max(max_points, MIN_DECIMATED_POINTS):
+            indices = np.arange(start, end)
+        elif self.method == "lttb":
+            indices = start + lttb_indices(x[start:end], values[start:end], max_points)
+        else:
+            indices = start + minmax_indices(values[start:end], max_points // 2)
+
+        line.set_data(dates[indices], values[indices])
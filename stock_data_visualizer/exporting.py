@@ -0,0 +1,260 @@
+"""
+Bulk export of fetched stock data into Parquet, Arrow IPC or CSV files.
+
+Every format is compressed, Parquet and Arrow with zstd and CSV with gzip.
+Exports are written in long format, a row per ticker and date with the OHLCV
+bars and the normalized or derived series next to them. Every ticker is
+written as its own chunk, i.e., a Parquet row group, an Arrow record batch or
+a run of CSV lines, as soon as it's fetched, so the concatenated frame of all
+tickers never exists in memory.
+"""
+
+import os
+import pathlib
+import numpy as np
+
+from analytics import INDICATORS, IndicatorSeries
+from normalization import NormalizationMode
+from tracing import span
+
+
+EXPORT_FORMATS = ("parquet", "arrow", "csv")
+EXPORT_SUFFIXES = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+    ".csv": "csv",
+}
+EXPORT_FIELDS = ("Open", "High", "Low", "Close", "Adj Close", "Volume")
+NORMALIZED_COLUMN = "Normalized"
+# Zstandard is read by pandas, polars, DuckDB and Spark alike
+EXPORT_COMPRESSION = "zstd"
+# Tickers fetched at a time, fetched stock data is held until it's written
+EXPORT_BATCH_SIZE = 32
+
+
+def get_export_format(output_file):
+    """
+    Returns the export format of a file by its suffix, with or without the
+    '.gz' of CSV exports, e.g., 'stocks.csv.gz'
+    """
+    suffixes = pathlib.Path(output_file).suffixes
+    if suffixes and suffixes[-1].lower() == ".gz":
+        suffixes = suffixes[:-1]
+        if suffixes and suffixes[-1].lower() == ".csv":
+            return "csv"
+    if suffixes and suffixes[-1].lower() in EXPORT_SUFFIXES:
+        return EXPORT_SUFFIXES[suffixes[-1].lower()]
+    raise ValueError(f"Unknown export format of '{output_file}'")
+
+
+def get_export_file(output_file, export_format=None):
+    """
+    Returns the file an export to output_file is written to, CSV exports are
+    gzipped and get a '.gz' suffix when they don't have one
+    """
+    if export_format is None:
+        export_format = get_export_format(output_file)
+    output_file = str(output_file)
+    if export_format == "csv" and not output_file.lower().endswith(".gz"):
+        output_file += ".gz"
+    return output_file
+
+
+def get_export_columns(normalization=NormalizationMode.NONE, indicator=None):
+    """
+    Returns the columns of an export, the same for every ticker
+    """
+    columns = ["Date", "Ticker", *EXPORT_FIELDS]
+    if normalization != NormalizationMode.NONE:
+        columns.append(NORMALIZED_COLUMN)
+    if indicator is not None:
+        columns.append(indicator)
+    return columns
+
+
+def export_frame(
+    ticker,
+    stock_data_df,
+    normalization=NormalizationMode.NONE,
+    indicator=None,
+    field="Close",
+    comparison=None,
+):
+    """
+    Returns the export rows of one ticker, the normalized and the indicator
+    series are derived from its field. Exports relative to an index take the
+    IndexComparison of the index.
+    """
+    import pandas as pd
+    from panel import PricePanel
+
+    dates = pd.DatetimeIndex(stock_data_df.index)
+    export_df = pd.DataFrame({"Date": dates, "Ticker": ticker})
+    for export_field in EXPORT_FIELDS:
+        if export_field in stock_data_df:
+            export_df[export_field] = stock_data_df[export_field].to_numpy(dtype="float64")
+        else:
+            export_df[export_field] = np.nan
+
+    values = export_df[field].to_numpy()
+    if normalization != NormalizationMode.NONE:
+        panel = PricePanel(dates, [ticker], values[:, np.newaxis], field=field)
+        if normalization == NormalizationMode.RELATIVE:
+            panel = comparison.compare(panel).relative
+        else:
+            panel = panel.normalized(normalization)
+        export_df[NORMALIZED_COLUMN] = panel.column(ticker)
+    if indicator is not None:
+        # Indicators skip missing bars like the charts do
+        valid = ~np.isnan(values)
+        series = IndicatorSeries(INDICATORS[indicator]())
+        indicator_values = np.full(len(values), np.nan)
+        indicator_values[valid] = series.append(dates[valid], values[valid])
+        export_df[indicator] = indicator_values
+    return export_df
+
+
+def export_stock_data(
+    sdh,
+    stock_tickers,
+    time_frame,
+    output_file,
+    export_format=None,
+    normalization=NormalizationMode.NONE,
+    indicator=None,
+    end_time=None,
+    field="Close",
+    comparison_index=None,
+):
+    """
+    Fetches the stock data of the tickers and writes it chunk by chunk to the
+    file get_export_file() returns for output_file, yielding the FetchResult
+    of every ticker once it's written. Exports relative to an index need the
+    symbol of the index as comparison_index, the index is fetched once.
+
+    Tickers are fetched in batches of EXPORT_BATCH_SIZE, which bounds the
+    stock data held in memory also for providers reading all tickers at once,
+    and written in the order they're fetched. The file is replaced
+    only when every ticker has been written, closing the generator early
+    leaves an existing file as it was.
+    """
+    if export_format is None:
+        export_format = get_export_format(output_file)
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{export_format}'")
+
+    if end_time is None:
+        # Every batch and the index end at the same time
+        _, end_time = sdh.convert_time_frame_to_datetime(time_frame)
+    comparison = None
+    if normalization == NormalizationMode.RELATIVE:
+        if comparison_index is None:
+            raise ValueError("Exports relative to an index need the index to compare to")
+        comparison = sdh.get_index_comparison(comparison_index, time_frame, end_time, field)
+
+    output_file = get_export_file(output_file, export_format)
+    columns = get_export_columns(normalization, indicator)
+    temporary_file = f"{output_file}.tmp"
+    if export_format == "parquet":
+        writer = _ParquetWriter(temporary_file, columns)
+    elif export_format == "arrow":
+        writer = _ArrowWriter(temporary_file, columns)
+    else:
+        writer = _CsvWriter(temporary_file, columns)
+
+    stock_tickers = list(dict.fromkeys(stock_tickers))
+    try:
+        for start in range(0, len(stock_tickers), EXPORT_BATCH_SIZE):
+            results = sdh.iter_many(
+                stock_tickers[start : start + EXPORT_BATCH_SIZE], time_frame, end_time=end_time
+            )
+            try:
+                for result in results:
+                    if result.ok and len(result.data):
+                        with span("export_stock", "data", ticker=result.ticker):
+                            export_df = export_frame(
+                                result.ticker,
+                                result.data,
+                                normalization,
+                                indicator,
+                                field,
+                                comparison,
+                            )
+                            writer.write(export_df[columns])
+                    yield result
+            finally:
+                results.close()
+    except BaseException:
+        writer.close()
+        os.remove(temporary_file)
+        raise
+    writer.close()
+    # Readers never see a partially written export
+    os.replace(temporary_file, output_file)
+
+
+class _ParquetWriter:
+    def __init__(self, path, columns):
+        import pyarrow.parquet as pq
+
+        self._schema = _get_arrow_schema(columns)
+        self._writer = pq.ParquetWriter(path, self._schema, compression=EXPORT_COMPRESSION)
+
+    def write(self, export_df):
+        import pyarrow as pa
+
+        self._writer.write_table(
+            pa.Table.from_pandas(export_df, schema=self._schema, preserve_index=False)
+        )
+
+    def close(self):
+        self._writer.close()
+
+
+class _ArrowWriter:
+    def __init__(self, path, columns):
+        import pyarrow as pa
+
+        self._schema = _get_arrow_schema(columns)
+        self._sink = pa.OSFile(path, "wb")
+        self._writer = pa.ipc.new_file(
+            self._sink,
+            self._schema,
+            options=pa.ipc.IpcWriteOptions(compression=EXPORT_COMPRESSION),
+        )
+
+    def write(self, export_df):
+        import pyarrow as pa
+
+        self._writer.write_batch(
+            pa.RecordBatch.from_pandas(export_df, schema=self._schema, preserve_index=False)
+        )
+
+    def close(self):
+        self._writer.close()
+        self._sink.close()
+
+
+class _CsvWriter:
+    def __init__(self, path, columns):
+        import gzip
+
+        # The level of the gzip tool, the maximum takes longer for little gain
+        self._file = gzip.open(path, "wt", newline="", compresslevel=6)
+        self._file.write(",".join(columns) + "\n")
+
+    def write(self, export_df):
+        export_df.to_csv(self._file, header=False, index=False, date_format="%Y-%m-%d %H:%M:%S")
+
+    def close(self):
+        self._file.close()
+
+
+def _get_arrow_schema(columns):
+    import pyarrow as pa
+
+    types = {"Date": pa.timestamp("ns"), "Ticker": pa.string()}
+    return pa.schema([(column, types.get(column, pa.float64())) for column in columns])
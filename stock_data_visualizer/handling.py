@@ -3,72 +3,361 @@ Handles communicating with different stock APIs
 """
 
 
-import pandas_datareader as pdd
+import time
+import random
+import threading
+import urllib.error
 import pandas as pd
-from enum import Enum
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 
+from caching import CachePolicy, StockDataCache
+from comparison import IndexComparison
+from providers import StockDataProvider, get_provider
+from store import DEFAULT_MEMORY_BUDGET, SeriesStore
+from symbols import get_stock_validity
+from time_frames import (
+    DAILY_INTERVAL,
+    CustomTimeFrame,
+    StockTimeFrame,
+    get_available_time_frames,
+    get_time_frame_interval,
+)
+from tracing import span, count, is_tracing_enabled
+
 
 MIN_READABLE_YEAR = 1971
+DEFAULT_PROVIDER = "yahoo"
+MAX_FETCH_WORKERS = 8
+# Failed requests that may pass are sent this many times in total, waiting
+# about twice as long after every failure
+MAX_FETCH_ATTEMPTS = 4
+RETRY_BASE_DELAY = 0.5
+RETRY_MAX_DELAY = 8.0
+
+
+class FetchResult:
+    """
+    Outcome of fetching the stock data of a single ticker, error is the
+    FetchError of a failed fetch
+    """
+
+    def __init__(self, ticker, data=None, error=None):
+        self.ticker = ticker
+        self.data = data if data is not None else pd.DataFrame()
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = "ok" if self.ok else f"error={self.error!r}"
+        return f"FetchResult({self.ticker!r}, rows={len(self.data)}, {status})"
+
+
+class FetchError(Exception):
+    """
+    Structured failure of fetching stock data.
+
+    kind tells what went wrong and whether retrying could help, status is the
+    HTTP status of the failed response if there was one, retry_after the
+    seconds the source asked to wait before the next request and attempts how
+    many times the request was sent. ticker is None for requests of several
+    tickers.
+    """
+
+    THROTTLED = "throttled"
+    UNAVAILABLE = "unavailable"
+    NOT_FOUND = "not found"
+    NO_DATA = "no data"
+    FAILED = "failed"
+
+    RETRYABLE_KINDS = (THROTTLED, UNAVAILABLE)
+
+    def __init__(self, ticker, kind, message, status=None, retry_after=None, attempts=1):
+        super().__init__(message)
+        self.ticker = ticker
+        self.kind = kind
+        self.status = status
+        self.retry_after = retry_after
+        self.attempts = attempts
+
+    @property
+    def retryable(self):
+        return self.kind in self.RETRYABLE_KINDS
+
+    def __str__(self):
+        message = super().__str__()
+        if self.attempts > 1:
+            message += f" (gave up after {self.attempts} attempts)"
+        return message
+
+    def __repr__(self):
+        return (
+            f"FetchError({self.ticker!r}, {self.kind!r}, {super().__str__()!r}, "
+            f"status={self.status}, attempts={self.attempts})"
+        )
+
+    @classmethod
+    def from_exception(cls, ticker, error, attempts=1):
+        """
+        Returns the FetchError of an exception raised while fetching
+        """
+        if isinstance(error, FetchError):
+            return error
+
+        status = retry_after = None
+        if isinstance(error, urllib.error.HTTPError):
+            status = error.code
+            retry_after = _parse_retry_after(error.headers)
+            if status == 429:
+                kind = cls.THROTTLED
+            elif status == 404:
+                kind = cls.NOT_FOUND
+            elif status == 408 or status >= 500:
+                kind = cls.UNAVAILABLE
+            else:
+                kind = cls.FAILED
+        elif isinstance(error, FileNotFoundError):
+            kind = cls.NOT_FOUND
+        elif isinstance(error, OSError):
+            # Connection failures, timeouts and failed reads of the readers
+            kind = cls.UNAVAILABLE
+        elif isinstance(error, (LookupError, ValueError)):
+            kind = cls.NO_DATA
+        else:
+            kind = cls.FAILED
+
+        message = str(error) or type(error).__name__
+        fetch_error = cls(ticker, kind, message, status, retry_after, attempts)
+        fetch_error.__cause__ = error
+        return fetch_error
+
 
+def _parse_retry_after(headers):
+    # Only the delay in seconds is used, HTTP dates fall back to the backoff
+    try:
+        return max(0.0, float(headers.get("Retry-After")))
+    except (AttributeError, TypeError, ValueError):
+        return None
 
-class StockTimeFrame(Enum):
+
+class TokenBucket:
+    """
+    Token bucket rate limit, rate tokens are added per second up to capacity
+    and every request takes one. A source throttling requests holds the
+    bucket empty for as long as it asked to be left alone.
     """
-    Available stock time frames
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(capacity)
+        self._updated = clock()
+        self._held_until = self._updated
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Takes a token, waiting for one if there are none left
+        """
+        while True:
+            with self._lock:
+                now = self._clock()
+                wait = self._held_until - now
+                if wait <= 0.0:
+                    self._tokens = min(
+                        self.capacity, self._tokens + (now - self._updated) * self.rate
+                    )
+                    self._updated = now
+                    if self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        return
+                    wait = (1.0 - self._tokens) / self.rate
+
+            with span("rate_limit", "network"):
+                self._sleep(wait)
+
+    def hold(self, seconds):
+        with self._lock:
+            held_until = self._clock() + seconds
+            if held_until > self._held_until:
+                # Tokens are only added again once the hold is over
+                self._held_until = self._updated = held_until
+                self._tokens = 0.0
+
+
+class FetchScheduler:
     """
+    Schedules the requests sent to a provider.
 
-    YTD = 0
-    DAY = 1
-    WEEK = 2
-    YEAR1 = 3
-    YEAR3 = 4
-    YEAR5 = 5
-    MAX = 6
-    CUSTOM = 7
-
-    @staticmethod
-    def from_str(label):
-        if label in ('YTD'):
-            return StockTimeFrame.YTD
-        elif label in ('1 Day'):
-            return StockTimeFrame.DAY
-        elif label in ('1 Week'):
-            return StockTimeFrame.WEEK
-        elif label in ('1 Year'):
-            return StockTimeFrame.YEAR1
-        elif label in ('3 Years'):
-            return StockTimeFrame.YEAR3
-        elif label in ('5 Years'):
-            return StockTimeFrame.YEAR5
-        elif label in ('Max'):
-            return StockTimeFrame.MAX
-        elif label in ('Custom'):
-            raise NotImplementedError
+    Concurrent requests with the same key, e.g., of the same ticker and range,
+    share the response of the first one. Requests wait for a token of the
+    rate limit when there is one. Requests failing in a way that may pass are
+    sent again after a jittered exponential backoff, or after the delay a
+    throttling source asked for. Failures are raised as FetchErrors.
+    """
+
+    def __init__(
+        self,
+        rate=None,
+        burst=MAX_FETCH_WORKERS,
+        max_attempts=MAX_FETCH_ATTEMPTS,
+        base_delay=RETRY_BASE_DELAY,
+        max_delay=RETRY_MAX_DELAY,
+        clock=time.monotonic,
+        sleep=time.sleep,
+        jitter=random.random,
+    ):
+        self.bucket = TokenBucket(rate, burst, clock, sleep) if rate else None
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._jitter = jitter
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def request(self, key, read, ticker=None):
+        """
+        Returns what read() returns, requests with a key that is already in
+        flight wait for it instead of calling read
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            is_first = future is None
+            if is_first:
+                future = self._in_flight[key] = Future()
+        if not is_first:
+            count("requests_coalesced")
+            return future.result()
+
+        try:
+            result = self._send(read, ticker)
+        except BaseException as error:
+            future.set_exception(error)
+            raise
         else:
-            raise NotImplementedError
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def get_delay(self, attempt, retry_after=None):
+        """
+        Returns the seconds to wait before sending a request again after its
+        attempt failed, a random share of the exponential backoff spreads the
+        retries of concurrent requests
+        """
+        backoff = self._jitter() * min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        if retry_after is not None:
+            return max(retry_after, backoff)
+        return backoff
+
+    def _send(self, read, ticker):
+        for attempt in range(1, self.max_attempts + 1):
+            if self.bucket is not None:
+                self.bucket.acquire()
+            try:
+                return read()
+            except Exception as error:
+                fetch_error = FetchError.from_exception(ticker, error, attempt)
+                if fetch_error.kind == FetchError.THROTTLED:
+                    count("throttled_responses")
+                if not fetch_error.retryable or attempt == self.max_attempts:
+                    raise fetch_error
+
+            delay = self.get_delay(attempt, fetch_error.retry_after)
+            if fetch_error.kind == FetchError.THROTTLED and self.bucket is not None:
+                # Every other request waits for the source too
+                self.bucket.hold(delay)
+            count("request_retries")
+            with span("retry_backoff", "network", ticker=ticker, attempt=attempt):
+                self._sleep(delay)
 
-def get_available_time_frames():
-    return ["YTD", "1 Day", "1 Week", "1 Year", "3 Years", "5 Years", "Max", "Custom"]
 
 class StockDataHandling:
     """
     Stock data handling class
     """
 
-    def __init__(self):
-        pass
+    def __init__(
+        self,
+        cache_file=None,
+        cache_policy=None,
+        reader=None,
+        provider=DEFAULT_PROVIDER,
+        memory_budget=DEFAULT_MEMORY_BUDGET,
+        price_dtype="float64",
+        scheduler=None,
+    ):
+        # Provider is either a registered provider name or a provider instance
+        if not isinstance(provider, StockDataProvider):
+            provider = get_provider(provider)
+        self._provider = provider
+
+        # reader(stock_ticker, start_time, end_time) replaces the provider's read
+        self._reader = reader if reader is not None else provider.read
+        self._bulk_reads = provider.supports_bulk and reader is None
+        self._intraday_reads = provider.supports_intraday and reader is None
+
+        self._policy = cache_policy if cache_policy is not None else CachePolicy()
+        self._cache = None
+        if cache_file is not None and provider.cacheable:
+            self._cache = StockDataCache(cache_file, policy=self._policy)
+
+        # Daily bars are kept in memory in front of the disk cache, no budget
+        # keeps nothing in memory. Without a disk cache, series evicted from
+        # memory are fetched from the provider again.
+        self._store = None
+        if memory_budget is not None:
+            self._store = SeriesStore(memory_budget, price_dtype, policy=self._policy)
+
+        # Requests are coalesced, rate limited as the provider asks and retried
+        self._scheduler = scheduler
+        if scheduler is None:
+            self._scheduler = FetchScheduler(provider.request_rate, provider.request_burst)
+
+        # Index series shared by every comparison, keyed by index symbol and interval
+        self._index_series = {}
+        self._index_lock = threading.Lock()
+
+    @property
+    def provider(self):
+        return self._provider
+
+    @property
+    def store(self):
+        return self._store
+
+    @property
+    def scheduler(self):
+        return self._scheduler
 
     def get_available_time_frames(self):
         return STOCK_TIME_FRAMES
 
-    def convert_time_frame_to_datetime(self, time_frame):
-        end_time = datetime.now()
+    def convert_time_frame_to_datetime(self, time_frame, end_time=None):
+        if isinstance(time_frame, CustomTimeFrame):
+            return time_frame.start_time, time_frame.end_time
+        elif time_frame == StockTimeFrame.CUSTOM:
+            raise ValueError("Custom time frames need their dates, use a CustomTimeFrame")
+
+        # Time frames end now unless they are pinned to an end time
+        if end_time is None:
+            end_time = datetime.now()
         start_time = end_time
 
         if time_frame == StockTimeFrame.YTD:
             start_time = datetime(end_time.year, 1, 1)
         elif time_frame == StockTimeFrame.DAY:
-            start_time = datetime(end_time.year, end_time.month, end_time.day)
+            # The latest session, on weekends the one of the last business day
+            session = pd.offsets.BDay().rollback(pd.Timestamp(end_time.date()))
+            start_time = session.to_pydatetime()
         elif time_frame == StockTimeFrame.WEEK:
             start_time = end_time - timedelta(days=7)
         elif time_frame == StockTimeFrame.YEAR1:
@@ -109,25 +398,286 @@ class StockDataHandling:
 
         return start_time, end_time
 
+    def is_within(self, time_frame, start_time, end_time, end=None):
+        """
+        Returns whether the time frame lies within the daily bars read between
+        start_time and end_time, i.e., it can be sliced out of them instead of
+        being fetched. end pins the end of the time frame like end_time of
+        convert_time_frame_to_datetime().
+        """
+        if self.get_interval(time_frame) != DAILY_INTERVAL:
+            return False
+        frame_start, frame_end = self.convert_time_frame_to_datetime(time_frame, end)
+        return not (
+            self._policy.is_head_missing(start_time, frame_start)
+            or self._policy.is_tail_stale(end_time, frame_end)
+        )
+
+    def get_interval(self, time_frame):
+        """
+        Returns the interval of the bars the time frame is read with, providers
+        without intraday bars fall back to daily bars
+        """
+        if not self._intraday_reads:
+            return DAILY_INTERVAL
+        return get_time_frame_interval(time_frame)
+
     def get_yahoo_stock(self, stock_ticker, time_frame):
-        start_time, end_time = self.convert_time_frame_to_datetime(time_frame)
+        """
+        Returns the stock data of the ticker during the time frame, failures
+        are raised as FetchErrors
+        """
+        with span("get_yahoo_stock", "data", ticker=stock_ticker):
+            start_time, end_time = self.convert_time_frame_to_datetime(time_frame)
+            interval = self.get_interval(time_frame)
+            try:
+                return self._fetch(stock_ticker, start_time, end_time, interval)
+            except Exception as error:
+                raise FetchError.from_exception(stock_ticker, error)
+
+    def get_index_comparison(self, index_symbol, time_frame, end_time=None, field="Close"):
+        """
+        Returns an IndexComparison against the index during the time frame.
+
+        The index is fetched once and shared by every comparison, comparisons
+        within an already fetched range slice the fetched series.
+        """
+        start_time, end_time = self.convert_time_frame_to_datetime(time_frame, end_time)
+        interval = self.get_interval(time_frame)
+
+        # Concurrent comparisons wait for the first one to fetch the index
+        with self._index_lock:
+            series = self._index_series.get((index_symbol, interval))
+            if (
+                series is None
+                or series[0] > start_time
+                or series[1].date() < end_time.date()
+            ):
+                index_df = self._fetch(index_symbol, start_time, end_time, interval)
+                if field not in index_df or index_df.empty:
+                    raise LookupError(f"No stock data for index '{index_symbol}'")
+                series = (
+                    start_time,
+                    end_time,
+                    index_df.index.values.astype("datetime64[ns]"),
+                    index_df[field].to_numpy(dtype="float64"),
+                )
+                self._index_series[index_symbol, interval] = series
+
+        _, _, dates, values = series
+        # Whole days are included like the readers do
+        start = dates.searchsorted(pd.Timestamp(start_time).normalize().to_datetime64())
+        end = dates.searchsorted(pd.Timestamp(end_time).to_datetime64(), side="right")
+        return IndexComparison(index_symbol, dates[start:end], values[start:end])
+
+    def get_many(
+        self, stock_tickers, time_frame, max_workers=MAX_FETCH_WORKERS, end_time=None
+    ):
+        """
+        Fetches the stock data of several tickers concurrently.
+
+        Returns a dict of FetchResult objects keyed by ticker, in the order the
+        tickers were given.
+        """
+        stock_tickers = list(dict.fromkeys(stock_tickers))
+        results = {
+            result.ticker: result
+            for result in self.iter_many(stock_tickers, time_frame, max_workers, end_time)
+        }
+        return {stock_ticker: results[stock_ticker] for stock_ticker in stock_tickers}
+
+    def iter_many(
+        self, stock_tickers, time_frame, max_workers=MAX_FETCH_WORKERS, end_time=None
+    ):
+        """
+        Fetches the stock data of several tickers concurrently and yields a
+        FetchResult for each ticker as soon as it is done.
+
+        Closing the generator early cancels the fetches that haven't started.
+        """
+        start_time, end_time = self.convert_time_frame_to_datetime(time_frame, end_time)
+        interval = self.get_interval(time_frame)
+        stock_tickers = list(dict.fromkeys(stock_tickers))
+        if not stock_tickers:
+            return
+
+        if self._bulk_reads and interval == DAILY_INTERVAL:
+            yield from self._iter_bulk(stock_tickers, start_time, end_time)
+            return
+
+        workers = max(1, min(max_workers, len(stock_tickers)))
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            futures = [
+                executor.submit(
+                    self._fetch_result, stock_ticker, start_time, end_time, interval
+                )
+                for stock_ticker in stock_tickers
+            ]
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _iter_bulk(self, stock_tickers, start_time, end_time):
+        if self._store is not None:
+            remaining_tickers = []
+            for stock_ticker in stock_tickers:
+                stock_data_df = self._store.get(
+                    stock_ticker, self._provider.source, start_time, end_time
+                )
+                if stock_data_df is None:
+                    remaining_tickers.append(stock_ticker)
+                else:
+                    yield FetchResult(stock_ticker, data=stock_data_df)
+            stock_tickers = remaining_tickers
+            if not stock_tickers:
+                return
+
+        # Everything that isn't cached yet is read with one request
+        missing_ranges = {
+            stock_ticker: self._get_missing_ranges(stock_ticker, start_time, end_time)
+            for stock_ticker in stock_tickers
+        }
+        fetched_tickers = [ticker for ticker, ranges in missing_ranges.items() if ranges]
+        fetched_data, fetch_error = {}, None
+
+        if fetched_tickers:
+            fetch_start = min(start for ranges in missing_ranges.values() for start, _ in ranges)
+            fetch_end = max(end for ranges in missing_ranges.values() for _, end in ranges)
+
+            def read_many():
+                with span("read_many", "network", tickers=len(fetched_tickers)):
+                    fetched_data = self._provider.read_many(
+                        fetched_tickers, fetch_start, fetch_end
+                    )
+                for stock_data_df in fetched_data.values():
+                    _count_fetched(stock_data_df)
+                return fetched_data
+
+            try:
+                fetched_data = self._scheduler.request(
+                    _request_key(tuple(fetched_tickers), fetch_start, fetch_end, DAILY_INTERVAL),
+                    read_many,
+                )
+            except FetchError as error:
+                fetch_error = error
+
+        for stock_ticker in stock_tickers:
+            if stock_ticker in fetched_tickers and stock_ticker not in fetched_data:
+                error = fetch_error or FetchError(
+                    stock_ticker, FetchError.NO_DATA, f"No stock data for '{stock_ticker}'"
+                )
+                yield FetchResult(stock_ticker, error=error)
+                continue
+
+            if self._cache is None:
+                stock_data_df = fetched_data[stock_ticker]
+            else:
+                if stock_ticker in fetched_data:
+                    self._cache.store(
+                        stock_ticker,
+                        self._provider.source,
+                        fetched_data[stock_ticker],
+                        fetch_start,
+                        fetch_end,
+                    )
+                stock_data_df = self._cache.read(
+                    stock_ticker, self._provider.source, start_time, end_time
+                )
+            yield FetchResult(
+                stock_ticker, data=self._keep(stock_ticker, stock_data_df, start_time, end_time)
+            )
+
+    def _get_missing_ranges(self, stock_ticker, start_time, end_time):
+        if self._cache is None:
+            return [(start_time, end_time)]
+        return self._cache.get_missing_ranges(
+            stock_ticker, self._provider.source, start_time, end_time
+        )
+
+    def _fetch_result(self, stock_ticker, start_time, end_time, interval=DAILY_INTERVAL):
         try:
-            data_df = pdd.DataReader(stock_ticker, "yahoo", start_time, end_time)
-            return data_df
-        except:
-            print(f"Couldn't read '{stock_ticker}' stock data.")
-            return pd.DataFrame()
+            return FetchResult(
+                stock_ticker, data=self._fetch(stock_ticker, start_time, end_time, interval)
+            )
+        except Exception as error:
+            return FetchResult(stock_ticker, error=FetchError.from_exception(stock_ticker, error))
+
+    def _fetch(self, stock_ticker, start_time, end_time, interval=DAILY_INTERVAL):
+        with span("fetch", "data", ticker=stock_ticker):
+            # Only daily bars are cached, intraday bars are read every time
+            if interval != DAILY_INTERVAL:
+                return self._read(stock_ticker, start_time, end_time, interval)
+
+            if self._store is not None:
+                stock_data_df = self._store.get(
+                    stock_ticker, self._provider.source, start_time, end_time
+                )
+                if stock_data_df is not None:
+                    return stock_data_df
+
+            if self._cache is not None:
+                stock_data_df = self._cache.get(
+                    stock_ticker, self._provider.source, start_time, end_time, self._read
+                )
+            else:
+                stock_data_df = self._read(stock_ticker, start_time, end_time)
+            return self._keep(stock_ticker, stock_data_df, start_time, end_time)
+
+    def _keep(self, stock_ticker, stock_data_df, start_time, end_time):
+        # Returns the fetched bars as kept in memory, sharing the stored arrays
+        if self._store is None or stock_data_df.empty:
+            return stock_data_df
+        return self._store.put(
+            stock_ticker, self._provider.source, stock_data_df, start_time, end_time
+        )
+
+    def read_bars(self, stock_ticker, start_time, end_time, interval=DAILY_INTERVAL):
+        """
+        Reads bars of the given interval from the provider, bypassing the cache
+        """
+        return self._read(stock_ticker, start_time, end_time, interval)
+
+    def _read(self, stock_ticker, start_time, end_time, interval=DAILY_INTERVAL):
+        def read():
+            with span("read", "network", ticker=stock_ticker, interval=interval):
+                if interval == DAILY_INTERVAL:
+                    stock_data_df = self._reader(stock_ticker, start_time, end_time)
+                else:
+                    stock_data_df = self._provider.read_intraday(
+                        stock_ticker, start_time, end_time, interval
+                    )
+            _count_fetched(stock_data_df)
+            return stock_data_df
+
+        return self._scheduler.request(
+            _request_key(stock_ticker, start_time, end_time, interval), read, stock_ticker
+        )
 
     def normalize_stock_data(self, stock_data_df):
-        normalized_stock_data_df = (
-            stock_data_df - stock_data_df.mean()
-        ) / stock_data_df.std()
+        with span("normalize_stock_data", "data"):
+            normalized_stock_data_df = (
+                stock_data_df - stock_data_df.mean()
+            ) / stock_data_df.std()
 
         return normalized_stock_data_df
 
 
-def get_stock_validity(stock):
-    """
-    returns True when stock name is valid, False otherwise.
-    """
-    return True
+def _request_key(stock_tickers, start_time, end_time, interval):
+    # Daily bars are read in whole days and intraday bars to the minute, so
+    # requests within the same day or minute read the same bars
+    unit = "D" if interval == DAILY_INTERVAL else "min"
+    return (
+        stock_tickers,
+        interval,
+        pd.Timestamp(start_time).floor(unit),
+        pd.Timestamp(end_time).floor(unit),
+    )
+
+
+def _count_fetched(stock_data_df):
+    # Sizes are only worth computing while they are recorded
+    if is_tracing_enabled():
+        count("rows_fetched", len(stock_data_df))
+        count("bytes_fetched", int(stock_data_df.memory_usage(index=True).sum()))
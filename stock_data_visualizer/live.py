@@ -0,0 +1,92 @@
+"""
+Live mode of the intraday time frames, i.e., new bars of the drawn stocks are
+polled from a feed and appended to the open chart.
+
+Feeds return the bars that are newer than the last drawn one. PollingFeed asks
+the stock data provider for them, ReplayFeed replays recorded bars on a clock,
+so live mode can be run without a market being open.
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+
+POLL_INTERVAL = 60.0
+REPLAY_POLL_INTERVAL = 1.0
+
+
+class LiveFeed:
+    """
+    Base class of the live feeds
+    """
+
+    poll_interval = POLL_INTERVAL
+
+    def now(self):
+        """
+        Returns the time of the feed, draws of live charts end at it
+        """
+        return datetime.now()
+
+    def poll(self, stock_ticker, after, interval):
+        """
+        Returns the bars of stock_ticker newer than after as a DataFrame
+        """
+        raise NotImplementedError
+
+
+class PollingFeed(LiveFeed):
+    """
+    Polls the stock data provider for the bars of the current session
+    """
+
+    def __init__(self, sdh, poll_interval=POLL_INTERVAL):
+        self._sdh = sdh
+        self.poll_interval = poll_interval
+
+    def poll(self, stock_ticker, after, interval):
+        # Providers read whole days, so the last drawn day is read again
+        after = pd.Timestamp(after)
+        bars_df = self._sdh.read_bars(
+            stock_ticker, (after - timedelta(days=1)).to_pydatetime(), self.now(), interval
+        )
+        return bars_df[bars_df.index > after]
+
+
+class ReplayFeed(LiveFeed):
+    """
+    Replays the bars read from a provider, e.g., a LocalFileProvider of
+    recorded intraday files, as if they were arriving live.
+
+    The feed starts at start_time and its time runs speed times as fast as
+    the clock, bars up to the time of the feed are returned by poll().
+    """
+
+    poll_interval = REPLAY_POLL_INTERVAL
+
+    def __init__(self, provider, start_time, speed=1.0, clock=time.monotonic):
+        self._provider = provider
+        self._start_time = pd.Timestamp(start_time)
+        self._speed = speed
+        self._clock = clock
+        self._clock_start = clock()
+        self._frames = {}
+
+    def now(self):
+        elapsed = (self._clock() - self._clock_start) * self._speed
+        return (self._start_time + timedelta(seconds=elapsed)).to_pydatetime()
+
+    def poll(self, stock_ticker, after, interval):
+        bars_df = self._frames.get(stock_ticker)
+        if bars_df is None:
+            # The recording is read once, polls slice it
+            bars_df = self._provider.read_intraday(
+                stock_ticker, self._start_time, pd.Timestamp.max, interval
+            )
+            self._frames[stock_ticker] = bars_df
+
+        lo = bars_df.index.searchsorted(pd.Timestamp(after), side="right")
+        hi = bars_df.index.searchsorted(pd.Timestamp(self.now()), side="right")
+        return bars_df.iloc[lo:hi]
@@ -0,0 +1,58 @@
+"""
+Normalization modes of stock values, kept apart from the panel so that the GUI
+can list them without loading the data stack.
+"""
+
+from enum import Enum
+
+
+class NormalizationMode(Enum):
+    """
+    Available normalization modes
+    """
+
+    NONE = 0
+    ZSCORE = 1
+    REBASED = 2
+    LOG_RETURNS = 3
+    # Panels relative to an index are made by comparing them to the index
+    RELATIVE = 4
+
+    @staticmethod
+    def from_str(label):
+        for mode, mode_label in _NORMALIZATION_LABELS.items():
+            if label == mode_label:
+                return mode
+        raise NotImplementedError
+
+    def to_str(self):
+        return _NORMALIZATION_LABELS[self]
+
+
+_NORMALIZATION_LABELS = {
+    NormalizationMode.NONE: "None",
+    NormalizationMode.ZSCORE: "Z-score",
+    NormalizationMode.REBASED: "Rebased to 100",
+    NormalizationMode.LOG_RETURNS: "Log returns",
+    NormalizationMode.RELATIVE: "Relative to index",
+}
+
+_NORMALIZATION_AXIS_LABELS = {
+    NormalizationMode.NONE: "Stock value $",
+    NormalizationMode.ZSCORE: "Z-score of stock value",
+    NormalizationMode.REBASED: "Stock value rebased to 100",
+    NormalizationMode.LOG_RETURNS: "Cumulative log return",
+    NormalizationMode.RELATIVE: "Value relative to index, rebased to 100",
+}
+
+
+def get_available_normalization_modes():
+    return [
+        mode.to_str()
+        for mode in NormalizationMode
+        if mode not in (NormalizationMode.NONE, NormalizationMode.RELATIVE)
+    ]
+
+
+def get_normalization_axis_label(mode):
+    return _NORMALIZATION_AXIS_LABELS[mode]
@@ -0,0 +1,195 @@
+"""
+Aligned price panel, i.e., one field of many stocks as a date indexed matrix
+"""
+
+import warnings
+import numpy as np
+import pandas as pd
+
+from normalization import (
+    NormalizationMode,
+    get_available_normalization_modes,
+    get_normalization_axis_label,
+)
+
+
+class PricePanel:
+    """
+    One field, e.g., Close, of several stocks aligned on a shared DatetimeIndex.
+
+    Values are kept in a single float64 matrix with a row per date and a column
+    per ticker, dates a stock has no bar for are NaN.
+    """
+
+    def __init__(self, dates, tickers, values, field="Close"):
+        self.dates = pd.DatetimeIndex(dates)
+        self.tickers = list(tickers)
+        self.values = np.asarray(values, dtype="float64")
+        self.field = field
+
+        if self.values.shape != (len(self.dates), len(self.tickers)):
+            raise ValueError(
+                f"Panel values of shape {self.values.shape} don't match "
+                f"{len(self.dates)} dates and {len(self.tickers)} tickers"
+            )
+        self._columns = {ticker: n for n, ticker in enumerate(self.tickers)}
+
+    @classmethod
+    def from_frames(cls, stock_frames, field="Close"):
+        """
+        Builds a panel out of a dict of stock DataFrames keyed by ticker, only
+        the given field is read from the frames
+        """
+        series = {
+            ticker: stock_df[field]
+            for ticker, stock_df in stock_frames.items()
+            if field in stock_df
+        }
+
+        dates = pd.DatetimeIndex(
+            np.unique(np.concatenate([column.index.values for column in series.values()]))
+            if series
+            else []
+        )
+
+        values = np.full((len(dates), len(series)), np.nan)
+        for n, column in enumerate(series.values()):
+            values[dates.get_indexer(column.index), n] = column.to_numpy(dtype="float64")
+
+        return cls(dates, list(series), values, field=field)
+
+    @classmethod
+    def from_panels(cls, panels, field="Close"):
+        """
+        Builds a panel out of the columns of several panels, aligned on the
+        union of their dates
+        """
+        panels = list(panels)
+        dates = pd.DatetimeIndex(
+            np.unique(np.concatenate([panel.dates.values for panel in panels]))
+            if panels
+            else []
+        )
+        tickers = [ticker for panel in panels for ticker in panel.tickers]
+
+        values = np.full((len(dates), len(tickers)), np.nan)
+        column = 0
+        for panel in panels:
+            rows = dates.get_indexer(panel.dates)
+            values[rows, column : column + len(panel.tickers)] = panel.values
+            column += len(panel.tickers)
+
+        return cls(dates, tickers, values, field=field)
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __contains__(self, ticker):
+        return ticker in self._columns
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def column(self, ticker):
+        """
+        Returns the values of a single ticker as a view of the panel
+        """
+        return self.values[:, self._columns[ticker]]
+
+    def ticker_panel(self, ticker):
+        """
+        Returns a single ticker as a panel whose values are a view of this panel
+        """
+        column = self._columns[ticker]
+        return PricePanel(
+            self.dates, [ticker], self.values[:, column : column + 1], field=self.field
+        )
+
+    def valid_column(self, ticker):
+        """
+        Returns the dates and values of a single ticker without the missing rows
+        """
+        column = self.column(ticker)
+        valid = ~np.isnan(column)
+        return self.dates[valid], column[valid]
+
+    def between(self, start_time, end_time):
+        """
+        Returns the dates between start_time and end_time as a panel whose
+        values are a view of this panel. Whole days are included like the
+        readers include them.
+        """
+        start = self.dates.searchsorted(pd.Timestamp(start_time).normalize())
+        end = self.dates.searchsorted(pd.Timestamp(end_time), side="right")
+        return PricePanel(
+            self.dates[start:end], self.tickers, self.values[start:end], field=self.field
+        )
+
+    def to_frame(self):
+        return pd.DataFrame(self.values, index=self.dates, columns=self.tickers, copy=False)
+
+    def normalized(self, mode):
+        """
+        Returns a new panel normalized with the given NormalizationMode.
+
+        ZSCORE scales every ticker to zero mean and unit standard deviation,
+        REBASED scales every ticker to start from 100 and LOG_RETURNS gives the
+        cumulative log return of every ticker since its first value.
+        """
+        if mode == NormalizationMode.NONE:
+            values = self.values
+        elif mode == NormalizationMode.ZSCORE:
+            values = normalize_zscore(self.values)
+        elif mode == NormalizationMode.REBASED:
+            values = normalize_rebased(self.values)
+        elif mode == NormalizationMode.LOG_RETURNS:
+            values = normalize_log_returns(self.values)
+        else:
+            raise NotImplementedError
+
+        return PricePanel(self.dates, self.tickers, values, field=self.field)
+
+
+def normalize_appended(values, first_value, mode):
+    """
+    Normalizes values appended to a ticker whose first value is first_value,
+    the way PricePanel.normalized() normalized the values before them. ZSCORE
+    depends on every value of the ticker, so it can't be appended to.
+    """
+    values = np.asarray(values, dtype="float64")
+    if mode == NormalizationMode.NONE:
+        return values
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if mode == NormalizationMode.REBASED:
+            return values * (100.0 / first_value)
+        elif mode == NormalizationMode.LOG_RETURNS:
+            return np.log(values / first_value)
+    raise NotImplementedError
+
+
+def normalize_zscore(values):
+    # Tickers without any values stay NaN instead of warning
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return (values - np.nanmean(values, axis=0)) / np.nanstd(values, axis=0, ddof=1)
+
+
+def normalize_rebased(values):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return values * (100.0 / first_valid_values(values))
+
+
+def normalize_log_returns(values):
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.log(values / first_valid_values(values))
+
+
+def first_valid_values(values):
+    """
+    Returns the first non-NaN value of every column
+    """
+    if len(values) == 0:
+        return np.full(values.shape[1:], np.nan)
+    first_rows = np.argmax(~np.isnan(values), axis=0)
+    return values[first_rows, np.arange(values.shape[1])]
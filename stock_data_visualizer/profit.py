@@ -0,0 +1,160 @@
+"""
+Profit analysis of stocks during a time frame, i.e., how much was made by
+holding them, the best and the worst time to buy and sell, and how the
+returns of holding them for a fixed number of days were distributed.
+
+Every ticker of a panel is analyzed at once with cumulative and prefix
+extrema operations, so all buy and sell windows cost O(n) per ticker.
+"""
+
+import numpy as np
+
+
+# Days a stock is held for the distribution of returns, about a month
+HOLDING_PERIOD_DAYS = 21
+RETURN_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+class TradeWindows:
+    """
+    Buy and sell rows of one window per ticker, e.g., the most profitable one,
+    and the profit of buying on the buy row and selling on the sell row
+    """
+
+    def __init__(self, buy_rows, sell_rows, profits):
+        self.buy_rows = buy_rows
+        self.sell_rows = sell_rows
+        self.profits = profits
+
+
+class ProfitAnalysis:
+    """
+    Profit analysis of the tickers of a panel.
+
+    profits are the cumulative profits of every ticker since its first value,
+    as fractions. best and worst are the TradeWindows of the highest profit
+    and the highest loss of buying and later selling within the time frame.
+    holding_returns are the returns of holding every ticker for
+    holding_period rows, ending on every row.
+    """
+
+    def __init__(self, dates, tickers, profits, best, worst, holding_returns, holding_period):
+        self.dates = dates
+        self.tickers = list(tickers)
+        self.profits = profits
+        self.best = best
+        self.worst = worst
+        self.holding_returns = holding_returns
+        self.holding_period = holding_period
+        self._columns = {ticker: n for n, ticker in enumerate(self.tickers)}
+
+    def profit(self, ticker):
+        """
+        Returns the dates and the cumulative profits of ticker without the
+        missing rows
+        """
+        column = self.profits[:, self._columns[ticker]]
+        valid = ~np.isnan(column)
+        return self.dates[valid], column[valid]
+
+    def best_window(self, ticker):
+        return self._window(self.best, ticker)
+
+    def worst_window(self, ticker):
+        return self._window(self.worst, ticker)
+
+    def _window(self, windows, ticker):
+        # Returns the buy date, the sell date and the profit of the window
+        column = self._columns[ticker]
+        profit = windows.profits[column]
+        if np.isnan(profit):
+            return None
+        return self.dates[windows.buy_rows[column]], self.dates[windows.sell_rows[column]], profit
+
+    def holding_return_values(self, ticker):
+        column = self.holding_returns[:, self._columns[ticker]]
+        return column[~np.isnan(column)]
+
+    def holding_return_percentiles(self, percentiles=RETURN_PERCENTILES):
+        """
+        Returns the given percentiles of the holding returns of every ticker,
+        a row per percentile
+        """
+        percentile_values = np.full((len(percentiles), len(self.tickers)), np.nan)
+        has_returns = ~np.isnan(self.holding_returns).all(axis=0)
+        if has_returns.any():
+            percentile_values[:, has_returns] = np.nanpercentile(
+                self.holding_returns[:, has_returns], percentiles, axis=0
+            )
+        return percentile_values
+
+
+def analyze_profit(panel, holding_period=HOLDING_PERIOD_DAYS):
+    """
+    Returns the ProfitAnalysis of every ticker of panel. Missing values are
+    held at the last value before them, a stock can't be bought or sold
+    before its first value.
+    """
+    # charting imports this module at startup, before pandas is loaded
+    from panel import first_valid_values
+
+    values = forward_fill(panel.values)
+    if not len(values):
+        rows = np.zeros(values.shape[1], dtype=np.int64)
+        windows = TradeWindows(rows, rows, np.full(values.shape[1], np.nan))
+        return ProfitAnalysis(
+            panel.dates, panel.tickers, values, windows, windows, values, holding_period
+        )
+    valid = ~np.isnan(values)
+    rows = np.arange(len(values))[:, None]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        profits = np.where(
+            ~np.isnan(panel.values), values / first_valid_values(values) - 1.0, np.nan
+        )
+
+        # The best sell row gains the most over the lowest value before it
+        lows = np.minimum.accumulate(np.where(valid, values, np.inf), axis=0)
+        gains = np.where(valid, values / lows - 1.0, -np.inf)
+        # The worst sell row loses the most from the highest value before it
+        highs = np.maximum.accumulate(np.where(valid, values, -np.inf), axis=0)
+        losses = np.where(valid, values / highs - 1.0, np.inf)
+
+        holding_returns = np.full(values.shape, np.nan)
+        if 0 < holding_period < len(values):
+            holding_returns[holding_period:] = (
+                values[holding_period:] / values[:-holding_period] - 1.0
+            )
+            holding_returns[np.isnan(panel.values)] = np.nan
+
+    best = _trade_windows(values, valid, rows, gains.argmax(axis=0), gains, buy_low=True)
+    worst = _trade_windows(values, valid, rows, losses.argmin(axis=0), losses, buy_low=False)
+    return ProfitAnalysis(
+        panel.dates, panel.tickers, profits, best, worst, holding_returns, holding_period
+    )
+
+
+def _trade_windows(values, valid, rows, sell_rows, profits, buy_low):
+    # Buy rows are the lowest or highest value up to the sell row, found with one masked pass
+    columns = np.arange(values.shape[1])
+    before_sell = valid & (rows <= sell_rows)
+    if buy_low:
+        buy_rows = np.where(before_sell, values, np.inf).argmin(axis=0)
+    else:
+        buy_rows = np.where(before_sell, values, -np.inf).argmax(axis=0)
+    window_profits = profits[sell_rows, columns]
+    window_profits = np.where(np.isfinite(window_profits), window_profits, np.nan)
+    return TradeWindows(buy_rows, sell_rows, window_profits)
+
+
+def forward_fill(values):
+    """
+    Returns values with every NaN replaced by the last value before it in its
+    column, NaNs before the first value of a column are kept
+    """
+    if not len(values):
+        return values
+    rows = np.where(np.isnan(values), -1, np.arange(len(values))[:, None])
+    last_rows = np.maximum.accumulate(rows, axis=0)
+    filled = np.take_along_axis(values, np.maximum(last_rows, 0), axis=0)
+    return np.where(last_rows >= 0, filled, np.nan)
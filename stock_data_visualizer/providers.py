@@ -0,0 +1,296 @@
+"""
+Stock data providers, i.e., the backends stock data is read from
+"""
+
+import io
+import json
+import mmap
+import pathlib
+import urllib.parse
+import urllib.request
+import numpy as np
+import pandas as pd
+import pandas_datareader as pdd
+from datetime import timedelta
+
+
+_PROVIDERS = {}
+
+YAHOO_CHART_URL = "https://query1.finance.yahoo.com/v8/finance/chart/{}"
+
+
+def register_provider(provider_class):
+    """
+    Class decorator that makes a provider available by its name
+    """
+    _PROVIDERS[provider_class.name] = provider_class
+    return provider_class
+
+
+def get_provider(name, **kwargs):
+    """
+    Creates the provider registered with the given name
+    """
+    try:
+        provider_class = _PROVIDERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown stock data provider '{name}'") from None
+    return provider_class(**kwargs)
+
+
+def get_available_providers():
+    return list(_PROVIDERS)
+
+
+class StockDataProvider:
+    """
+    Base class of the stock data providers.
+
+    Subclasses read the daily bars of one ticker in read(), bulk capable
+    providers additionally read many tickers with a single request in
+    read_many() and intraday capable providers read bars of shorter intervals
+    in read_intraday(). Providers reading the same data share their source,
+    which is what the cache keys the stored data by. Providers of remote
+    sources limiting how often they're asked set their request rate, in
+    requests per second, and how many requests may be sent at once.
+    """
+
+    name = None
+    source = None
+    supports_bulk = False
+    supports_intraday = False
+    cacheable = True
+    request_rate = None
+    request_burst = 1
+
+    def read(self, stock_ticker, start_time, end_time):
+        raise NotImplementedError
+
+    def read_intraday(self, stock_ticker, start_time, end_time, interval):
+        raise NotImplementedError
+
+    def read_many(self, stock_tickers, start_time, end_time):
+        return {
+            stock_ticker: self.read(stock_ticker, start_time, end_time)
+            for stock_ticker in stock_tickers
+        }
+
+
+@register_provider
+class YahooProvider(StockDataProvider):
+    """
+    Reads stock data from Yahoo, one ticker per request. Intraday bars are
+    read from chart_url, which can point to a server standing in for Yahoo.
+    """
+
+    name = "yahoo"
+    source = "yahoo"
+    supports_intraday = True
+    # Yahoo answers bursts of more than a few requests per second with 429
+    request_rate = 2.0
+    request_burst = 8
+
+    def __init__(self, chart_url=YAHOO_CHART_URL):
+        self.chart_url = chart_url
+
+    def read(self, stock_ticker, start_time, end_time):
+        return pdd.DataReader(stock_ticker, "yahoo", start_time, end_time)
+
+    def read_intraday(self, stock_ticker, start_time, end_time, interval):
+        # pandas_datareader only reads daily bars, intraday bars come from the chart API
+        query = urllib.parse.urlencode(
+            {
+                "interval": interval,
+                "period1": int(pd.Timestamp(start_time).to_pydatetime().timestamp()),
+                "period2": int(pd.Timestamp(end_time).to_pydatetime().timestamp()),
+            }
+        )
+        request = urllib.request.Request(
+            f"{self.chart_url.format(urllib.parse.quote(stock_ticker))}?{query}",
+            headers={"User-Agent": "Mozilla/5.0"},
+        )
+        with urllib.request.urlopen(request, timeout=30) as response:
+            chart = json.load(response)["chart"]
+        if chart.get("error"):
+            raise IOError(chart["error"].get("description", chart["error"]))
+        return read_chart_bars(chart["result"][0])
+
+
+@register_provider
+class YahooBulkProvider(YahooProvider):
+    """
+    Reads stock data from Yahoo, many tickers per request
+    """
+
+    name = "yahoo-bulk"
+    supports_bulk = True
+
+    def read_many(self, stock_tickers, start_time, end_time):
+        stock_tickers = list(stock_tickers)
+        if len(stock_tickers) == 1:
+            return {stock_tickers[0]: self.read(stock_tickers[0], start_time, end_time)}
+
+        # Columns of a multi-symbol request are indexed by (attribute, symbol)
+        data_df = pdd.DataReader(stock_tickers, "yahoo", start_time, end_time)
+        symbols = set(data_df.columns.get_level_values(1))
+        return {
+            stock_ticker: data_df.xs(stock_ticker, axis=1, level=1).dropna(how="all")
+            for stock_ticker in stock_tickers
+            if stock_ticker in symbols
+        }
+
+
+@register_provider
+class LocalFileProvider(StockDataProvider):
+    """
+    Reads stock data from local files, one file per ticker named after the
+    ticker, e.g., 'AAPL.csv', 'AAPL.parquet' or 'AAPL.arrow'.
+
+    Files are memory mapped and only the rows of the requested range are
+    parsed. CSV files have to be sorted by their first column, the date in ISO
+    format. Parquet and Arrow files need the pyarrow package and a 'Date'
+    column.
+    """
+
+    name = "local"
+    source = "local"
+    supports_intraday = True
+    cacheable = False
+
+    FILE_SUFFIXES = (".arrow", ".feather", ".parquet", ".csv")
+
+    def __init__(self, directory="."):
+        self.directory = pathlib.Path(directory)
+
+    def find_file(self, stock_ticker):
+        for suffix in self.FILE_SUFFIXES:
+            path = self.directory / f"{stock_ticker}{suffix}"
+            if path.exists():
+                return path
+        raise FileNotFoundError(f"No local stock data for '{stock_ticker}' in {self.directory}")
+
+    def read_intraday(self, stock_ticker, start_time, end_time, interval):
+        # Files are read in whatever interval they were written with
+        return self.read(stock_ticker, start_time, end_time)
+
+    def read(self, stock_ticker, start_time, end_time):
+        path = self.find_file(stock_ticker)
+        if path.suffix == ".csv":
+            return read_csv_range(path, start_time, end_time)
+        elif path.suffix == ".parquet":
+            return read_parquet_range(path, start_time, end_time)
+        else:
+            return read_arrow_range(path, start_time, end_time)
+
+
+def read_chart_bars(result):
+    """
+    Returns the bars of a Yahoo chart API result as a DataFrame in the layout of
+    pdd.DataReader, timestamps are in the local time of the exchange
+    """
+    timestamps = np.asarray(result.get("timestamp", []), dtype="int64")
+    quote = result["indicators"]["quote"][0] if timestamps.size else {}
+    offset = result.get("meta", {}).get("gmtoffset", 0)
+
+    def column(name):
+        return np.asarray(quote.get(name, [None] * len(timestamps)), dtype="float64")
+
+    data_df = pd.DataFrame(
+        {
+            "High": column("high"),
+            "Low": column("low"),
+            "Open": column("open"),
+            "Close": column("close"),
+            "Volume": column("volume"),
+        },
+        index=pd.DatetimeIndex(pd.to_datetime(timestamps + offset, unit="s"), name="Date"),
+    )
+    data_df["Adj Close"] = data_df["Close"]
+    # The bar that is still forming comes without values
+    return data_df.dropna(subset=["Close"])
+
+
+def read_csv_range(path, start_time, end_time):
+    """
+    Reads the rows between start_time and end_time from a date sorted CSV file
+    by binary searching the memory mapped file for the range
+    """
+    with open(path, "rb") as file:
+        if pathlib.Path(path).stat().st_size == 0:
+            return pd.DataFrame()
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            header_end = data.find(b"\n") + 1 or len(data)
+            # Whole days are included like the remote readers do. Lines are
+            # bisected by date only, times are written with a space or a 'T'
+            # and the two don't sort alike.
+            start_key = pd.Timestamp(start_time).strftime("%Y-%m-%d").encode()
+            # Dates don't overflow for open ranges ending at pd.Timestamp.max
+            end_day = pd.Timestamp(end_time).date() + timedelta(days=1)
+            end_key = end_day.strftime("%Y-%m-%d").encode()
+
+            lo = _bisect_lines(data, start_key, header_end, len(data))
+            hi = _bisect_lines(data, end_key, lo, len(data))
+            chunk = data[:header_end] + data[lo:hi]
+
+    data_df = pd.read_csv(io.BytesIO(chunk), index_col=0, parse_dates=True)
+    data_df.index.name = "Date"
+    # Bars of the last day after end_time are dropped once they're parsed
+    return data_df[data_df.index <= pd.Timestamp(end_time)]
+
+
+def _bisect_lines(data, key, lo, hi):
+    """
+    Returns the offset of the first line in data[lo:hi] whose first field is
+    not less than key. lo has to be the start of a line.
+    """
+    while lo < hi:
+        mid = (lo + hi) // 2
+        line_start = max(lo, data.rfind(b"\n", lo, mid) + 1)
+        line_end = data.find(b"\n", line_start)
+        if line_end == -1:
+            line_end = len(data)
+
+        field = data[line_start:line_end].split(b",", 1)[0].strip(b'"\r')
+        if field < key:
+            lo = line_end + 1
+        else:
+            hi = line_start
+
+    return min(lo, len(data))
+
+
+def read_parquet_range(path, start_time, end_time):
+    """
+    Reads the rows between start_time and end_time from a Parquet file, row
+    groups outside of the range are skipped based on their statistics
+    """
+    import pyarrow.parquet as pq
+
+    start_time, end_time = _day_range(start_time, end_time)
+    table = pq.read_table(
+        path,
+        memory_map=True,
+        filters=[("Date", ">=", start_time), ("Date", "<=", end_time)],
+    )
+    return table.to_pandas().set_index("Date").sort_index()
+
+
+def read_arrow_range(path, start_time, end_time):
+    """
+    Reads the rows between start_time and end_time from a date sorted Arrow IPC
+    file, only the sliced rows are converted
+    """
+    import pyarrow as pa
+
+    start_time, end_time = _day_range(start_time, end_time)
+    with pa.memory_map(str(path), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+        dates = table.column("Date").to_numpy().astype("datetime64[ns]")
+        lo = dates.searchsorted(start_time.to_datetime64(), side="left")
+        hi = dates.searchsorted(end_time.to_datetime64(), side="right")
+        return table.slice(lo, hi - lo).to_pandas().set_index("Date")
+
+
+def _day_range(start_time, end_time):
+    return pd.Timestamp(start_time).normalize(), pd.Timestamp(end_time)
@@ -0,0 +1,115 @@
+"""
+Render server drawing stock charts in worker processes into shared memory.
+
+Figure layout and Agg rasterization of heavy charts hold the GIL for as long
+as they take, which in the GUI process stalls its event loop. The workers of
+the render server draw the charts into RGBA buffers in shared memory instead,
+the GUI shows the buffers without copying them, and several charts are
+rendered in parallel on separate cores.
+"""
+
+import atexit
+import functools
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+from rendering import RENDER_DPI, render_chart_rgba
+from tracing import count
+
+
+class RenderBuffer:
+    """
+    RGBA pixels of a width x height image in shared memory. The buffer is
+    owned by the process that created it, render workers write into it by
+    its name.
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self._memory = SharedMemory(create=True, size=max(1, width * height * 4))
+
+    @property
+    def name(self):
+        return self._memory.name
+
+    @property
+    def memory(self):
+        return self._memory.buf
+
+    @property
+    def stride(self):
+        return 4 * self.width
+
+    def close(self):
+        """
+        Frees the shared memory, nothing may refer to memory anymore
+        """
+        self._memory.close()
+        self._memory.unlink()
+
+
+class RenderServer:
+    """
+    Pool of processes rendering ChartJobs into RenderBuffers.
+
+    Workers are spawned rather than forked, a fork of the GUI process would
+    copy the locks held by its threads. They import matplotlib once when they
+    start, not for every chart.
+    """
+
+    def __init__(self, max_workers=None, dpi=RENDER_DPI):
+        self.dpi = dpi
+        self._executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_up,
+        )
+        self._buffers = set()
+        self._lock = threading.Lock()
+
+    def create_buffer(self, width, height):
+        buffer = RenderBuffer(width, height)
+        with self._lock:
+            self._buffers.add(buffer)
+        return buffer
+
+    def release_buffer(self, buffer):
+        with self._lock:
+            self._buffers.discard(buffer)
+        buffer.close()
+
+    def render(self, job, buffer):
+        """
+        Renders the chart of job into buffer and returns the Future of the
+        render, which is done once the pixels are in the buffer
+        """
+        count("renders_submitted")
+        return self._executor.submit(
+            render_chart_rgba, job, buffer.name, buffer.width, buffer.height, self.dpi
+        )
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        with self._lock:
+            buffers, self._buffers = self._buffers, set()
+        for buffer in buffers:
+            buffer.close()
+
+
+@functools.lru_cache(maxsize=None)
+def get_render_server():
+    """
+    Returns the render server shared by the whole process, it's started on the
+    first call and shut down on exit
+    """
+    server = RenderServer()
+    atexit.register(server.shutdown)
+    return server
+
+
+def _warm_up():
+    import matplotlib.figure
+    import matplotlib.backends.backend_agg
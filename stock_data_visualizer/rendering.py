@@ -0,0 +1,238 @@
+"""
+Headless rendering of stock charts into image files, e.g., for nightly chart
+packs, or into shared memory pixels for the render server of the GUI. Charts
+are drawn with the Agg backend only, no QApplication is needed.
+"""
+
+import os
+import pathlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+from styling import FIGURE_FACECOLOR, set_axes_styles
+from decimation import minmax_indices
+from analytics import AnalyticsEngine, INDICATORS, overlay_indicators
+from normalization import NormalizationMode, get_normalization_axis_label
+from tracing import span
+
+
+RENDER_FORMATS = ("png", "svg", "pdf")
+RENDER_SIZE = (10, 6)
+RENDER_DPI = 100
+MAX_LEGEND_STOCKS = 16
+
+# Timestamps and random ids would make every render of the same data different
+_DETERMINISTIC_RC = {"svg.hashsalt": "stock_data_visualizer"}
+_DETERMINISTIC_METADATA = {
+    "png": {"Software": None},
+    "svg": {"Date": None},
+    "pdf": {"CreationDate": None},
+}
+
+
+class ChartJob:
+    """
+    Everything needed for rendering one chart, picklable so that charts can be
+    rendered in worker processes. Charts rendered to pixels have no output
+    file.
+    """
+
+    def __init__(
+        self,
+        output_file,
+        title,
+        panel,
+        price_panel=None,
+        normalization=NormalizationMode.NONE,
+        indicator=None,
+    ):
+        self.output_file = str(output_file) if output_file is not None else None
+        self.title = title
+        self.panel = panel
+        self.price_panel = price_panel if price_panel is not None else panel
+        self.normalization = normalization
+        self.indicator = indicator
+
+
+def read_watchlist(watchlist_file):
+    """
+    Returns the stock symbols of a watchlist file, symbols can be separated by
+    commas, whitespace or line breaks
+    """
+    with open(watchlist_file, "r") as file:
+        symbols = file.read().replace(",", " ").upper().split()
+    return list(dict.fromkeys(symbols))
+
+
+def create_chart_jobs(
+    sdh,
+    watchlist_files,
+    time_frame,
+    output_dir,
+    output_format="png",
+    normalization=NormalizationMode.NONE,
+    indicator=None,
+    end_time=None,
+    field="Close",
+):
+    """
+    Fetches the stock data of every watchlist and returns a ChartJob per
+    watchlist. Stocks shared by watchlists are fetched only once.
+    """
+    from panel import PricePanel
+
+    watchlists = {
+        pathlib.Path(watchlist_file).stem: read_watchlist(watchlist_file)
+        for watchlist_file in watchlist_files
+    }
+    stock_tickers = [ticker for tickers in watchlists.values() for ticker in tickers]
+    results = sdh.get_many(stock_tickers, time_frame, end_time=end_time)
+
+    for result in results.values():
+        if not result.ok:
+            print(f"Couldn't read '{result.ticker}' stock data: {result.error}")
+
+    jobs = []
+    for name, tickers in watchlists.items():
+        price_panel = PricePanel.from_frames(
+            {
+                ticker: results[ticker].data
+                for ticker in tickers
+                if results[ticker].ok and len(results[ticker].data)
+            },
+            field=field,
+        )
+        jobs.append(
+            ChartJob(
+                pathlib.Path(output_dir) / f"{name}.{output_format}",
+                name,
+                price_panel.normalized(normalization),
+                price_panel,
+                normalization,
+                indicator,
+            )
+        )
+    return jobs
+
+
+def render_chart(job):
+    """
+    Renders the chart of job into its output file and returns the file
+    """
+    with span("render_chart", "plot", output_file=job.output_file):
+        return _render_chart(job)
+
+
+def _render_chart(job):
+    # Matplotlib is imported by the renders only, which keeps the CLI fast to start
+    import matplotlib
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    output_format = os.path.splitext(job.output_file)[1][1:].lower()
+    if output_format not in RENDER_FORMATS:
+        raise ValueError(f"Unknown render format '{output_format}'")
+
+    with matplotlib.rc_context(_DETERMINISTIC_RC):
+        figure = Figure(figsize=RENDER_SIZE, dpi=RENDER_DPI, facecolor=FIGURE_FACECOLOR)
+        FigureCanvasAgg(figure)
+        draw_chart(job, figure)
+        figure.savefig(
+            job.output_file,
+            format=output_format,
+            facecolor=figure.get_facecolor(),
+            metadata=_DETERMINISTIC_METADATA[output_format],
+        )
+    return job.output_file
+
+
+def render_chart_rgba(job, buffer_name, width, height, dpi=RENDER_DPI):
+    """
+    Renders the chart of job as width x height RGBA pixels into the shared
+    memory buffer of the given name, which is left open to its owner
+    """
+    from multiprocessing.shared_memory import SharedMemory
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    with span("render_chart_rgba", "plot", width=width, height=height):
+        figure = Figure(
+            figsize=(width / dpi, height / dpi), dpi=dpi, facecolor=FIGURE_FACECOLOR
+        )
+        canvas = FigureCanvasAgg(figure)
+        draw_chart(job, figure)
+        canvas.draw()
+        pixels = np.asarray(canvas.buffer_rgba())
+
+        buffer = SharedMemory(name=buffer_name)
+        try:
+            image = np.ndarray((height, width, 4), dtype=np.uint8, buffer=buffer.buf)
+            # Sizes in inches can round the canvas a pixel off the buffer
+            rows, columns = min(height, pixels.shape[0]), min(width, pixels.shape[1])
+            image[:rows, :columns] = pixels[:rows, :columns]
+            del image
+        finally:
+            buffer.close()
+    return width, height
+
+
+def draw_chart(job, figure):
+    """
+    Draws the chart of job on figure
+    """
+    axes = figure.add_subplot(1, 1, 1)
+    set_axes_styles(axes, job.title, get_normalization_axis_label(job.normalization))
+    # A fixed title position spares laying out the date ticks for placing it
+    axes.set_title(job.title, color="white", y=1.0)
+
+    secondary_axes = None
+    analytics = None
+    if job.indicator is not None:
+        analytics = AnalyticsEngine({job.indicator: INDICATORS[job.indicator]})
+        if not INDICATORS[job.indicator]().price_scale:
+            secondary_axes = axes.twinx()
+            secondary_axes.set_ylabel(job.indicator, color="white")
+            secondary_axes.tick_params(axis="y", colors="white")
+
+    # No more points than the axes has pixels are drawn, which keeps vector
+    # formats small for long time frames
+    buckets = int(figure.get_figwidth() * figure.dpi)
+    stock_lines = []
+    for n, ticker in enumerate(job.panel.tickers):
+        color = f"C{n % 10}"
+        dates, values = job.panel.valid_column(ticker)
+        indices = minmax_indices(values, buckets)
+        stock_lines.extend(axes.plot(dates[indices], values[indices], color=color))
+
+        if analytics is not None:
+            source_panel = job.panel if secondary_axes is None else job.price_panel
+            analytics.append(ticker, *source_panel.valid_column(ticker))
+            overlay_indicators(
+                axes, analytics, ticker, color=color, secondary_axes=secondary_axes
+            )
+
+    if 0 < len(job.panel.tickers) <= MAX_LEGEND_STOCKS:
+        # The legend belongs on the topmost axes to stay above every line
+        (secondary_axes or axes).legend(
+            stock_lines,
+            job.panel.tickers,
+            loc="best",
+            labelcolor="white",
+            shadow=True,
+            facecolor="#3F4042",
+        )
+
+
+def render_charts(jobs, max_workers=None):
+    """
+    Renders the charts of jobs, spread over a pool of worker processes, and
+    yields the output files in the order of jobs
+    """
+    jobs = list(jobs)
+    if max_workers == 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield render_chart(job)
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(render_chart, jobs)
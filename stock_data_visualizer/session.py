@@ -0,0 +1,106 @@
+"""
+Session snapshot, i.e., the options and the stock data of the last draw saved
+on exit, so that the next launch shows the last chart before fetching anything.
+
+Options are saved as JSON. The price panel of the last draw is saved as .npy
+files next to them, which are memory-mapped when the snapshot is read.
+"""
+
+import os
+import json
+from datetime import datetime
+
+
+SESSION_FILE = "session.json"
+SESSION_DATES_FILE = "session_dates.npy"
+SESSION_VALUES_FILE = "session_values.npy"
+
+
+def save_session(session_dir, options, history=None):
+    """
+    Saves the options of the session and, when given, the (start_time,
+    end_time, price_panels) history of its last draw
+    """
+    from panel import PricePanel
+    import numpy as np
+
+    os.makedirs(session_dir, exist_ok=True)
+    session = {"options": options, "history": None}
+    if history is not None:
+        start_time, end_time, price_panels = history
+        panel = PricePanel.from_panels(price_panels.values())
+        _replace_file(
+            os.path.join(session_dir, SESSION_DATES_FILE),
+            lambda file: np.save(file, panel.dates.values),
+        )
+        _replace_file(
+            os.path.join(session_dir, SESSION_VALUES_FILE),
+            lambda file: np.save(file, panel.values),
+        )
+        session["history"] = {
+            "start_time": start_time.isoformat(),
+            "end_time": end_time.isoformat(),
+            "tickers": panel.tickers,
+            "field": panel.field,
+        }
+
+    # The JSON goes last, it only refers to complete panel files
+    _replace_file(
+        os.path.join(session_dir, SESSION_FILE),
+        lambda file: file.write(json.dumps(session, indent=2).encode()),
+    )
+
+
+def read_session_options(session_dir):
+    """
+    Returns the saved options of the last session, or None without a session
+    """
+    session = _read_session(session_dir)
+    return session["options"] if session is not None else None
+
+
+def read_session_history(session_dir):
+    """
+    Returns the (start_time, end_time, price_panels) history of the last draw
+    of the last session, or None when it wasn't saved. Price panels are views
+    of the memory-mapped panel of the snapshot.
+    """
+    session = _read_session(session_dir)
+    if session is None or session["history"] is None:
+        return None
+
+    from panel import PricePanel
+    import numpy as np
+
+    history = session["history"]
+    try:
+        panel = PricePanel(
+            np.load(os.path.join(session_dir, SESSION_DATES_FILE)),
+            history["tickers"],
+            np.load(os.path.join(session_dir, SESSION_VALUES_FILE), mmap_mode="r"),
+            field=history["field"],
+        )
+    except (OSError, ValueError):
+        return None
+
+    return (
+        datetime.fromisoformat(history["start_time"]),
+        datetime.fromisoformat(history["end_time"]),
+        {ticker: panel.ticker_panel(ticker) for ticker in panel.tickers},
+    )
+
+
+def _read_session(session_dir):
+    try:
+        with open(os.path.join(session_dir, SESSION_FILE), "r") as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def _replace_file(path, write):
+    # Readers never see a partially written file
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "wb") as file:
+        write(file)
+    os.replace(temporary_path, path)
@@ -0,0 +1,157 @@
+"""
+Model and delegate of the stock configuration list.
+
+Symbols are kept in plain lists with a hash index next to them, so a list of
+thousands of symbols is only as many rows in the model instead of as many
+widgets, and membership checks don't depend on the length of the list.
+"""
+
+from PySide2.QtCore import Qt, QAbstractListModel, QModelIndex, QRect, QEvent
+from PySide2.QtWidgets import QStyledItemDelegate, QStyle, QStyleOptionButton, QApplication
+
+
+class StockListModel(QAbstractListModel):
+    """
+    Checkable list of unique stock symbols
+    """
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._symbols = []
+        self._active = []
+        # Row of every symbol
+        self._rows = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._symbols)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = index.row()
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            return self._symbols[row]
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if self._active[row] else Qt.Unchecked
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.CheckStateRole:
+            return False
+        self._active[index.row()] = value == Qt.Checked
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return super().flags(index)
+        # Flags of PySide2 5.13 can't be or-ed together on Python 3.11
+        return Qt.ItemFlags(
+            int(Qt.ItemIsEnabled) | int(Qt.ItemIsSelectable) | int(Qt.ItemIsUserCheckable)
+        )
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self._rows
+
+    def add(self, symbol, active=True):
+        """
+        Appends symbol to the list, returns False if it's already listed
+        """
+        return self.extend([symbol], active) == 1
+
+    def extend(self, symbols, active=True):
+        """
+        Appends every symbol that isn't listed yet with a single insertion,
+        returns the number of added symbols
+        """
+        new_symbols = []
+        seen = set()
+        for symbol in symbols:
+            if symbol and symbol not in self._rows and symbol not in seen:
+                seen.add(symbol)
+                new_symbols.append(symbol)
+        if not new_symbols:
+            return 0
+
+        first = len(self._symbols)
+        self.beginInsertRows(QModelIndex(), first, first + len(new_symbols) - 1)
+        self._symbols.extend(new_symbols)
+        self._active.extend([active] * len(new_symbols))
+        self._rows.update((symbol, first + n) for n, symbol in enumerate(new_symbols))
+        self.endInsertRows()
+        return len(new_symbols)
+
+    def remove(self, symbol):
+        """
+        Removes symbol from the list, returns False if it isn't listed
+        """
+        row = self._rows.get(symbol)
+        if row is None:
+            return False
+        self.removeRows(row, 1)
+        return True
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        if count < 1 or row < 0 or row + count > len(self._symbols):
+            return False
+
+        self.beginRemoveRows(parent, row, row + count - 1)
+        for symbol in self._symbols[row : row + count]:
+            del self._rows[symbol]
+        del self._symbols[row : row + count]
+        del self._active[row : row + count]
+        # Only the rows after the removed ones move
+        for n in range(row, len(self._symbols)):
+            self._rows[self._symbols[n]] = n
+        self.endRemoveRows()
+        return True
+
+    def clear(self):
+        self.beginResetModel()
+        self._symbols.clear()
+        self._active.clear()
+        self._rows.clear()
+        self.endResetModel()
+
+    def get_symbols(self):
+        return list(self._symbols)
+
+    def get_active_symbols(self):
+        return [symbol for symbol, active in zip(self._symbols, self._active) if active]
+
+
+class StockItemDelegate(QStyledItemDelegate):
+    """
+    Paints a remove button on every row of the stock list, the button is only
+    painted instead of being a widget of its own
+    """
+
+    BUTTON_WIDTH = 72
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)
+
+        button = QStyleOptionButton()
+        button.rect = self._button_rect(option.rect)
+        button.text = "Remove"
+        button.state = QStyle.State_Enabled
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if (
+            event.type() == QEvent.MouseButtonRelease
+            and event.button() == Qt.LeftButton
+            and self._button_rect(option.rect).contains(event.pos())
+        ):
+            model.removeRows(index.row(), 1)
+            return True
+        return super().editorEvent(event, model, option, index)
+
+    def _button_rect(self, rect):
+        return QRect(
+            rect.right() - self.BUTTON_WIDTH, rect.top() + 1, self.BUTTON_WIDTH, rect.height() - 2
+        )
@@ -0,0 +1,189 @@
+"""
+In-memory store of the fetched stock data, kept as compact columnar arrays
+within a memory budget
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from caching import CachePolicy
+from tracing import count
+
+
+DEFAULT_MEMORY_BUDGET = 256 * 2**20
+PRICE_DTYPES = ("float64", "float32")
+
+
+class StockSeries:
+    """
+    Bars of one stock as a column per field, sharing a single date array.
+
+    Volume is kept as integers when it has no gaps, Adj Close shares the Close
+    array when they're equal. Arrays are read-only, so the frames sliced from
+    the series can share them.
+    """
+
+    def __init__(self, dates, columns, start_time, end_time):
+        self.dates = dates
+        self.columns = columns
+        self.start_time = start_time
+        self.end_time = end_time
+
+    @classmethod
+    def from_frame(cls, stock_data_df, start_time, end_time, price_dtype="float64"):
+        stock_data_df = stock_data_df.sort_index()
+        dates = _read_only(stock_data_df.index.values.astype("datetime64[ns]"))
+        columns = {}
+        for name in stock_data_df.columns:
+            # Copies, the frame stays owned by the caller
+            values = stock_data_df[name].to_numpy(dtype="float64", copy=True)
+            if name == "Volume" and np.isfinite(values).all() and (values % 1 == 0).all():
+                values = values.astype("int64")
+            else:
+                values = values.astype(price_dtype, copy=False)
+
+            close = columns.get("Close")
+            if name == "Adj Close" and close is not None and np.array_equal(values, close):
+                columns[name] = close
+            else:
+                columns[name] = _read_only(values)
+        return cls(dates, columns, start_time, end_time)
+
+    @property
+    def nbytes(self):
+        arrays = {id(values): values for values in self.columns.values()}
+        return self.dates.nbytes + sum(values.nbytes for values in arrays.values())
+
+    def to_frame(self, start_time=None, end_time=None):
+        """
+        Returns the bars between start_time and end_time as a DataFrame whose
+        columns are views of the series
+        """
+        start, end = 0, len(self.dates)
+        if start_time is not None:
+            # Whole days are included like the readers do
+            start_time = pd.Timestamp(start_time).normalize().to_datetime64()
+            start = self.dates.searchsorted(start_time)
+        if end_time is not None:
+            end = self.dates.searchsorted(pd.Timestamp(end_time).to_datetime64(), side="right")
+
+        return pd.DataFrame(
+            {name: values[start:end] for name, values in self.columns.items()},
+            index=pd.DatetimeIndex(self.dates[start:end], name="Date"),
+            copy=False,
+        )
+
+    def merge(self, other, price_dtype="float64"):
+        """
+        Returns a series of the bars of both series, the bars of other replace
+        the bars of this series within the range of other
+        """
+        other_start = pd.Timestamp(other.start_time).normalize().to_datetime64()
+        other_end = pd.Timestamp(other.end_time).to_datetime64()
+        kept = (self.dates < other_start) | (self.dates > other_end)
+        stock_data_df = pd.concat([self.to_frame()[kept], other.to_frame()])
+        return StockSeries.from_frame(
+            stock_data_df,
+            min(self.start_time, other.start_time),
+            max(self.end_time, other.end_time),
+            price_dtype,
+        )
+
+
+class SeriesStore:
+    """
+    Least recently used stock series within a memory budget, in bytes.
+
+    Series that don't fit the budget anymore are evicted and read again from
+    the disk cache or the provider when they're needed. A series stays usable
+    by whoever got frames of it before it was evicted.
+
+    Eviction trades memory for reads: without a disk cache, every draw of an
+    evicted series fetches it from the provider again. The budget still
+    applies then, since the alternative is memory growing with every ticker
+    ever drawn.
+    """
+
+    def __init__(self, budget=DEFAULT_MEMORY_BUDGET, price_dtype="float64", policy=None):
+        if price_dtype not in PRICE_DTYPES:
+            raise ValueError(f"Unsupported price dtype '{price_dtype}'")
+        self.budget = budget
+        self.price_dtype = price_dtype
+        self.policy = policy if policy is not None else CachePolicy()
+        self._series = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._series)
+
+    def __contains__(self, key):
+        return key in self._series
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def get(self, stock_ticker, source, start_time, end_time):
+        """
+        Returns the bars of stock_ticker between start_time and end_time, or
+        None when the stored series doesn't cover the range
+        """
+        with self._lock:
+            series = self._series.get((source, stock_ticker))
+            if (
+                series is None
+                or self.policy.is_head_missing(series.start_time, start_time)
+                or self.policy.is_tail_stale(series.end_time, end_time)
+            ):
+                count("store_misses")
+                return None
+            self._series.move_to_end((source, stock_ticker))
+        count("store_hits")
+        return series.to_frame(start_time, end_time)
+
+    def put(self, stock_ticker, source, stock_data_df, start_time, end_time):
+        """
+        Stores the bars fetched between start_time and end_time, merged with
+        the stored ones, and returns them as a DataFrame sharing the stored
+        arrays
+        """
+        series = StockSeries.from_frame(stock_data_df, start_time, end_time, self.price_dtype)
+        key = (source, stock_ticker)
+        with self._lock:
+            stored = self._series.pop(key, None)
+            if stored is not None:
+                self._nbytes -= stored.nbytes
+                if series.start_time <= stored.end_time and stored.start_time <= series.end_time:
+                    series = stored.merge(series, self.price_dtype)
+
+            self._series[key] = series
+            self._nbytes += series.nbytes
+            self._evict()
+        return series.to_frame(start_time, end_time)
+
+    def remove(self, stock_ticker, source):
+        with self._lock:
+            series = self._series.pop((source, stock_ticker), None)
+            if series is not None:
+                self._nbytes -= series.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+            self._nbytes = 0
+
+    def _evict(self):
+        # The most recently stored series is kept even when it alone is over budget
+        while self._nbytes > self.budget and len(self._series) > 1:
+            _, series = self._series.popitem(last=False)
+            self._nbytes -= series.nbytes
+            count("store_evictions")
+
+
+def _read_only(values):
+    values.flags.writeable = False
+    return values
@@ -0,0 +1,26 @@
+"""
+Styles shared by the stock graphs of the GUI and the headless renders.
+"""
+
+FIGURE_FACECOLOR = "#202124"
+
+
+def set_axes_styles(plt, title, ylabel, xlabel="Date", max_ticks=7):
+    plt.set_facecolor("#3F4042")
+    plt.set_title(title, color="white")
+    plt.set_xlabel(xlabel)
+    plt.set_ylabel(ylabel)
+    plt.xaxis.label.set_color("white")
+    plt.yaxis.label.set_color("white")
+    plt.tick_params(axis="x", colors="white")
+    plt.tick_params(axis="y", colors="white")
+
+    # Show grid lines
+    plt.grid(axis="both", color="gray", linestyle="-")
+
+    import matplotlib.dates as mdates
+
+    # Keep the date labels sparse for readability
+    locator = mdates.AutoDateLocator(minticks=min(3, max_ticks), maxticks=max_ticks)
+    plt.xaxis.set_major_locator(locator)
+    plt.xaxis.set_major_formatter(mdates.ConciseDateFormatter(locator))
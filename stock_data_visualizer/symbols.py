@@ -0,0 +1,181 @@
+"""
+Local index of known stock symbols, used for validating and autocompleting
+stock symbols without asking the data provider.
+
+The index is a sorted array of fixed width byte strings saved as a .npy file,
+so it's memory-mapped on first use instead of being parsed at startup.
+"""
+
+import os
+import numpy as np
+
+
+# Characters tried when looking for symbols one edit away from a typo
+SYMBOL_ALPHABET = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789.-"
+MAX_SYMBOL_LENGTH = 16
+
+
+def read_symbol_listing(listing_file):
+    """
+    Returns the symbols of a listing file.
+
+    The listing can have a symbol per line or be a delimited table, e.g., an
+    exchange symbol dump. Tables are read from their first column with
+    "Symbol" in its name, or from their first column without such a header.
+    """
+    with open(listing_file, "r", encoding="utf8", errors="replace") as file:
+        lines = file.read().splitlines()
+    if not lines:
+        return []
+
+    delimiter = next((d for d in ("|", ",", "\t", ";") if d in lines[0]), None)
+    column = 0
+    if delimiter is not None:
+        header = [name.strip().lower() for name in lines[0].split(delimiter)]
+        symbol_columns = [n for n, name in enumerate(header) if "symbol" in name]
+        if symbol_columns:
+            column = symbol_columns[0]
+            lines = lines[1:]
+    elif lines[0].strip().lower() == "symbol":
+        lines = lines[1:]
+
+    symbols = []
+    for line in lines:
+        fields = line.split(delimiter) if delimiter is not None else [line]
+        if column >= len(fields):
+            continue
+        symbol = fields[column].strip().upper()
+        # Dumps end with footer lines like "File Creation Time: ..."
+        if symbol and len(symbol) <= MAX_SYMBOL_LENGTH and " " not in symbol:
+            symbols.append(symbol)
+    return symbols
+
+
+class SymbolIndex:
+    """
+    Sorted index of stock symbols with O(log n) lookups.
+
+    Nothing is read until the index is used for the first time.
+    """
+
+    def __init__(self, index_file):
+        self.index_file = index_file
+        self._symbols = None
+
+    def is_available(self):
+        """
+        Returns True when there's an index to validate symbols against
+        """
+        return self._symbols is not None or os.path.exists(self.index_file)
+
+    def build(self, listing_files):
+        """
+        Builds the index out of the given listing files and saves it, returns
+        the number of indexed symbols
+        """
+        symbols = set()
+        for listing_file in listing_files:
+            symbols.update(read_symbol_listing(listing_file))
+
+        width = max((len(symbol) for symbol in symbols), default=1)
+        index = np.array(sorted(symbols), dtype=f"S{width}")
+        # Written next to the old index first, the old one stays valid if saving fails
+        with open(f"{self.index_file}.tmp", "wb") as file:
+            np.save(file, index)
+        os.replace(f"{self.index_file}.tmp", self.index_file)
+
+        self._symbols = index
+        return len(index)
+
+    def _get_symbols(self):
+        if self._symbols is None:
+            if os.path.exists(self.index_file):
+                self._symbols = np.load(self.index_file, mmap_mode="r")
+            else:
+                self._symbols = np.empty(0, dtype="S1")
+        return self._symbols
+
+    def __len__(self):
+        return len(self._get_symbols())
+
+    def __contains__(self, symbol):
+        symbols = self._get_symbols()
+        key = symbol.upper().encode()
+        if len(key) > symbols.dtype.itemsize:
+            return False
+        position = np.searchsorted(symbols, key)
+        return position < len(symbols) and symbols[position] == key
+
+    def complete(self, prefix, limit=10):
+        """
+        Returns up to limit symbols starting with prefix, in sorted order
+        """
+        symbols = self._get_symbols()
+        key = prefix.upper().encode()
+        if not key:
+            return []
+        if len(key) >= symbols.dtype.itemsize:
+            return [key.decode()] if prefix in self else []
+
+        start = np.searchsorted(symbols, key)
+        end = min(start + limit, np.searchsorted(symbols, key + b"\xff"))
+        return [symbol.decode() for symbol in symbols[start:end]]
+
+    def suggest(self, text, limit=10):
+        """
+        Returns symbols for autocompleting text, symbols starting with text
+        come first, then the ones a single typo away from it
+        """
+        suggestions = self.complete(text, limit)
+        if len(suggestions) < limit:
+            for symbol in self.similar(text):
+                if symbol not in suggestions:
+                    suggestions.append(symbol)
+                if len(suggestions) == limit:
+                    break
+        return suggestions
+
+    def similar(self, text):
+        """
+        Returns the indexed symbols one deletion, insertion, substitution or
+        transposition away from text
+        """
+        symbols = self._get_symbols()
+        text = text.upper()
+        if not text or not len(symbols):
+            return []
+
+        splits = [(text[:n], text[n:]) for n in range(len(text) + 1)]
+        candidates = {left + right[1:] for left, right in splits if right}
+        candidates.update(
+            left + right[1] + right[0] + right[2:] for left, right in splits if len(right) > 1
+        )
+        for left, right in splits:
+            for char in SYMBOL_ALPHABET:
+                candidates.add(left + char + right)
+                if right:
+                    candidates.add(left + char + right[1:])
+        candidates.discard(text)
+
+        # All candidates are looked up with a single vectorized binary search
+        width = symbols.dtype.itemsize
+        keys = np.array(
+            sorted(c.encode() for c in candidates if c and len(c) <= width),
+            dtype=symbols.dtype,
+        )
+        positions = np.minimum(np.searchsorted(symbols, keys), len(symbols) - 1)
+        found = [symbol.decode() for symbol in keys[symbols[positions] == keys]]
+        # Typos are more likely towards the end, matches sharing a longer prefix come first
+        return sorted(
+            found, key=lambda symbol: (-len(os.path.commonprefix((symbol, text))), symbol)
+        )
+
+
+def get_stock_validity(stock, symbol_index=None):
+    """
+    returns True when stock name is valid, False otherwise. Without a symbol
+    index of known stocks every stock name is considered valid.
+    """
+    if symbol_index is None or not symbol_index.is_available():
+        return True
+    return stock in symbol_index
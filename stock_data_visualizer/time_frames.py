@@ -0,0 +1,86 @@
+"""
+Stock time frames, kept apart from the data handling so that the GUI can list
+them without loading the data stack.
+"""
+
+from enum import Enum
+
+
+class StockTimeFrame(Enum):
+    """
+    Available stock time frames
+    """
+
+    YTD = 0
+    DAY = 1
+    WEEK = 2
+    YEAR1 = 3
+    YEAR3 = 4
+    YEAR5 = 5
+    MAX = 6
+    CUSTOM = 7
+
+    @staticmethod
+    def from_str(label):
+        if label in ('YTD'):
+            return StockTimeFrame.YTD
+        elif label in ('1 Day'):
+            return StockTimeFrame.DAY
+        elif label in ('1 Week'):
+            return StockTimeFrame.WEEK
+        elif label in ('1 Year'):
+            return StockTimeFrame.YEAR1
+        elif label in ('3 Years'):
+            return StockTimeFrame.YEAR3
+        elif label in ('5 Years'):
+            return StockTimeFrame.YEAR5
+        elif label in ('Max'):
+            return StockTimeFrame.MAX
+        elif label in ('Custom'):
+            return StockTimeFrame.CUSTOM
+        else:
+            raise NotImplementedError
+
+
+class CustomTimeFrame:
+    """
+    Time frame between two dates picked by the user, both dates included
+    """
+
+    def __init__(self, start_time, end_time):
+        if end_time < start_time:
+            raise ValueError("Custom time frames have to end after they start")
+        self.start_time = start_time
+        self.end_time = end_time
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, CustomTimeFrame)
+            and self.start_time == other.start_time
+            and self.end_time == other.end_time
+        )
+
+    def __hash__(self):
+        return hash((self.start_time, self.end_time))
+
+    def __repr__(self):
+        return f"CustomTimeFrame({self.start_time:%Y-%m-%d}, {self.end_time:%Y-%m-%d})"
+
+
+# Daily bars can't fill the short time frames, they're drawn from intraday bars
+DAILY_INTERVAL = "1d"
+INTRADAY_INTERVALS = {
+    StockTimeFrame.DAY: "5m",
+    StockTimeFrame.WEEK: "30m",
+}
+
+
+def get_time_frame_interval(time_frame):
+    """
+    Returns the bar interval the time frame is drawn with, e.g., "5m" or "1d"
+    """
+    return INTRADAY_INTERVALS.get(time_frame, DAILY_INTERVAL)
+
+
+def get_available_time_frames():
+    return ["YTD", "1 Day", "1 Week", "1 Year", "3 Years", "5 Years", "Max", "Custom"]
@@ -0,0 +1,179 @@
+"""
+Timing spans and counters of the hot paths, exported as Chrome trace files
+that chrome://tracing and Perfetto open.
+
+Tracing is off by default, spans and counters then cost a function call.
+"""
+
+import os
+import json
+import time
+import threading
+import contextlib
+
+
+_NULL_SPAN = contextlib.nullcontext()
+_tracer = None
+
+
+class Tracer:
+    """
+    Records the spans and counters of every thread, timestamps are in
+    microseconds since the tracer was created
+    """
+
+    def __init__(self):
+        self._start = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self._events = []
+        self._counters = {}
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def now(self):
+        return (time.perf_counter_ns() - self._start) / 1000
+
+    @contextlib.contextmanager
+    def span(self, name, category, args):
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.add_span(name, category, start, self.now() - start, args)
+
+    def add_span(self, name, category, start, duration, args=None):
+        thread = threading.current_thread()
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start,
+            "dur": duration,
+            "pid": self._pid,
+            "tid": thread.ident,
+        }
+        if args:
+            event["args"] = args
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            self._events.append(event)
+
+    def count(self, name, value=1):
+        with self._lock:
+            total = self._counters.get(name, 0) + value
+            self._counters[name] = total
+            # Counter events carry the running total, that's what trace viewers plot
+            self._events.append(
+                {"name": name, "ph": "C", "ts": self.now(), "pid": self._pid, "args": {name: total}}
+            )
+
+    def get_counters(self):
+        with self._lock:
+            return dict(self._counters)
+
+    def summary(self, since=0.0):
+        """
+        Returns the number and total milliseconds of the spans started since the
+        given timestamp by name, and how much every counter grew since then
+        """
+        with self._lock:
+            events = list(self._events)
+
+        spans, counters_before, counters_after = {}, {}, {}
+        for event in events:
+            if event["ph"] == "C":
+                totals = counters_before if event["ts"] < since else counters_after
+                totals.update(event["args"])
+            elif event["ts"] >= since:
+                count, total = spans.get(event["name"], (0, 0.0))
+                spans[event["name"]] = (count + 1, total + event["dur"] / 1000)
+
+        counters = {
+            name: total - counters_before.get(name, 0)
+            for name, total in counters_after.items()
+        }
+        return {"spans": spans, "counters": counters}
+
+    def export(self, trace_file):
+        """
+        Writes everything recorded so far as a Chrome trace JSON file
+        """
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+            counters = dict(self._counters)
+
+        thread_names = [
+            {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}}
+            for tid, name in threads.items()
+        ]
+        with open(trace_file, "w") as file:
+            json.dump(
+                {
+                    "traceEvents": thread_names + events,
+                    "displayTimeUnit": "ms",
+                    "otherData": {"counters": counters},
+                },
+                file,
+            )
+
+
+def enable_tracing():
+    """
+    Starts recording spans and counters, returns the recording tracer
+    """
+    global _tracer
+    if _tracer is None:
+        _tracer = Tracer()
+    return _tracer
+
+
+def disable_tracing():
+    """
+    Stops recording, returns the tracer with what it recorded or None
+    """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def get_tracer():
+    return _tracer
+
+
+def is_tracing_enabled():
+    return _tracer is not None
+
+
+def span(name, category="app", **args):
+    """
+    Returns a context manager timing its block as a span of the trace
+    """
+    if _tracer is None:
+        return _NULL_SPAN
+    return _tracer.span(name, category, args)
+
+
+def count(name, value=1):
+    """
+    Adds value to the counter of the given name
+    """
+    if _tracer is not None:
+        _tracer.count(name, value)
+
+
+def format_summary(summary):
+    """
+    Returns a summary of Tracer.summary() as lines of text, the slowest spans
+    first. Spans of concurrent threads add up, so they can exceed the wall time.
+    """
+    lines = [
+        f"{name:<24}{count:>5}x {total:>9.1f} ms"
+        for name, (count, total) in sorted(
+            summary["spans"].items(), key=lambda item: item[1][1], reverse=True
+        )
+    ]
+    lines.extend(
+        f"{name:<24}{value:>17,}" for name, value in sorted(summary["counters"].items())
+    )
+    return "\n".join(lines)
@@ -4,10 +4,12 @@ Creates GUI for the visualization.
 
 import sys
 import os
-import pandas as pd
+import threading
+from datetime import datetime, time
+import importlib
 import qdarktheme
 
-from PySide2.QtCore import Qt, QSize, QEvent
+from PySide2.QtCore import Qt, QSize, QEvent, Signal, QStringListModel, QTimer, QDate
 from PySide2.QtGui import QIcon
 from PySide2.QtWidgets import (
     QApplication,
@@ -29,66 +31,99 @@ from PySide2.QtWidgets import (
     QCheckBox,
     QLabel,
     QComboBox,
+    QDateEdit,
+    QProgressBar,
+    QListView,
+    QAbstractItemView,
+    QLineEdit,
+    QCompleter,
+    QDialogButtonBox,
+    QTableWidget,
+    QTableWidgetItem,
+    QHeaderView,
 )
 
 
-from matplotlib.figure import Figure
-from matplotlib.backends.qt_compat import QtWidgets
-from matplotlib.backends.backend_qtagg import (
-    FigureCanvas,
-    NavigationToolbar2QT as NavigationToolbar,
+from time_frames import CustomTimeFrame, StockTimeFrame, get_available_time_frames
+from stock_list import StockListModel, StockItemDelegate
+from symbols import SymbolIndex, get_stock_validity
+from charting import (
+    GRAPH_LAYOUTS,
+    LEGEND_GRAPHS,
+    MAX_SINGLE_CHART_STOCKS,
+    StockGraph,
+    get_available_graph_layouts,
 )
+from analytics import get_available_indicators
+from normalization import NormalizationMode, get_available_normalization_modes
+from comparison import COMPARISON_INDICES, get_available_comparison_indices
+from tracing import span, enable_tracing, disable_tracing, get_tracer, format_summary
 
-from handling import StockDataHandling, StockTimeFrame, get_stock_validity, get_available_time_frames
 
+# Matches MIN_READABLE_YEAR of the data handling, which isn't loaded at startup
+MIN_CUSTOM_YEAR = 1971
 
-class CustomListItem(QWidget):
-    def __init__(self, text, active=True):
-        super().__init__()
-
-        layout = QHBoxLayout(self)
-
-        self.checkbox = QCheckBox()
-        self.checkbox.setChecked(active)
-        self.checkbox.setSizePolicy(QSizePolicy.Maximum, QSizePolicy.Maximum)
+# Time frames and normalizations that live draws append new bars in
+LIVE_TIME_FRAMES = (StockTimeFrame.DAY, StockTimeFrame.WEEK)
+LIVE_NORMALIZATION_MODES = (
+    NormalizationMode.NONE,
+    NormalizationMode.REBASED,
+    NormalizationMode.LOG_RETURNS,
+)
 
-        self.text = QTextEdit(text)
-        self.text.setFixedSize(128, 24)
-        self.text.setReadOnly(True)
-        self.text.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        self.text.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        self.text.setSizePolicy(QSizePolicy.Maximum, QSizePolicy.Maximum)
+# File dialog filters of the stock data exports and the suffixes they add
+EXPORT_FILTERS = {
+    "Parquet (*.parquet)": ".parquet",
+    "Arrow IPC (*.arrow)": ".arrow",
+    "Compressed CSV (*.csv.gz)": ".csv.gz",
+}
+
+# Modules needed by the first draw, they are imported in the background once
+# the main window is shown instead of delaying its startup
+WARM_UP_MODULES = (
+    "handling",
+    "workers",
+    "matplotlib.figure",
+    "matplotlib.collections",
+    "matplotlib.dates",
+    "matplotlib.backends.backend_qtagg",
+)
 
-        self.remove_button = QPushButton("Remove")
-        self.remove_button.setFixedSize(96, 24)
-        self.remove_button.setSizePolicy(QSizePolicy.Maximum, QSizePolicy.Maximum)
-        self.remove_button.clicked.connect(self.remove_item)
 
-        layout.addWidget(self.checkbox)
-        layout.addWidget(self.text)
-        layout.addWidget(self.remove_button)
-        layout.addStretch()
+def warm_up_modules(modules=WARM_UP_MODULES):
+    """
+    Imports modules in a background thread, returns the started thread
+    """
 
-    def is_checked(self):
-        return self.checkbox.isChecked()
+    def import_modules():
+        for module in modules:
+            importlib.import_module(module)
 
-    def get_text(self):
-        return self.text.toPlainText()
-
-    def remove_item(self):
-        self.setParent(None)
+    thread = threading.Thread(target=import_modules, name="warm-up", daemon=True)
+    thread.start()
+    return thread
 
 
 class CustomList(QWidget):
+    """
+    Stock configuration list, a view of a StockListModel so that even long
+    lists only create widgets for the visible rows
+    """
+
     def __init__(self, parent):
         super().__init__(parent)
         self.layout = QVBoxLayout(self)
         self.header_layout = QVBoxLayout()
-        self.list_layout = QVBoxLayout()
+
+        self.model = StockListModel(self)
+        self.view = QListView(self)
+        self.view.setModel(self.model)
+        self.view.setItemDelegate(StockItemDelegate(self.view))
+        self.view.setUniformItemSizes(True)
+        self.view.setSelectionMode(QAbstractItemView.ExtendedSelection)
 
         self.layout.addLayout(self.header_layout)
-        self.layout.addLayout(self.list_layout)
-        self.layout.addStretch()
+        self.layout.addWidget(self.view)
 
         self._create_header()
 
@@ -105,22 +140,34 @@ class CustomList(QWidget):
         self.header_layout.addLayout(layout)
 
     def add_item(self, text):
-        new_item = CustomListItem(text=text)
-        self.list_layout.addWidget(new_item)
-
-    def get_items(self):
-        items = []
-        for i in range(self.list_layout.count()):
-            item = self.list_layout.itemAt(i).widget()
-            items.append(item)
-        return items
+        return self.model.add(text)
+
+    def add_items(self, texts):
+        return self.model.extend(texts)
+
+    def remove_selected_items(self):
+        # Contiguous rows are removed at once, starting from the last ones
+        rows = sorted(index.row() for index in self.view.selectionModel().selectedRows())
+        ranges = []
+        for row in rows:
+            if ranges and ranges[-1][1] == row:
+                ranges[-1][1] = row + 1
+            else:
+                ranges.append([row, row + 1])
+        for first, end in reversed(ranges):
+            self.model.removeRows(first, end - first)
 
     def get_item_names(self):
-        items = []
-        for i in range(self.list_layout.count()):
-            item = self.list_layout.itemAt(i).widget().get_text()
-            items.append(item)
-        return items
+        return self.model.get_symbols()
+
+    def get_checked_item_names(self):
+        return self.model.get_active_symbols()
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key_Delete:
+            self.remove_selected_items()
+        else:
+            super().keyPressEvent(event)
 
 
 class InfoPopup:
@@ -141,14 +188,134 @@ class GraphPopup(QDialog):
     Graph popup controller
     """
 
+    cancelled = Signal()
+
     def __init__(self, parent, name, graph, toolbar, x=900, y=600):
         super().__init__(parent)
         self.resize(x, y)
         self.setWindowTitle(name)
+        self.toolbar = toolbar
+        self.graph = graph
+        self.perf_overlay = None
         self.popup_layout = QVBoxLayout(self)
-        self.popup_layout.addWidget(toolbar)
+        # Graphs rendered to images have no navigation toolbar
+        if toolbar is not None:
+            self.popup_layout.addWidget(toolbar)
         self.popup_layout.addWidget(graph)
 
+        # Progress of the stock data still being loaded into the graph
+        self.progress_layout = QHBoxLayout()
+        self.progress_bar = QProgressBar(self)
+        self.progress_bar.setFormat("Loading stock data %v/%m")
+        self.cancel_button = QPushButton("Cancel", self)
+        self.cancel_button.clicked.connect(self.cancelled.emit)
+        self.progress_layout.addWidget(self.progress_bar)
+        self.progress_layout.addWidget(self.cancel_button)
+        self.popup_layout.addLayout(self.progress_layout)
+
+        # Latest failure of reading the stock data of the graph
+        self.status_label = QLabel(self)
+        self.status_label.setWordWrap(True)
+        self.status_label.hide()
+        self.popup_layout.addWidget(self.status_label)
+
+        # Returns, excess returns and betas of the stocks compared to an index
+        self.comparison_table = QTableWidget(0, 5, self)
+        self.comparison_table.setMaximumHeight(160)
+        self.comparison_table.verticalHeader().hide()
+        self.comparison_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.comparison_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.comparison_table.hide()
+        self.popup_layout.addWidget(self.comparison_table)
+
+    def set_progress(self, done, total):
+        self.progress_bar.setMaximum(total)
+        self.progress_bar.setValue(done)
+        self.progress_bar.show()
+        self.cancel_button.show()
+
+    def set_status(self, text):
+        """
+        Shows text below the graph, None hides it
+        """
+        if text is None:
+            self.status_label.hide()
+            return
+        self.status_label.setText(text)
+        self.status_label.show()
+
+    def add_page_controls(self, graph):
+        """
+        Adds buttons for paging through a graph that is drawn in pages
+        """
+        self.page_layout = QHBoxLayout()
+        self.previous_page_button = QPushButton("Previous page", self)
+        self.next_page_button = QPushButton("Next page", self)
+        self.previous_page_button.clicked.connect(
+            lambda: graph.set_page(graph.page - 1)
+        )
+        self.next_page_button.clicked.connect(lambda: graph.set_page(graph.page + 1))
+        self.page_layout.addWidget(self.previous_page_button)
+        self.page_layout.addStretch()
+        self.page_layout.addWidget(self.next_page_button)
+        self.popup_layout.insertLayout(1, self.page_layout)
+
+    def reset_navigation(self):
+        # Views zoomed or panned before don't apply to the new data
+        if self.toolbar is not None:
+            self.toolbar.update()
+
+    def set_loading_finished(self):
+        self.progress_bar.hide()
+        self.cancel_button.hide()
+
+    def set_comparison(self, comparison):
+        """
+        Shows the ComparisonResult of the drawn stocks, None hides it
+        """
+        if comparison is None:
+            self.comparison_table.hide()
+            return
+
+        self.comparison_table.setHorizontalHeaderLabels(
+            ["Stock", "Return", f"{comparison.index_symbol} return", "Excess return", "Beta"]
+        )
+        self.comparison_table.setRowCount(len(comparison.tickers))
+        rows = enumerate(comparison.rows())
+        for row, (ticker, returns, index_returns, excess_returns, beta) in rows:
+            texts = [
+                ticker,
+                f"{returns:+.2%}",
+                f"{index_returns:+.2%}",
+                f"{excess_returns:+.2%}",
+                f"{beta:.2f}",
+            ]
+            for column, text in enumerate(texts):
+                self.comparison_table.setItem(row, column, QTableWidgetItem(text))
+        self.comparison_table.show()
+
+    def set_perf_overlay(self, text):
+        """
+        Shows text on top of the graph, None hides the overlay
+        """
+        if text is None:
+            if self.perf_overlay is not None:
+                self.perf_overlay.hide()
+            return
+
+        if self.perf_overlay is None:
+            self.perf_overlay = QLabel(self.graph)
+            self.perf_overlay.setAttribute(Qt.WA_TransparentForMouseEvents)
+            self.perf_overlay.setStyleSheet(
+                "background-color: rgba(0, 0, 0, 160); color: white; "
+                "font-family: monospace; font-size: 11px; padding: 4px;"
+            )
+            self.perf_overlay.move(8, 8)
+        self.perf_overlay.setText(text)
+        self.perf_overlay.adjustSize()
+        self.perf_overlay.show()
+        self.perf_overlay.raise_()
+
     def event(self, event):
         if event.type() == QEvent.EnterWhatsThisMode:
             QWhatsThis.leaveWhatsThisMode()
@@ -159,16 +326,94 @@ class GraphPopup(QDialog):
         else:
             return QDialog.event(self, event)
 
+    def closeEvent(self, event):
+        self.cancelled.emit()
+        QDialog.closeEvent(self, event)
+
+
+class StockInputDialog(QDialog):
+    """
+    Stock symbol input that autocompletes the symbols of a symbol index
+    """
+
+    def __init__(self, parent, symbol_index=None):
+        super().__init__(parent)
+        self.setWindowTitle("Question")
+        self._symbol_index = symbol_index
+
+        self.layout = QVBoxLayout(self)
+        self.symbol_input = QLineEdit(self)
+        self.layout.addWidget(QLabel("Stock symbol", self))
+        self.layout.addWidget(self.symbol_input)
+
+        if symbol_index is not None and symbol_index.is_available():
+            # Suggestions already contain close matches, the completer shouldn't filter them
+            self._suggestions = QStringListModel(self)
+            completer = QCompleter(self._suggestions, self)
+            completer.setCompletionMode(QCompleter.UnfilteredPopupCompletion)
+            self.symbol_input.setCompleter(completer)
+            self.symbol_input.textEdited.connect(self._update_suggestions)
+
+        buttons = QDialogButtonBox(self)
+        buttons.addButton(QDialogButtonBox.Ok)
+        buttons.addButton(QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        self.layout.addWidget(buttons)
+
+    def _update_suggestions(self, text):
+        self._suggestions.setStringList(self._symbol_index.suggest(text))
+
+    def get_text(self):
+        return self.symbol_input.text().strip()
+
 
 class MainWindow(QMainWindow):
     """
     Main window controller class
     """
 
-    def __init__(self, app, title=None, version=None, user_config_file=None):
+    def __init__(
+        self,
+        app,
+        title=None,
+        version=None,
+        user_config_file=None,
+        user_cache_file=None,
+        user_symbol_index_file=None,
+        provider=None,
+        live_feed=None,
+        user_session_dir=None,
+    ):
         super().__init__()
         self._app = app
-        self._sdh = StockDataHandling()
+        self._sdh = None
+        self._provider = provider
+        self._live_feed = live_feed
+        self._live_worker = None
+        # Time frame and normalization of a live draw, with the last dates and
+        # first values of its stocks
+        self._live_draw = None
+        self._live_last_dates = None
+        self._live_first_values = None
+        # Range and price panels of the stocks loaded by the last draw, other
+        # time frames within the range are sliced out of them
+        self._history = None
+        self._loading_history = None
+        self._user_session_dir = user_session_dir
+        self._user_cache_file = user_cache_file
+        self._symbol_index = (
+            SymbolIndex(user_symbol_index_file) if user_symbol_index_file is not None else None
+        )
+        self._draw_worker = None
+        self._export_worker = None
+        self._graphs = {}
+        self._graph = None
+        self._graph_popup = None
+        self._panel = None
+        self._failed_stocks = {}
+        self._draw_trace_start = 0.0
+        self._last_tracer = None
         self._main_widget = QWidget()
         self.setCentralWidget(self._main_widget)
         self._main_layout = QVBoxLayout(self._main_widget)
@@ -211,23 +456,194 @@ class MainWindow(QMainWindow):
 
         self._time_frame_box = QComboBox()
         self._time_frame_box.addItems(get_available_time_frames())
+        self._time_frame_box.currentIndexChanged.connect(self._on_time_frame_changed)
+
+        # Custom time frames are picked with a date range
+        today = QDate.currentDate()
+        self._custom_start_edit = QDateEdit(today.addYears(-1))
+        self._custom_end_edit = QDateEdit(today)
+        for date_edit in (self._custom_start_edit, self._custom_end_edit):
+            date_edit.setCalendarPopup(True)
+            date_edit.setDisplayFormat("yyyy-MM-dd")
+            date_edit.setDateRange(QDate(MIN_CUSTOM_YEAR, 1, 1), today)
+        self._custom_end_edit.setMinimumDate(self._custom_start_edit.date())
+        self._custom_start_edit.dateChanged.connect(self._custom_end_edit.setMinimumDate)
+        self._custom_range_widget = QWidget()
+        custom_range_layout = QHBoxLayout(self._custom_range_widget)
+        custom_range_layout.setContentsMargins(0, 0, 0, 0)
+        custom_range_layout.addWidget(self._custom_start_edit)
+        custom_range_layout.addWidget(QLabel("to"))
+        custom_range_layout.addWidget(self._custom_end_edit)
+
+        # Intraday time frames can keep appending new bars to the chart
+        self._live_checkbox = QCheckBox("Live")
+        self._live_checkbox.setToolTip("Keep appending new bars to the chart")
 
         self._normalize_checkbox = QCheckBox("Normalized")
+        self._normalization_box = QComboBox()
+        self._normalization_box.addItems(get_available_normalization_modes())
+        self._normalization_box.setEnabled(False)
+        self._normalize_checkbox.toggled.connect(self._normalization_box.setEnabled)
+
+        self._layout_label = QLabel("Layout")
+        self._layout_box = QComboBox()
+        self._layout_box.addItems(get_available_graph_layouts())
+
+        self._indicator_label = QLabel("Indicator")
+        self._indicator_box = QComboBox()
+        self._indicator_box.addItems(["None"] + get_available_indicators())
+
+        # Comparing to an index replaces the normalization
+        self._comparison_label = QLabel("Compare to")
+        self._comparison_box = QComboBox()
+        self._comparison_box.addItems(["None"] + get_available_comparison_indices())
+        self._comparison_box.currentIndexChanged.connect(self._on_comparison_changed)
 
         self._actions_group_layout.addWidget(self._add_stock_button, 0, 0, 1, 1)
         self._actions_group_layout.addWidget(self._time_frame_box, 0, 1, 1, 1)
-        self._actions_group_layout.addWidget(self._normalize_checkbox, 1, 1, 1, 1)
-        self._actions_group_layout.addWidget(self._analyze_button, 2, 1, 1, 1)
+        self._actions_group_layout.addWidget(self._custom_range_widget, 1, 1, 1, 1)
+        self._actions_group_layout.addWidget(self._normalize_checkbox, 2, 0, 1, 1)
+        self._actions_group_layout.addWidget(self._normalization_box, 2, 1, 1, 1)
+        self._actions_group_layout.addWidget(self._indicator_label, 3, 0, 1, 1)
+        self._actions_group_layout.addWidget(self._indicator_box, 3, 1, 1, 1)
+        self._actions_group_layout.addWidget(self._comparison_label, 4, 0, 1, 1)
+        self._actions_group_layout.addWidget(self._comparison_box, 4, 1, 1, 1)
+        self._actions_group_layout.addWidget(self._layout_label, 5, 0, 1, 1)
+        self._actions_group_layout.addWidget(self._layout_box, 5, 1, 1, 1)
+        self._actions_group_layout.addWidget(self._live_checkbox, 6, 0, 1, 1)
+        self._actions_group_layout.addWidget(self._analyze_button, 6, 1, 1, 1)
+        self._on_time_frame_changed()
 
         # Configuration
         self._custom_list_widget = CustomList(self)
         self._init_stock_list(pre_config_stocks)
 
         self._config_group_layout.addWidget(self._custom_list_widget)
-        self._config_group_layout.addStretch()
+
+        # The last session is drawn again once the window is up
+        session_options = None
+        if user_session_dir is not None:
+            from session import read_session_options
+
+            session_options = read_session_options(user_session_dir)
+        if session_options is not None:
+            self._set_session_options(session_options)
+            QTimer.singleShot(0, self._restore_session)
+
+    def _get_session_options(self):
+        return {
+            "time_frame": self._time_frame_box.currentText(),
+            "custom_range": [
+                self._custom_start_edit.date().toString(Qt.ISODate),
+                self._custom_end_edit.date().toString(Qt.ISODate),
+            ],
+            "normalized": self._normalize_checkbox.isChecked(),
+            "normalization": self._normalization_box.currentText(),
+            "indicator": self._indicator_box.currentText(),
+            "comparison": self._comparison_box.currentText(),
+            "layout": self._layout_box.currentText(),
+            "drawn": self._graph is not None,
+        }
+
+    def _set_session_options(self, options):
+        # Options saved by other versions may be missing or unknown
+        self._normalize_checkbox.setChecked(bool(options.get("normalized")))
+        for box, key in (
+            (self._time_frame_box, "time_frame"),
+            (self._normalization_box, "normalization"),
+            (self._indicator_box, "indicator"),
+            (self._comparison_box, "comparison"),
+            (self._layout_box, "layout"),
+        ):
+            if options.get(key) is not None:
+                box.setCurrentText(options[key])
+        custom_range = options.get("custom_range")
+        if custom_range:
+            self._custom_start_edit.setDate(QDate.fromString(custom_range[0], Qt.ISODate))
+            self._custom_end_edit.setDate(QDate.fromString(custom_range[1], Qt.ISODate))
+
+    def _restore_session(self):
+        """
+        Draws the last chart of the last session from its snapshot, and
+        refreshes it in the background
+        """
+        from session import read_session_options, read_session_history
+
+        if (
+            not read_session_options(self._user_session_dir).get("drawn")
+            or not self._custom_list_widget.get_checked_item_names()
+        ):
+            return
+        with span("restore_session", "gui"):
+            self._history = read_session_history(self._user_session_dir)
+            self._draw_graphs(restore=True)
+
+    def _save_session(self):
+        if self._user_session_dir is None:
+            return
+        from session import save_session
+
+        try:
+            save_session(self._user_session_dir, self._get_session_options(), self._history)
+        except (OSError, ValueError) as error:
+            print(f"Couldn't save the session: {error}")
 
     def _get_time_frame(self):
-        return StockTimeFrame.from_str(self._time_frame_box.currentText()) 
+        time_frame = StockTimeFrame.from_str(self._time_frame_box.currentText())
+        if time_frame == StockTimeFrame.CUSTOM:
+            return CustomTimeFrame(
+                datetime.combine(self._custom_start_edit.date().toPython(), time()),
+                datetime.combine(self._custom_end_edit.date().toPython(), time()),
+            )
+        return time_frame
+
+    def _on_time_frame_changed(self, *args):
+        time_frame = self._get_time_frame()
+        self._live_checkbox.setEnabled(time_frame in LIVE_TIME_FRAMES)
+        self._custom_range_widget.setVisible(isinstance(time_frame, CustomTimeFrame))
+
+    def _is_live(self):
+        """
+        Returns whether the draw keeps appending new bars, live draws need the
+        single chart and a normalization that new bars can be normalized with
+        """
+        if not self._live_checkbox.isEnabled() or not self._live_checkbox.isChecked():
+            return False
+        if (
+            GRAPH_LAYOUTS[self._layout_box.currentText()] is not StockGraph
+            or self._get_normalization() not in LIVE_NORMALIZATION_MODES
+        ):
+            InfoPopup(
+                self,
+                "Note",
+                "Live charts are drawn on a single chart without z-score normalization or index comparison, the chart won't be updated.",
+            )
+            return False
+        return True
+
+    def _get_normalization(self):
+        if self._get_comparison_index() is not None:
+            return NormalizationMode.RELATIVE
+        if not self._normalize_checkbox.isChecked():
+            return NormalizationMode.NONE
+        return NormalizationMode.from_str(self._normalization_box.currentText())
+
+    def _get_comparison_index(self):
+        if self._comparison_box.currentIndex() == 0:
+            return None
+        return COMPARISON_INDICES[self._comparison_box.currentText()]
+
+    def _on_comparison_changed(self, index):
+        comparing = index != 0
+        self._normalize_checkbox.setEnabled(not comparing)
+        self._normalization_box.setEnabled(
+            not comparing and self._normalize_checkbox.isChecked()
+        )
+
+    def _get_indicator(self):
+        if self._indicator_box.currentIndex() == 0:
+            return None
+        return self._indicator_box.currentText()
 
     def _set_stylesheets(self):
         self._main_widget.setStyleSheet(
@@ -247,97 +663,324 @@ class MainWindow(QMainWindow):
 
     def _init_stock_list(self, stocks):
         if stocks:
-            for stock in stocks:
-                self._custom_list_widget.add_item(stock)
+            self._custom_list_widget.add_items(stocks)
 
-    def _draw_graphs(self):
+    def _draw_graphs(self, restore=False):
+        """
+        Draws the checked stocks, restore draws the loaded history at once
+        even when it's stale and refreshes it in the background
+        """
         # Get list of stock tickers
-        sought_stocks = [
-            stock.get_text()
-            for stock in self._custom_list_widget.get_items()
-            if stock.is_checked()
-        ]
+        sought_stocks = self._custom_list_widget.get_checked_item_names()
 
         if len(sought_stocks) == 0:
             InfoPopup(self, "Note", "One or more stocks have to be added!")
-        elif len(sought_stocks) > 16:
+        elif (
+            len(sought_stocks) > MAX_SINGLE_CHART_STOCKS
+            and GRAPH_LAYOUTS[self._layout_box.currentText()] in LEGEND_GRAPHS
+        ):
             InfoPopup(
                 self,
                 "Note",
-                "Maximum amount of analyzed stocks is <b>16</b>, please reduce the number of stocks active in your stock configuration.",
+                f"Maximum amount of stocks on a single chart is <b>{MAX_SINGLE_CHART_STOCKS}</b>, please reduce the number of stocks active in your stock configuration or choose another layout.",
             )
         else:
-            # Create the graph based on selection and create toolbar accordingly
-            normalized = self._normalize_checkbox.isChecked()
+            # A new draw supersedes the one that might still be loading
+            self._cancel_draw()
+
+            # The performance overlay shows what was recorded since here
+            tracer = get_tracer()
+            if tracer is not None:
+                self._draw_trace_start = tracer.now()
+
+            # Reuse the graph of the previous draw, only changed stocks are redrawn
+            normalization = self._get_normalization()
             time_frame = self._get_time_frame()
-            graph = self._create_analyze_graphs(sought_stocks, time_frame=time_frame, normalized=normalized)
-            toolbar = NavigationToolbar(graph, self)
-            toolbar.setStyleSheet("font-size: 12px;")
-            graph_popup = GraphPopup(self, self.windowTitle(), graph, toolbar)
+            live = self._is_live()
+            graph_popup = self._create_analyze_graphs(self._layout_box.currentText())
+            self._graph.begin_draw(
+                sought_stocks, normalization, indicator=self._get_indicator()
+            )
+            graph_popup.reset_navigation()
+            graph_popup.set_comparison(None)
+            graph_popup.set_status(None)
+            graph_popup.set_progress(0, len(sought_stocks))
             graph_popup.show()
-
-    def _create_analyze_graphs(
-        self, sought_stocks=None, time_frame=StockTimeFrame.YTD, normalized=None
-    ):
-        if sought_stocks:
-            fig = Figure(facecolor="#202124")
-            plt = fig.add_subplot(1, 1, 1)
-            canvas = FigureCanvas(fig)
-
-            # Get stock data from yahoo and concanate the data to one dataframe
-            sought_stock_data = [
-                self._sdh.get_yahoo_stock(ticker, time_frame) for ticker in sought_stocks
-            ]
-            stock_df = pd.concat(sought_stock_data, axis=1, keys=sought_stocks)
-
-            # Normalize stock data if so desired
-            if normalized:
-                sought_stock_data = [
-                    self._sdh.normalize_stock_data(stock) for stock in sought_stock_data
-                ]
-
-            for stock in sought_stock_data:
-                try:
-                    plt.plot(stock.index, stock["Close"])
-                except KeyError:
-                    pass
-
-            # Set colors and texts for the figure
-            plt.legend(
+            graph_popup.raise_()
+
+            comparison_index = self._get_comparison_index()
+            self._live_draw = self._live_last_dates = self._live_first_values = None
+            self._loading_history = None
+            if (
+                not live
+                and comparison_index is None
+                and self._slice_history(sought_stocks, time_frame, normalization, restore)
+                and not restore
+            ):
+                graph_popup.set_loading_finished()
+                self._update_perf_overlay()
+                return
+
+            # Load the stock data in the background and fill the graph as it arrives
+            from workers import StockDataWorker
+
+            self._failed_stocks = {}
+            end_time = None
+            if live:
+                # Live draws end where the feed is, new bars are appended from there
+                end_time = self._get_live_feed().now()
+                self._live_draw = (time_frame, normalization)
+                self._live_last_dates, self._live_first_values = {}, {}
+            elif comparison_index is None:
+                # The loaded range is pinned, so it's what the worker loads
+                start_time, end_time = self._get_data_handling().convert_time_frame_to_datetime(
+                    time_frame
+                )
+                self._loading_history = (start_time, end_time, {})
+            worker = StockDataWorker(
+                self._get_data_handling(),
                 sought_stocks,
-                loc="best",
-                labelcolor="white",
-                shadow=True,
-                facecolor="#3F4042",
+                time_frame,
+                normalization=normalization,
+                comparison_index=comparison_index,
+                end_time=end_time,
+                parent=self,
+            )
+            worker.stock_loaded.connect(
+                lambda ticker, stock_panel, price_panel: self._on_stock_loaded(
+                    worker, ticker, stock_panel, price_panel
+                )
             )
+            worker.panel_ready.connect(
+                lambda panel: self._on_panel_ready(worker, panel)
+            )
+            worker.comparison_ready.connect(
+                lambda comparison: self._on_comparison_ready(worker, comparison)
+            )
+            worker.stock_failed.connect(
+                lambda ticker, error: self._on_stock_failed(worker, ticker, error)
+            )
+            worker.progress.connect(
+                lambda done, total: self._on_draw_progress(worker, done, total)
+            )
+            worker.finished.connect(lambda: self._on_draw_finished(worker))
+
+            self._draw_worker = worker
+            worker.start()
+
+    def _slice_history(self, sought_stocks, time_frame, normalization, pinned=False):
+        """
+        Draws the time frame out of the price panels loaded by the last draw,
+        returns False when they don't cover the time frame. Pinned time frames
+        end where the loaded ones did, so stale panels are drawn as well.
+        """
+        if self._history is None:
+            return False
+        sdh = self._get_data_handling()
+        start_time, end_time, price_panels = self._history
+        frame_end = end_time if pinned else None
+        if not all(ticker in price_panels for ticker in sought_stocks) or not (
+            sdh.is_within(time_frame, start_time, end_time, frame_end)
+        ):
+            return False
+
+        frame_start, frame_end = sdh.convert_time_frame_to_datetime(time_frame, frame_end)
+        with span("slice_history", "gui", tickers=len(sought_stocks)):
+            for ticker in sought_stocks:
+                # Slices are views of the loaded panels, only normalizing copies
+                price_panel = price_panels[ticker].between(frame_start, frame_end)
+                self._graph.add_stock(ticker, price_panel.normalized(normalization), price_panel)
+        return True
+
+    def _get_data_handling(self):
+        # The data stack is loaded by the first draw rather than at startup
+        if self._sdh is None:
+            from handling import StockDataHandling
+
+            if self._provider is not None:
+                self._sdh = StockDataHandling(
+                    cache_file=self._user_cache_file, provider=self._provider
+                )
+            else:
+                self._sdh = StockDataHandling(cache_file=self._user_cache_file)
+        return self._sdh
+
+    def _get_live_feed(self):
+        if self._live_feed is None:
+            from live import PollingFeed
+
+            self._live_feed = PollingFeed(self._get_data_handling())
+        return self._live_feed
+
+    def _cancel_draw(self):
+        if self._draw_worker is not None:
+            self._draw_worker.cancel()
+        self._stop_live()
+
+    def _start_live(self, time_frame, normalization):
+        from workers import LiveWorker
+
+        worker = LiveWorker(
+            self._get_live_feed(),
+            self._live_last_dates,
+            self._live_first_values,
+            self._get_data_handling().get_interval(time_frame),
+            normalization=normalization,
+            parent=self,
+        )
+        worker.bars_received.connect(
+            lambda ticker, dates, values, price_values: self._on_live_bars(
+                worker, ticker, dates, values, price_values
+            )
+        )
+        worker.stock_failed.connect(
+            lambda ticker, error: self._on_live_failed(worker, ticker, error)
+        )
+        worker.finished.connect(worker.deleteLater)
+        self._live_worker = worker
+        worker.start()
+
+    def _stop_live(self):
+        if self._live_worker is not None:
+            self._live_worker.cancel()
+            self._live_worker = None
+
+    def _on_live_bars(self, worker, ticker, dates, values, price_values):
+        if self._live_worker is worker:
+            self._graph.append_bars(ticker, dates, values, price_values)
+
+    def _on_live_failed(self, worker, ticker, error):
+        # Polls are retried on the next poll, so failures don't interrupt with a popup
+        if self._live_worker is worker:
+            self._graph_popup.set_status(f"Couldn't poll '{ticker}' stock data: {error}")
+
+    def _on_stock_loaded(self, worker, ticker, stock_panel, price_panel):
+        # Stocks of superseded draws would overwrite the current ones
+        if self._draw_worker is worker:
+            self._graph.add_stock(ticker, stock_panel, price_panel)
+            if self._loading_history is not None:
+                self._loading_history[2][ticker] = price_panel
+            if self._live_last_dates is not None:
+                dates, values = price_panel.valid_column(ticker)
+                if len(dates):
+                    self._live_last_dates[ticker] = dates[-1]
+                    self._live_first_values[ticker] = values[0]
+
+    def _on_stock_failed(self, worker, ticker, error):
+        # Every failure of the draw is listed in a note once it's finished
+        if self._draw_worker is worker:
+            self._graph.remove_stock(ticker)
+            self._failed_stocks[ticker] = error
+            self._graph_popup.set_status(f"Couldn't read '{ticker}' stock data: {error}")
+
+    def _on_panel_ready(self, worker, panel):
+        if self._draw_worker is worker:
+            self._panel = panel
+
+    def _on_comparison_ready(self, worker, comparison):
+        if self._draw_worker is worker:
+            self._graph_popup.set_comparison(comparison)
+
+    def _on_draw_progress(self, worker, done, total):
+        if self._draw_worker is worker:
+            self._graph_popup.set_progress(done, total)
+
+    def _on_draw_finished(self, worker):
+        worker.deleteLater()
+
+        if self._draw_worker is not worker:
+            return
+        self._draw_worker = None
+        self._graph_popup.set_loading_finished()
+        self._update_perf_overlay()
+
+        if self._live_last_dates and not worker.is_cancelled():
+            self._start_live(*self._live_draw)
+        if self._loading_history is not None and not worker.is_cancelled():
+            self._history = self._loading_history
+        self._loading_history = None
+
+        if self._failed_stocks and not worker.is_cancelled():
+            InfoPopup(self, "Note", self._get_failure_note(self._failed_stocks))
 
-            plt.set_facecolor("#3F4042")
-            plt.set_title("Stock development during chosen time frame", color="white")
-            plt.set_xlabel("Date")
-            plt.set_ylabel("Stock value $")
-            plt.xaxis.label.set_color("white")
-            plt.yaxis.label.set_color("white")
-            plt.tick_params(axis="x", colors="white")
-            plt.tick_params(axis="y", colors="white")
+    def _get_failure_note(self, failed_stocks):
+        """
+        Returns the note listing the stocks of failed_stocks, a dict of
+        FetchErrors keyed by ticker, grouped by what went wrong
+        """
+        from handling import FetchError
 
-            # Show grid lines
-            plt.grid(axis="both", color="gray", linestyle="-")
+        reasons = {
+            FetchError.THROTTLED: "The data source is limiting requests, try again in a moment to read",
+            FetchError.UNAVAILABLE: "The data source couldn't be reached to read",
+            FetchError.NOT_FOUND: "The data source doesn't know",
+            FetchError.NO_DATA: "There's no stock data during the time frame of",
+        }
+        failed_kinds = {}
+        for ticker, error in failed_stocks.items():
+            failed_kinds.setdefault(error.kind, []).append(ticker)
 
-            # Hide every second xtick label for readability
-            for n, label in enumerate(plt.xaxis.get_ticklabels()):
-                if n % 2 != 0:
-                    label.set_visible(False)
+        notes = []
+        for kind, tickers in failed_kinds.items():
+            reason = reasons.get(kind, "Couldn't read stock data of")
+            notes.append(f"{reason} <b>{', '.join(tickers)}</b>.")
+        return "<br>".join(notes)
 
-            return canvas
+    def _create_analyze_graphs(self, layout):
+        """
+        Returns the graph popup of the layout, the graph of every layout and its
+        popup are created once and reused by every draw
+        """
+        if layout not in self._graphs:
+            from matplotlib.backends.backend_qtagg import NavigationToolbar2QT
+
+            with span("create_analyze_graphs", "gui", layout=layout):
+                graph = GRAPH_LAYOUTS[layout]()
+                toolbar = None
+                if graph.figure is not None:
+                    toolbar = NavigationToolbar2QT(graph.canvas, self)
+                    toolbar.setStyleSheet("font-size: 12px;")
+                graph_popup = GraphPopup(self, self.windowTitle(), graph.canvas, toolbar)
+                graph_popup.cancelled.connect(self._cancel_draw)
+                if hasattr(graph, "set_page"):
+                    graph_popup.add_page_controls(graph)
+            # The overlay is updated once the canvas draw or render has been recorded
+            if graph.figure is not None:
+                graph.canvas.mpl_connect(
+                    "draw_event", lambda event: QTimer.singleShot(0, self._update_perf_overlay)
+                )
+            else:
+                graph.canvas.rendered.connect(
+                    lambda render: QTimer.singleShot(0, self._update_perf_overlay)
+                )
+                graph.canvas.render_failed.connect(graph_popup.set_status)
+            self._graphs[layout] = (graph, graph_popup)
+
+        if self._graph_popup is not None and self._graph_popup is not self._graphs[layout][1]:
+            self._graph_popup.hide()
+        self._graph, self._graph_popup = self._graphs[layout]
+        return self._graph_popup
+
+    def _update_perf_overlay(self):
+        if self._graph_popup is None:
+            return
+        tracer = get_tracer()
+        if not self._perf_overlay_act.isChecked() or tracer is None:
+            self._graph_popup.set_perf_overlay(None)
+            return
+        summary = format_summary(tracer.summary(self._draw_trace_start))
+        self._graph_popup.set_perf_overlay(f"Last draw\n{summary}")
 
     def _create_stock_entry(self):
-        self._stock_input_popup, status = QInputDialog.getText(
-            self, "Question", "Stock symbol"
-        )
+        stock_input_popup = StockInputDialog(self, self._symbol_index)
+        if stock_input_popup.exec_() != QDialog.Accepted:
+            return
 
-        stock_input = str(self._stock_input_popup).upper()
+        stock_input = stock_input_popup.get_text().upper()
+        if not stock_input:
+            return
 
-        if stock_input in self._custom_list_widget.get_item_names():
+        if stock_input in self._custom_list_widget.model:
             InfoPopup(
                 self,
                 "Note",
@@ -345,7 +988,7 @@ class MainWindow(QMainWindow):
             )
             return
 
-        if get_stock_validity(stock_input):
+        if get_stock_validity(stock_input, self._symbol_index):
             self._custom_list_widget.add_item(stock_input)
         else:
             InfoPopup(
@@ -376,18 +1019,74 @@ class MainWindow(QMainWindow):
             triggered=self._open_event,
         )
 
+        self._import_act = QAction(
+            "&Import stocks",
+            self,
+            statusTip="Add the stock symbols listed in a file",
+            triggered=self._import_event,
+        )
+
+        self._export_act = QAction(
+            "&Export stock data",
+            self,
+            statusTip="Save the stock data of the checked stocks as Parquet, Arrow or CSV",
+            triggered=self._export_event,
+        )
+
+        self._symbol_listing_act = QAction(
+            "Load symbol &listing",
+            self,
+            statusTip="Index the stock symbols of exchange listing files",
+            triggered=self._symbol_listing_event,
+        )
+
         self._about_act = QAction(
             "&About", self, statusTip=" ", triggered=self._about_event
         )
 
+        self._record_trace_act = QAction(
+            "&Record performance trace",
+            self,
+            statusTip="Record how long loading and drawing the stock data takes",
+            checkable=True,
+        )
+        self._record_trace_act.toggled.connect(self._record_trace_event)
+
+        self._perf_overlay_act = QAction(
+            "Show performance &overlay",
+            self,
+            statusTip="Show the recorded timings of the last draw on the graph",
+            checkable=True,
+        )
+        self._perf_overlay_act.toggled.connect(self._perf_overlay_event)
+
+        self._export_trace_act = QAction(
+            "&Export performance trace",
+            self,
+            statusTip="Save the recorded performance trace as a Chrome trace file",
+            triggered=self._export_trace_event,
+        )
+        # Tracing may have been started from the command line
+        self._record_trace_act.setChecked(get_tracer() is not None)
+
     def _create_menus(self):
         # File menu
         self._file_menu = self.menuBar().addMenu("&File")
         self._file_menu.addAction(self._open_act)
+        self._file_menu.addAction(self._import_act)
+        self._file_menu.addAction(self._symbol_listing_act)
+        self._file_menu.addAction(self._export_act)
         self._file_menu.addSeparator()
         self._file_menu.addAction(self._exit_act)
         self._file_menu.setLayoutDirection(Qt.LeftToRight)
 
+        # Tools menu
+        self._tools_menu = self.menuBar().addMenu("&Tools")
+        self._tools_menu.addAction(self._record_trace_act)
+        self._tools_menu.addAction(self._perf_overlay_act)
+        self._tools_menu.addAction(self._export_trace_act)
+        self._tools_menu.setLayoutDirection(Qt.LeftToRight)
+
         self.menuBar().addSeparator()
 
         # Help menu
@@ -410,6 +1109,138 @@ class MainWindow(QMainWindow):
         if file_name:
             self.active_user_file = file_name
 
+    def _import_event(self):
+        file_name, _ = QFileDialog.getOpenFileName(self, "Import stocks")
+        if file_name:
+            self._import_stocks(file_name)
+
+    def _import_stocks(self, file_name):
+        """
+        Adds the stock symbols of a file at once, symbols can be separated by
+        commas, whitespace or line breaks
+        """
+        try:
+            with open(file_name, "r") as file:
+                symbols = file.read().replace(",", " ").upper().split()
+        except (IOError, UnicodeDecodeError):
+            InfoPopup(self, "Note", f"Couldn't read stock symbols from <b>{file_name}</b>.")
+            return
+
+        valid_symbols = [
+            symbol for symbol in symbols if get_stock_validity(symbol, self._symbol_index)
+        ]
+        added = self._custom_list_widget.add_items(valid_symbols)
+        skipped = len(symbols) - added
+        message = f"Added <b>{added}</b> stock symbols."
+        if skipped:
+            message += f" Skipped {skipped} invalid or already added symbols."
+        InfoPopup(self, "Import stocks", message)
+
+    def _symbol_listing_event(self):
+        if self._symbol_index is None:
+            return
+        file_names, _ = QFileDialog.getOpenFileNames(self, "Load symbol listing")
+        if not file_names:
+            return
+        try:
+            count = self._symbol_index.build(file_names)
+        except (IOError, ValueError) as error:
+            InfoPopup(self, "Note", f"Couldn't load the symbol listing: {error}")
+            return
+        InfoPopup(self, "Symbol listing", f"Indexed <b>{count}</b> stock symbols.")
+
+    def _export_event(self):
+        sought_stocks = self._custom_list_widget.get_checked_item_names()
+        if len(sought_stocks) == 0:
+            InfoPopup(self, "Note", "One or more stocks have to be added!")
+            return
+        file_name, file_filter = QFileDialog.getSaveFileName(
+            self, "Export stock data", "stocks.parquet", ";;".join(EXPORT_FILTERS)
+        )
+        if not file_name:
+            return
+        from exporting import get_export_file, get_export_format
+        from workers import ExportWorker
+
+        try:
+            get_export_format(file_name)
+        except ValueError:
+            # The chosen filter adds its suffix when the name has none of its own
+            file_name += EXPORT_FILTERS.get(file_filter, ".parquet")
+        file_name = get_export_file(file_name)
+
+        worker = ExportWorker(
+            self._get_data_handling(),
+            sought_stocks,
+            self._get_time_frame(),
+            file_name,
+            normalization=self._get_normalization(),
+            indicator=self._get_indicator(),
+            comparison_index=self._get_comparison_index(),
+            parent=self,
+        )
+        failed_stocks = {}
+        worker.stock_failed.connect(
+            lambda ticker, error: failed_stocks.__setitem__(ticker, error)
+        )
+        worker.progress.connect(
+            lambda done, total: self.statusBar().showMessage(
+                f"Exporting stock data {done}/{total}"
+            )
+        )
+        worker.exported.connect(
+            lambda exported: self._on_exported(file_name, exported, failed_stocks)
+        )
+        worker.export_failed.connect(
+            lambda error: InfoPopup(self, "Note", f"Couldn't export the stock data: {error}")
+        )
+        worker.finished.connect(lambda: self._on_export_finished(worker))
+
+        self._export_act.setEnabled(False)
+        self._export_worker = worker
+        worker.start()
+
+    def _on_exported(self, file_name, exported, failed_stocks):
+        note = f"Exported <b>{exported}</b> stocks to {file_name}."
+        if failed_stocks:
+            note += "<br>" + self._get_failure_note(failed_stocks)
+        InfoPopup(self, "Export", note)
+
+    def _on_export_finished(self, worker):
+        worker.deleteLater()
+        self.statusBar().clearMessage()
+        if self._export_worker is worker:
+            self._export_worker = None
+            self._export_act.setEnabled(True)
+
+    def _record_trace_event(self, checked):
+        if checked:
+            enable_tracing()
+        else:
+            # Whatever was recorded stays exportable until the next recording
+            self._last_tracer = disable_tracing()
+            self._perf_overlay_act.setChecked(False)
+
+    def _perf_overlay_event(self, checked):
+        if checked:
+            self._record_trace_act.setChecked(True)
+        self._update_perf_overlay()
+
+    def _export_trace_event(self):
+        tracer = get_tracer() or self._last_tracer
+        if tracer is None:
+            InfoPopup(self, "Note", "Record a performance trace first.")
+            return
+        file_name, _ = QFileDialog.getSaveFileName(
+            self, "Export performance trace", "trace.json", "Chrome trace (*.json)"
+        )
+        if not file_name:
+            return
+        try:
+            tracer.export(file_name)
+        except IOError as error:
+            InfoPopup(self, "Note", f"Couldn't export the performance trace: {error}")
+
     def _about_event(self):
         main_window_title = self.windowTitle()
 
@@ -440,7 +1271,17 @@ class MainWindow(QMainWindow):
             popup.No,
         )
         if reply == popup.Yes:
+            if self._draw_worker is not None:
+                self._draw_worker.cancel()
+                self._draw_worker.wait()
+            if self._live_worker is not None:
+                self._live_worker.cancel()
+                self._live_worker.wait()
+            if self._export_worker is not None:
+                self._export_worker.cancel()
+                self._export_worker.wait()
             self._save_user_config()
+            self._save_session()
             event.accept()
         else:
             event.ignore()
@@ -455,11 +1296,7 @@ class MainWindow(QMainWindow):
 
     def _save_user_config(self):
         try:
-            stocks = [
-                stock.get_text()
-                for stock in self._custom_list_widget.get_items()
-                if stock.is_checked()
-            ]
+            stocks = self._custom_list_widget.get_checked_item_names()
             with open(self._active_user_file, "w") as file:
                 file.writelines("%s\n" % stock for stock in stocks)
         except IOError:
@@ -471,14 +1308,35 @@ class MainApplication:
     Create base functionality, main window, and show it on fullscreen
     """
 
-    def __init__(self, title=None, version=None, user_config_file=None, x=None, y=None):
+    def __init__(
+        self,
+        title=None,
+        version=None,
+        user_config_file=None,
+        user_cache_file=None,
+        user_symbol_index_file=None,
+        provider=None,
+        live_feed=None,
+        user_session_dir=None,
+        x=None,
+        y=None,
+    ):
         app = QApplication(sys.argv)
         main_window = MainWindow(
-            app=app, title=title, version=version, user_config_file=user_config_file
+            app=app,
+            title=title,
+            version=version,
+            user_config_file=user_config_file,
+            user_cache_file=user_cache_file,
+            user_symbol_index_file=user_symbol_index_file,
+            provider=provider,
+            live_feed=live_feed,
+            user_session_dir=user_session_dir,
         )
 
         main_window.resize(x, y)
         main_window.show()
+        QTimer.singleShot(0, warm_up_modules)
 
         # Return whatever the base application gives on return
         sys.exit(app.exec_())
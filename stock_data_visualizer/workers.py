@@ -0,0 +1,281 @@
+"""
+Background workers that keep the GUI thread free while stock data is prepared.
+"""
+
+import threading
+
+from PySide2.QtCore import QThread, Signal
+
+from handling import FetchError
+from panel import PricePanel, NormalizationMode, normalize_appended
+from tracing import span
+
+
+class StockDataWorker(QThread):
+    """
+    Fetches and prepares the data of the given stock tickers in a background
+    thread, streaming each ticker back to the GUI thread as soon as it's ready.
+
+    Every loaded ticker is emitted as a single column PricePanel, both
+    normalized and as is. The aligned panel of all loaded tickers is emitted
+    once everything has been fetched.
+
+    When a comparison index is given, tickers are emitted relative to the
+    index instead of normalized, and the ComparisonResult of all loaded
+    tickers is emitted with the aligned panel. Tickers that couldn't be
+    loaded are emitted with their FetchError.
+    """
+
+    stock_loaded = Signal(str, object, object)
+    stock_failed = Signal(str, object)
+    panel_ready = Signal(object)
+    comparison_ready = Signal(object)
+    progress = Signal(int, int)
+
+    def __init__(
+        self,
+        sdh,
+        stock_tickers,
+        time_frame,
+        normalization=NormalizationMode.NONE,
+        field="Close",
+        comparison_index=None,
+        end_time=None,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self._sdh = sdh
+        self._stock_tickers = list(stock_tickers)
+        self._time_frame = time_frame
+        self._end_time = end_time
+        self._normalization = normalization
+        self._field = field
+        self._comparison_index = comparison_index
+        self._comparison = None
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """
+        Requests the worker to stop, tickers that haven't been fetched yet are skipped
+        """
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def _prepare(self, panel):
+        # Returns the panel as drawn, relative to the index when comparing
+        if self._comparison is not None:
+            return self._comparison.compare(panel).relative
+        return panel.normalized(self._normalization)
+
+    def run(self):
+        if self._comparison_index is not None:
+            # The index is shared with every other draw comparing to it
+            try:
+                self._comparison = self._sdh.get_index_comparison(
+                    self._comparison_index, self._time_frame, self._end_time, self._field
+                )
+            except Exception as error:
+                self.stock_failed.emit(
+                    self._comparison_index,
+                    FetchError.from_exception(self._comparison_index, error),
+                )
+                return
+
+        total = len(self._stock_tickers)
+        results = self._sdh.iter_many(
+            self._stock_tickers, self._time_frame, end_time=self._end_time
+        )
+
+        stock_frames = {}
+
+        try:
+            for done, result in enumerate(results, start=1):
+                if self.is_cancelled():
+                    return
+
+                if result.ok and self._field in result.data:
+                    stock_frames[result.ticker] = result.data
+                    with span("prepare_stock", "data", ticker=result.ticker):
+                        stock_panel = PricePanel.from_frames(
+                            {result.ticker: result.data}, field=self._field
+                        )
+                        prepared_panel = self._prepare(stock_panel)
+                    self.stock_loaded.emit(result.ticker, prepared_panel, stock_panel)
+                elif result.ok:
+                    self.stock_failed.emit(
+                        result.ticker,
+                        FetchError(result.ticker, FetchError.NO_DATA, f"No '{self._field}' data"),
+                    )
+                else:
+                    self.stock_failed.emit(result.ticker, result.error)
+
+                self.progress.emit(done, total)
+        finally:
+            results.close()
+
+        # Keep the order of selection in the aligned panel
+        stock_frames = {
+            ticker: stock_frames[ticker]
+            for ticker in self._stock_tickers
+            if ticker in stock_frames
+        }
+        with span("align_panel", "data", tickers=len(stock_frames)):
+            panel = PricePanel.from_frames(stock_frames, field=self._field)
+        if self._comparison is not None:
+            with span("compare_to_index", "data", index=self._comparison_index):
+                comparison = self._comparison.compare(panel)
+            self.comparison_ready.emit(comparison)
+            self.panel_ready.emit(comparison.relative)
+            return
+
+        with span("normalize_panel", "data", mode=self._normalization.name):
+            panel = panel.normalized(self._normalization)
+        self.panel_ready.emit(panel)
+
+
+class ExportWorker(QThread):
+    """
+    Fetches the data of the given stock tickers and exports it into a file in
+    a background thread, ticker by ticker.
+
+    Tickers that couldn't be loaded are emitted with their FetchError, the
+    number of exported tickers is emitted once the file is complete. Errors
+    writing the file, or fetching the index exports are relative to, are
+    emitted with export_failed.
+    """
+
+    stock_failed = Signal(str, object)
+    progress = Signal(int, int)
+    exported = Signal(int)
+    export_failed = Signal(str)
+
+    def __init__(
+        self,
+        sdh,
+        stock_tickers,
+        time_frame,
+        output_file,
+        export_format=None,
+        normalization=NormalizationMode.NONE,
+        indicator=None,
+        comparison_index=None,
+        parent=None,
+    ):
+        super().__init__(parent)
+        self._sdh = sdh
+        self._stock_tickers = list(stock_tickers)
+        self._time_frame = time_frame
+        self._comparison_index = comparison_index
+        self._output_file = output_file
+        self._export_format = export_format
+        self._normalization = normalization
+        self._indicator = indicator
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """
+        Requests the worker to stop, the partially written file is removed
+        """
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def run(self):
+        from exporting import export_stock_data
+
+        total = len(self._stock_tickers)
+        exported = 0
+        try:
+            results = export_stock_data(
+                self._sdh,
+                self._stock_tickers,
+                self._time_frame,
+                self._output_file,
+                export_format=self._export_format,
+                normalization=self._normalization,
+                indicator=self._indicator,
+                comparison_index=self._comparison_index,
+            )
+            try:
+                for done, result in enumerate(results, start=1):
+                    if self.is_cancelled():
+                        return
+                    if result.ok:
+                        exported += 1
+                    else:
+                        self.stock_failed.emit(result.ticker, result.error)
+                    self.progress.emit(done, total)
+            finally:
+                results.close()
+        except Exception as error:
+            # Whatever went wrong is reported, the thread would end silently otherwise
+            self.export_failed.emit(str(error))
+            return
+        self.exported.emit(exported)
+
+
+class LiveWorker(QThread):
+    """
+    Polls a live feed for the bars of the drawn stocks that are newer than the
+    last drawn ones, until it's cancelled.
+
+    New bars of a ticker are emitted with their dates, their values as drawn,
+    i.e., normalized the way the drawn values are, and their field values.
+    """
+
+    bars_received = Signal(str, object, object, object)
+    stock_failed = Signal(str, object)
+
+    def __init__(
+        self,
+        feed,
+        last_dates,
+        first_values,
+        interval,
+        normalization=NormalizationMode.NONE,
+        field="Close",
+        parent=None,
+    ):
+        super().__init__(parent)
+        self._feed = feed
+        self._last_dates = dict(last_dates)
+        self._first_values = dict(first_values)
+        self._interval = interval
+        self._normalization = normalization
+        self._field = field
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def run(self):
+        while not self.is_cancelled():
+            for ticker, last_date in self._last_dates.items():
+                if self.is_cancelled():
+                    return
+                try:
+                    with span("live_poll", "network", ticker=ticker):
+                        bars_df = self._feed.poll(ticker, last_date, self._interval)
+                except Exception as error:
+                    self.stock_failed.emit(ticker, FetchError.from_exception(ticker, error))
+                    continue
+                if self._field not in bars_df:
+                    continue
+
+                bars = bars_df[self._field].dropna()
+                if bars.empty:
+                    continue
+                self._last_dates[ticker] = bars.index[-1]
+                price_values = bars.to_numpy(dtype="float64")
+                values = normalize_appended(
+                    price_values, self._first_values[ticker], self._normalization
+                )
+                self.bars_received.emit(ticker, bars.index.values, values, price_values)
+
+            self._cancel_event.wait(self._feed.poll_interval)
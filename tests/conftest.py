@@ -0,0 +1,21 @@
+"""
+Shared setup of the tests, modules of the app and the benchmarks are imported
+flat like the app itself imports them.
+"""
+
+import os
+import sys
+import pathlib
+
+import pytest
+
+ROOT_DIR = pathlib.Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT_DIR / "stock_data_visualizer"), str(ROOT_DIR / "benchmarks")]
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    from PySide2.QtWidgets import QApplication
+
+    return QApplication.instance() or QApplication([])
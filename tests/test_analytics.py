@@ -0,0 +1,20 @@
+import numpy as np
+
+from analytics import IndicatorSeries, SimpleMovingAverage
+
+
+def test_trimmed_series_stays_bounded_and_keeps_computing():
+    series = IndicatorSeries(SimpleMovingAverage(3))
+    trimmed = IndicatorSeries(SimpleMovingAverage(3))
+    dates = np.arange(1000).astype("datetime64[m]")
+    values = np.arange(1000, dtype="float64")
+
+    for start in range(0, 1000, 10):
+        series.append(dates[start : start + 10], values[start : start + 10])
+        trimmed.append(dates[start : start + 10], values[start : start + 10])
+        trimmed.trim(50)
+
+    assert len(trimmed) == 50
+    assert len(trimmed._values) <= 128
+    assert (trimmed.dates == series.dates[-50:]).all()
+    assert (trimmed.values == series.values[-50:]).all()
@@ -0,0 +1,49 @@
+from datetime import datetime
+
+import pandas as pd
+
+from caching import StockDataCache
+
+
+START_TIME = datetime(2024, 1, 1)
+END_TIME = datetime(2024, 1, 31)
+
+
+def create_bars(start="2024-01-01", end="2024-01-31"):
+    dates = pd.bdate_range(start, end, name="Date")
+    return pd.DataFrame({"Close": range(len(dates))}, index=dates, dtype="float64")
+
+
+def test_empty_fetch_of_an_unknown_ticker_is_not_covered(tmp_path):
+    cache = StockDataCache(tmp_path / "cache.sqlite")
+
+    cache.store("TYPO", "yahoo", pd.DataFrame(), START_TIME, END_TIME)
+
+    assert cache.get_coverage("TYPO", "yahoo") is None
+    assert cache.get_missing_ranges("TYPO", "yahoo", START_TIME, END_TIME) == [
+        (START_TIME, END_TIME)
+    ]
+
+
+def test_empty_fetch_extends_an_existing_coverage(tmp_path):
+    cache = StockDataCache(tmp_path / "cache.sqlite")
+    cache.store("AAPL", "yahoo", create_bars(), START_TIME, END_TIME)
+
+    # Nothing was traded before the listing
+    cache.store("AAPL", "yahoo", pd.DataFrame(), datetime(2023, 1, 1), START_TIME)
+
+    assert cache.get_coverage("AAPL", "yahoo") == (datetime(2023, 1, 1), END_TIME)
+
+
+def test_clear_without_source_removes_the_ticker_of_every_source(tmp_path):
+    cache = StockDataCache(tmp_path / "cache.sqlite")
+    for source in ("yahoo", "local"):
+        cache.store("AAPL", source, create_bars(), START_TIME, END_TIME)
+    cache.store("MSFT", "yahoo", create_bars(), START_TIME, END_TIME)
+
+    cache.clear("AAPL")
+
+    for source in ("yahoo", "local"):
+        assert cache.get_coverage("AAPL", source) is None
+        assert cache.read("AAPL", source, START_TIME, END_TIME).empty
+    assert len(cache.read("MSFT", "yahoo", START_TIME, END_TIME)) == 23
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from comparison import IndexComparison
+from panel import PricePanel
+
+
+def create_comparison():
+    rng = np.random.default_rng(3)
+    # The index starts later than the stocks and closes on days they trade
+    dates = pd.bdate_range("2024-01-02", periods=100)
+    dates = dates.delete([10, 11, 40, 75])
+    values = 4000.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, len(dates))))
+    return IndexComparison("^GSPC", dates, values)
+
+
+def create_panel(comparison):
+    rng = np.random.default_rng(4)
+    dates = pd.bdate_range("2023-12-27", periods=110)
+    index_values = pd.Series(comparison.values, index=comparison.dates).reindex(
+        dates, method="ffill"
+    )
+    values = np.empty((len(dates), 2))
+    # Moves twice as much as the index on the days it has a value for
+    values[:, 0] = 3.0 * index_values.to_numpy() ** 2
+    values[:4, 0] = 50.0
+    values[:, 1] = 20.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, len(dates))))
+    values[30:38, 1] = np.nan
+    return PricePanel(dates, ["AAA", "BBB"], values), index_values.to_numpy()
+
+
+def test_comparison_aligns_the_index_to_the_stock_dates():
+    comparison = create_comparison()
+    panel, index_values = create_panel(comparison)
+
+    result = comparison.compare(panel)
+
+    for column, ticker in enumerate(panel.tickers):
+        values = panel.values[:, column]
+        valid = ~np.isnan(values) & ~np.isnan(index_values)
+        first = np.flatnonzero(valid)[0]
+        last = np.flatnonzero(valid)[-1]
+        expected = 100.0 * (values / values[first]) / (index_values / index_values[first])
+        np.testing.assert_allclose(
+            result.relative.column(ticker), np.where(valid, expected, np.nan)
+        )
+        assert result.returns[column] == pytest.approx(values[last] / values[first] - 1.0)
+        assert result.index_returns[column] == pytest.approx(
+            index_values[last] / index_values[first] - 1.0
+        )
+
+        returns = np.diff(np.log(values[valid]))
+        index_returns = np.diff(np.log(index_values[valid]))
+        expected_beta = np.cov(returns, index_returns)[0, 1] / np.var(index_returns, ddof=1)
+        assert result.betas[column] == pytest.approx(expected_beta)
+    assert result.betas[0] == pytest.approx(2.0)
+
+
+def test_index_values_before_its_first_date_are_missing():
+    comparison = create_comparison()
+
+    aligned = comparison.align(pd.to_datetime(["2023-12-29", "2024-01-02", "2024-01-13"]))
+
+    assert np.isnan(aligned[0])
+    assert aligned[1] == comparison.values[0]
+    # A Saturday takes the Friday value
+    assert aligned[2] == comparison.values[8]
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+from correlation import CorrelationMatrix, log_returns
+
+
+def create_prices(seed, start, periods, gaps=()):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start, periods=periods).values
+    values = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, periods)))
+    for gap in gaps:
+        values[gap] = np.nan
+    return dates, values
+
+
+def expected_frame(stock_prices, tickers):
+    columns = {}
+    for ticker in tickers:
+        dates, returns = log_returns(*stock_prices[ticker])
+        columns[ticker] = pd.Series(returns, index=dates)
+    return pd.DataFrame(columns)
+
+
+def test_updated_matrix_matches_pairwise_complete_pandas():
+    # Different calendars, gaps and a stock sharing too few dates with the first
+    stock_prices = {
+        "AAA": create_prices(1, "2024-01-01", 120),
+        "BBB": create_prices(2, "2024-02-01", 100, gaps=[slice(10, 25)]),
+        "CCC": create_prices(3, "2024-01-15", 80),
+        "DDD": create_prices(4, "2024-06-03", 60),
+        "EEE": create_prices(5, "2024-01-01", 150, gaps=[slice(40, 45)]),
+    }
+    matrix = CorrelationMatrix(block_size=2)
+
+    matrix.add("AAA", *stock_prices["AAA"])
+    matrix.add_many({ticker: stock_prices[ticker] for ticker in ["BBB", "CCC", "DDD"]})
+    matrix.remove("BBB")
+    matrix.add("EEE", *stock_prices["EEE"])
+    stock_prices["BBB"] = create_prices(6, "2024-02-01", 100, gaps=[slice(10, 25)])
+    matrix.add("BBB", *stock_prices["BBB"])
+
+    assert matrix.tickers == ["AAA", "CCC", "DDD", "EEE", "BBB"]
+    returns_df = expected_frame(stock_prices, matrix.tickers)
+    expected_correlations = returns_df.corr(min_periods=matrix.min_paired_returns).to_numpy()
+    expected_covariances = returns_df.cov(min_periods=matrix.min_paired_returns).to_numpy()
+    assert np.isnan(expected_correlations[0, 2])
+    np.testing.assert_allclose(matrix.correlations(), expected_correlations, atol=1e-9)
+    np.testing.assert_allclose(matrix.covariances(), expected_covariances, atol=1e-12)
+
+
+def test_removing_every_stock_leaves_an_empty_matrix():
+    matrix = CorrelationMatrix()
+    matrix.add_many({"AAA": create_prices(1, "2024-01-01", 50)})
+
+    matrix.remove_many(["AAA"])
+
+    assert len(matrix) == 0
+    assert matrix.correlations().shape == (0, 0)
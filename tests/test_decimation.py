@@ -0,0 +1,48 @@
+import numpy as np
+
+from decimation import lttb_indices, minmax_indices
+
+
+def create_series(length=10_000):
+    rng = np.random.default_rng(5)
+    y = np.cumsum(rng.normal(0.0, 1.0, length))
+    y[100:250] = np.nan
+    return y
+
+
+def test_minmax_keeps_the_extremes_of_every_bucket_and_the_endpoints():
+    y = create_series()
+    buckets = 37
+
+    indices = minmax_indices(y, buckets)
+
+    assert (np.diff(indices) > 0).all()
+    assert indices[0] == 0 and indices[-1] == len(y) - 1
+    assert len(indices) <= 2 * buckets + 2
+    bucket_size = -(-len(y) // buckets)
+    for start in range(0, len(y), bucket_size):
+        bucket = y[start : start + bucket_size]
+        kept = y[indices[(indices >= start) & (indices < start + bucket_size)]]
+        assert np.nanmin(bucket) in kept
+        assert np.nanmax(bucket) in kept
+
+
+def test_short_series_are_kept_whole():
+    assert (minmax_indices(np.arange(10.0), 5) == np.arange(10)).all()
+    assert (lttb_indices(np.arange(10.0), np.arange(10.0), 20) == np.arange(10)).all()
+
+
+def test_lttb_picks_a_point_per_bucket_and_keeps_spikes():
+    y = create_series()
+    y[5000] = 1000.0
+    x = np.arange(len(y), dtype="float64")
+    threshold = 200
+
+    indices = lttb_indices(x, y, threshold)
+
+    assert len(indices) == threshold
+    assert indices[0] == 0 and indices[-1] == len(y) - 1
+    bucket_size = (len(y) - 2) / (threshold - 2)
+    for n, index in enumerate(indices[1:-1]):
+        assert int(n * bucket_size) + 1 <= index < int((n + 1) * bucket_size) + 1
+    assert 5000 in indices
@@ -0,0 +1,81 @@
+import gzip
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from exporting import export_stock_data
+from handling import FetchScheduler, StockDataHandling
+from normalization import NormalizationMode
+from time_frames import StockTimeFrame
+
+
+END_TIME = datetime(2024, 12, 31)
+TICKERS = ["AAA", "BBB", "CCC"]
+
+
+def read_bars(stock_ticker, start_time, end_time):
+    dates = pd.bdate_range(start_time, end_time, name="Date")
+    return pd.DataFrame({"Close": range(1, len(dates) + 1)}, index=dates, dtype="float64")
+
+
+@pytest.fixture
+def sdh():
+    return StockDataHandling(reader=read_bars, memory_budget=None, scheduler=FetchScheduler())
+
+
+def export(sdh, output_file, **kwargs):
+    results = export_stock_data(
+        sdh, TICKERS, StockTimeFrame.YEAR1, output_file, end_time=END_TIME, **kwargs
+    )
+    return list(results)
+
+
+def test_parquet_export_has_a_row_per_ticker_and_date(sdh, tmp_path):
+    output_file = tmp_path / "stocks.parquet"
+
+    results = export(sdh, output_file, normalization=NormalizationMode.REBASED, indicator="SMA 50")
+
+    assert all(result.ok for result in results)
+    export_df = pd.read_parquet(output_file)
+    assert sorted(export_df["Ticker"].unique()) == TICKERS
+    assert len(export_df) == 3 * len(read_bars("AAA", datetime(2023, 12, 31), END_TIME))
+    assert export_df.groupby("Ticker")["Normalized"].first().eq(100.0).all()
+    assert "SMA 50" in export_df
+
+
+def test_csv_export_is_gzipped(sdh, tmp_path):
+    export(sdh, tmp_path / "stocks.csv")
+
+    with gzip.open(tmp_path / "stocks.csv.gz", "rt") as file:
+        assert file.readline().startswith("Date,Ticker,Open")
+    assert not (tmp_path / "stocks.csv").exists()
+
+
+def test_closed_export_leaves_no_file(sdh, tmp_path):
+    results = export_stock_data(
+        sdh, TICKERS, StockTimeFrame.YEAR1, tmp_path / "stocks.arrow", end_time=END_TIME
+    )
+    next(results)
+    results.close()
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_relative_export_compares_to_the_index(sdh, tmp_path):
+    output_file = tmp_path / "stocks.parquet"
+
+    results = export(
+        sdh, output_file, normalization=NormalizationMode.RELATIVE, comparison_index="^GSPC"
+    )
+
+    assert all(result.ok for result in results)
+    export_df = pd.read_parquet(output_file)
+    # The index moves like every ticker, so every ticker stays at 100
+    assert export_df["Normalized"].to_numpy() == pytest.approx(100.0)
+
+
+def test_relative_export_needs_an_index(sdh, tmp_path):
+    with pytest.raises(ValueError):
+        export(sdh, tmp_path / "stocks.parquet", normalization=NormalizationMode.RELATIVE)
+    assert not list(tmp_path.iterdir())
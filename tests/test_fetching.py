@@ -0,0 +1,94 @@
+import threading
+from datetime import datetime
+
+import pytest
+
+from stub_server import StubChartServer
+from synthetic import synthetic_tickers
+
+from handling import FetchError, FetchScheduler, StockDataHandling
+from providers import YahooProvider
+from time_frames import StockTimeFrame
+
+
+END_TIME = datetime(2024, 12, 31, 16)
+
+
+def create_data_handling(server, scheduler):
+    return StockDataHandling(
+        provider=YahooProvider(chart_url=server.chart_url),
+        memory_budget=None,
+        scheduler=scheduler,
+    )
+
+
+def get_many(sdh, tickers):
+    return sdh.get_many(tickers, StockTimeFrame.WEEK, end_time=END_TIME)
+
+
+def test_concurrent_draws_coalesce_into_one_request_per_ticker():
+    tickers = synthetic_tickers(4)
+    with StubChartServer(latency=0.3) as server:
+        sdh = create_data_handling(server, FetchScheduler(max_attempts=1))
+        barrier = threading.Barrier(4)
+        draws = []
+
+        def draw():
+            barrier.wait()
+            draws.append(get_many(sdh, tickers))
+
+        threads = [threading.Thread(target=draw) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len(draws) == 4
+    assert all(result.ok for results in draws for result in results.values())
+    assert server.counters["requests"] == len(tickers)
+
+
+def test_throttled_requests_are_retried_until_they_pass():
+    tickers = synthetic_tickers(8)
+    scheduler = FetchScheduler(max_attempts=20, base_delay=0.05, max_delay=0.5)
+    with StubChartServer(rate=4, retry_after=0.2) as server:
+        results = get_many(create_data_handling(server, scheduler), tickers)
+
+    assert server.counters["throttled"] > 0
+    assert all(result.ok for result in results.values())
+    assert server.counters["answered"] == len(tickers)
+
+
+def test_throttled_requests_fail_once_retries_run_out():
+    tickers = synthetic_tickers(3)
+    scheduler = FetchScheduler(max_attempts=2, base_delay=0.01, max_delay=0.01)
+    # A rate of nothing throttles every request
+    with StubChartServer(rate=0, retry_after=0) as server:
+        results = get_many(create_data_handling(server, scheduler), tickers)
+
+    for ticker in tickers:
+        error = results[ticker].error
+        assert isinstance(error, FetchError)
+        assert error.kind == FetchError.THROTTLED
+        assert error.status == 429
+        assert error.attempts == 2
+    assert server.counters["requests"] == 2 * len(tickers)
+
+
+@pytest.mark.parametrize(
+    "attempt, retry_after, delay", [(1, None, 0.5), (3, None, 2.0), (6, None, 8.0), (1, 3.0, 3.0)]
+)
+def test_retry_delay_backs_off_and_honours_retry_after(attempt, retry_after, delay):
+    scheduler = FetchScheduler(base_delay=0.5, max_delay=8.0, jitter=lambda: 1.0)
+
+    assert scheduler.get_delay(attempt, retry_after) == delay
+
+
+def test_unknown_ticker_is_raised_as_not_found():
+    with StubChartServer() as server:
+        sdh = create_data_handling(server, FetchScheduler(max_attempts=1))
+        with pytest.raises(FetchError) as raised:
+            sdh.get_yahoo_stock("UNKNOWN", StockTimeFrame.WEEK)
+
+    assert raised.value.kind == FetchError.NOT_FOUND
+    assert raised.value.status == 404
@@ -0,0 +1,61 @@
+import time
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from handling import FetchScheduler, StockDataHandling
+from time_frames import StockTimeFrame
+
+
+END_TIME = datetime(2024, 12, 31)
+LATENCY = 0.2
+
+
+class SlowReader:
+    """
+    Reader taking LATENCY seconds for every ticker, counting its reads
+    """
+
+    def __init__(self):
+        self.reads = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, stock_ticker, start_time, end_time):
+        with self._lock:
+            self.reads += 1
+        time.sleep(LATENCY)
+        dates = pd.date_range(start_time, end_time, freq="B", name="Date")
+        return pd.DataFrame({"Close": range(len(dates))}, index=dates, dtype="float64")
+
+
+def create_data_handling(reader):
+    return StockDataHandling(reader=reader, memory_budget=None, scheduler=FetchScheduler())
+
+
+def test_get_many_fetches_concurrently():
+    tickers = [f"T{n}" for n in range(8)]
+    sdh = create_data_handling(SlowReader())
+
+    start = time.perf_counter()
+    results = sdh.get_many(tickers, StockTimeFrame.YEAR1, max_workers=8, end_time=END_TIME)
+    seconds = time.perf_counter() - start
+
+    assert list(results) == tickers
+    assert all(result.ok and len(result.data) for result in results.values())
+    assert seconds < len(tickers) * LATENCY / 2
+
+
+def test_closing_iter_many_cancels_pending_fetches():
+    reader = SlowReader()
+    sdh = create_data_handling(reader)
+
+    results = sdh.iter_many(
+        [f"T{n}" for n in range(32)], StockTimeFrame.YEAR1, max_workers=2, end_time=END_TIME
+    )
+    assert next(results).ok
+    results.close()
+    # Reads that had started when the iterator was closed still finish
+    time.sleep(3 * LATENCY)
+
+    assert reader.reads <= 4
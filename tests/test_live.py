@@ -0,0 +1,39 @@
+from datetime import datetime
+
+import pandas as pd
+
+from live import ReplayFeed
+from providers import LocalFileProvider
+
+
+class FakeClock:
+    def __init__(self):
+        self.seconds = 0.0
+
+    def __call__(self):
+        return self.seconds
+
+
+def record_bars(directory, stock_ticker):
+    dates = pd.date_range("2024-12-30 09:30", periods=30, freq="1min", name="Date")
+    bars_df = pd.DataFrame({"Close": range(len(dates))}, index=dates, dtype="float64")
+    bars_df.to_csv(directory / f"{stock_ticker}.csv")
+    return bars_df
+
+
+def test_replay_returns_the_bars_newer_than_the_last_date(tmp_path):
+    bars_df = record_bars(tmp_path, "AAPL")
+    clock = FakeClock()
+    feed = ReplayFeed(LocalFileProvider(tmp_path), datetime(2024, 12, 30, 9, 40), clock=clock)
+
+    last_date = pd.Timestamp("2024-12-30 09:35")
+    polled_df = feed.poll("AAPL", last_date, "1m")
+    assert list(polled_df.index) == list(bars_df.loc["2024-12-30 09:36":"2024-12-30 09:40"].index)
+
+    # Five minutes of the replay later only the bars since the last poll come back
+    clock.seconds = 300.0
+    polled_df = feed.poll("AAPL", polled_df.index[-1], "1m")
+    assert list(polled_df.index) == list(bars_df.loc["2024-12-30 09:41":"2024-12-30 09:45"].index)
+    assert (polled_df["Close"].to_numpy() == range(11, 16)).all()
+
+    assert feed.poll("AAPL", polled_df.index[-1], "1m").empty
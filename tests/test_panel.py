@@ -0,0 +1,112 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from handling import FetchScheduler, StockDataHandling
+from normalization import NormalizationMode
+from panel import PricePanel
+from time_frames import CustomTimeFrame, StockTimeFrame
+
+
+END_TIME = datetime(2024, 12, 31, 16)
+
+
+def read_bars(stock_ticker, start_time, end_time):
+    dates = pd.bdate_range(start_time.date(), end_time, name="Date")
+    return pd.DataFrame({"Close": np.arange(len(dates)) + 1.0}, index=dates)
+
+
+def fetch_panel(sdh, time_frame):
+    results = sdh.get_many(["AAA", "BBB"], time_frame, end_time=END_TIME)
+    return PricePanel.from_frames({ticker: result.data for ticker, result in results.items()})
+
+
+def test_between_includes_whole_days_as_a_view():
+    dates = pd.date_range("2024-01-01 09:30", periods=20, freq="6h")
+    panel = PricePanel(dates, ["AAA"], np.arange(20.0)[:, None])
+
+    sliced = panel.between(datetime(2024, 1, 2, 12), datetime(2024, 1, 4, 9, 30))
+
+    assert sliced.dates[0] == pd.Timestamp("2024-01-02 03:30")
+    assert sliced.dates[-1] == pd.Timestamp("2024-01-04 09:30")
+    assert np.shares_memory(sliced.values, panel.values)
+
+
+@pytest.mark.parametrize(
+    "time_frame",
+    [
+        StockTimeFrame.YEAR1,
+        StockTimeFrame.YTD,
+        CustomTimeFrame(datetime(2023, 3, 15), datetime(2024, 2, 29)),
+    ],
+)
+def test_time_frames_within_loaded_history_slice_like_a_fetch(time_frame):
+    sdh = StockDataHandling(reader=read_bars, memory_budget=None, scheduler=FetchScheduler())
+    loaded_start, loaded_end = sdh.convert_time_frame_to_datetime(StockTimeFrame.YEAR3, END_TIME)
+    loaded = fetch_panel(sdh, StockTimeFrame.YEAR3)
+
+    assert sdh.is_within(time_frame, loaded_start, loaded_end, END_TIME)
+    frame_start, frame_end = sdh.convert_time_frame_to_datetime(time_frame, END_TIME)
+    sliced = loaded.between(frame_start, frame_end)
+    fetched = fetch_panel(sdh, time_frame)
+    assert sliced.dates.equals(fetched.dates)
+    # The fetched bars count from the start of the time frame
+    assert (sliced.values - sliced.values[0] == fetched.values - fetched.values[0]).all()
+
+
+def test_time_frames_reaching_outside_loaded_history_are_fetched():
+    sdh = StockDataHandling(reader=read_bars, memory_budget=None, scheduler=FetchScheduler())
+    loaded_start, loaded_end = sdh.convert_time_frame_to_datetime(StockTimeFrame.YEAR1, END_TIME)
+
+    assert not sdh.is_within(StockTimeFrame.YEAR3, loaded_start, loaded_end, END_TIME)
+    assert not sdh.is_within(
+        CustomTimeFrame(datetime(2024, 6, 1), datetime(2025, 1, 31)),
+        loaded_start,
+        loaded_end,
+        END_TIME,
+    )
+
+
+def create_frames():
+    # Tickers on different calendars, one listed later
+    return {
+        "AAA": pd.DataFrame(
+            {"Close": [10.0, 11.0, 12.0, 9.0]},
+            index=pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-03", "2024-01-05"]),
+        ),
+        "BBB": pd.DataFrame(
+            {"Close": [50.0, 40.0, 45.0]},
+            index=pd.to_datetime(["2024-01-03", "2024-01-04", "2024-01-05"]),
+        ),
+    }
+
+
+def test_from_frames_aligns_tickers_on_the_union_of_dates():
+    panel = PricePanel.from_frames(create_frames())
+
+    assert panel.tickers == ["AAA", "BBB"]
+    assert list(panel.dates.day) == [1, 2, 3, 4, 5]
+    np.testing.assert_array_equal(panel.column("AAA"), [10.0, 11.0, 12.0, np.nan, 9.0])
+    np.testing.assert_array_equal(panel.column("BBB"), [np.nan, np.nan, 50.0, 40.0, 45.0])
+
+
+@pytest.mark.parametrize(
+    "mode, normalize",
+    [
+        (NormalizationMode.ZSCORE, lambda column: (column - column.mean()) / column.std()),
+        (NormalizationMode.REBASED, lambda column: 100.0 * column / column.iloc[0]),
+        (NormalizationMode.LOG_RETURNS, lambda column: np.log(column / column.iloc[0])),
+    ],
+)
+def test_normalized_panel_matches_normalizing_every_ticker(mode, normalize):
+    stock_frames = create_frames()
+    panel = PricePanel.from_frames(stock_frames)
+
+    normalized = panel.normalized(mode)
+
+    for ticker, stock_df in stock_frames.items():
+        dates, values = normalized.valid_column(ticker)
+        assert dates.equals(stock_df.index)
+        np.testing.assert_allclose(values, normalize(stock_df["Close"]).to_numpy())
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from panel import PricePanel
+from profit import analyze_profit, forward_fill
+
+
+def create_panel():
+    rng = np.random.default_rng(7)
+    dates = pd.bdate_range("2024-01-01", periods=120)
+    values = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.02, (len(dates), 4)), axis=0))
+    # Tickers listed later and with gaps
+    values[:30, 1] = np.nan
+    values[50:60, 2] = np.nan
+    return PricePanel(dates, ["AAA", "BBB", "CCC", "DDD"], values)
+
+
+def scan_windows(values):
+    # Profits of buying on every row and selling on every later or the same row
+    valid = np.flatnonzero(~np.isnan(values))
+    profits = {
+        (buy, sell): values[sell] / values[buy] - 1.0
+        for buy in valid
+        for sell in valid
+        if buy <= sell
+    }
+    best = max(profits, key=profits.get)
+    worst = min(profits, key=profits.get)
+    return (best, profits[best]), (worst, profits[worst])
+
+
+def test_trade_windows_match_a_brute_force_scan():
+    panel = create_panel()
+
+    analysis = analyze_profit(panel)
+
+    filled = forward_fill(panel.values)
+    for column, ticker in enumerate(panel.tickers):
+        (best_rows, best_profit), (worst_rows, worst_profit) = scan_windows(filled[:, column])
+        assert analysis.best.profits[column] == pytest.approx(best_profit)
+        assert analysis.worst.profits[column] == pytest.approx(worst_profit)
+        assert (analysis.best.buy_rows[column], analysis.best.sell_rows[column]) == best_rows
+        assert (analysis.worst.buy_rows[column], analysis.worst.sell_rows[column]) == worst_rows
+        buy_date, sell_date, _ = analysis.best_window(ticker)
+        assert buy_date == panel.dates[best_rows[0]] and sell_date == panel.dates[best_rows[1]]
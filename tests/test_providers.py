@@ -0,0 +1,44 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from providers import read_csv_range
+
+
+@pytest.mark.parametrize("separator", [" ", "T"])
+def test_csv_range_includes_the_intraday_bars_of_the_end_date(tmp_path, separator):
+    dates = pd.date_range("2024-01-04 09:30", "2024-01-05 16:00", freq="30min")
+    path = tmp_path / "AAPL.csv"
+    path.write_text(
+        "Date,Close\n"
+        + "".join(
+            f"{date.strftime(f'%Y-%m-%d{separator}%H:%M:%S')},{n}\n"
+            for n, date in enumerate(dates)
+        )
+    )
+
+    data_df = read_csv_range(path, datetime(2024, 1, 5), datetime(2024, 1, 5, 15, 30))
+
+    expected = dates[(dates >= "2024-01-05") & (dates <= "2024-01-05 15:30")]
+    assert list(data_df.index) == list(expected)
+
+
+def test_csv_range_of_daily_bars_includes_both_ends(tmp_path):
+    dates = pd.bdate_range("2024-01-01", "2024-01-31", name="Date")
+    path = tmp_path / "AAPL.csv"
+    pd.DataFrame({"Close": range(len(dates))}, index=dates).to_csv(path)
+
+    data_df = read_csv_range(path, datetime(2024, 1, 8), datetime(2024, 1, 12))
+
+    assert list(data_df.index) == list(pd.bdate_range("2024-01-08", "2024-01-12"))
+
+
+def test_csv_range_can_be_open_ended(tmp_path):
+    dates = pd.bdate_range("2024-01-01", "2024-01-31", name="Date")
+    path = tmp_path / "AAPL.csv"
+    pd.DataFrame({"Close": range(len(dates))}, index=dates).to_csv(path)
+
+    data_df = read_csv_range(path, datetime(2024, 1, 29), pd.Timestamp.max)
+
+    assert list(data_df.index) == list(dates[-3:])
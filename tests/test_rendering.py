@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from panel import PricePanel
+from rendering import RENDER_FORMATS, ChartJob, render_chart, render_chart_rgba
+from render_server import RenderBuffer, RenderServer
+from styling import FIGURE_FACECOLOR
+
+
+def create_panel():
+    dates = pd.bdate_range("2024-01-01", "2024-12-31")
+    values = 100.0 + np.cumsum(np.random.default_rng(0).normal(size=(len(dates), 3)), axis=0)
+    return PricePanel(dates, ["AAA", "BBB", "CCC"], values)
+
+
+@pytest.mark.parametrize("output_format", RENDER_FORMATS)
+def test_renders_of_the_same_job_are_identical(tmp_path, output_format):
+    panel = create_panel()
+    first_file = tmp_path / f"first.{output_format}"
+    second_file = tmp_path / f"second.{output_format}"
+
+    render_chart(ChartJob(first_file, "Watchlist", panel, indicator="SMA 50"))
+    render_chart(ChartJob(second_file, "Watchlist", panel, indicator="SMA 50"))
+
+    assert first_file.read_bytes() == second_file.read_bytes()
+
+
+def render_pixels(job, width, height):
+    buffer = RenderBuffer(width, height)
+    try:
+        assert render_chart_rgba(job, buffer.name, width, height) == (width, height)
+        return np.frombuffer(buffer.memory, dtype=np.uint8).reshape(height, width, 4).copy()
+    finally:
+        buffer.close()
+
+
+def test_chart_is_rendered_into_shared_memory_pixels():
+    job = ChartJob(None, "Watchlist", create_panel(), indicator="SMA 50")
+
+    pixels = render_pixels(job, 320, 240)
+
+    facecolor = [int(FIGURE_FACECOLOR[n : n + 2], 16) for n in (1, 3, 5)] + [255]
+    assert (pixels[0, 0] == facecolor).all() and (pixels[-1, -1] == facecolor).all()
+    # The lines of the stocks are drawn in other colors than the background
+    assert len(np.unique(pixels.reshape(-1, 4), axis=0)) > 10
+    assert (pixels == render_pixels(job, 320, 240)).all()
+
+
+def test_render_server_renders_in_worker_processes():
+    job = ChartJob(None, "Watchlist", create_panel())
+    server = RenderServer(max_workers=1)
+    try:
+        buffer = server.create_buffer(320, 240)
+        server.render(job, buffer).result(timeout=60)
+        pixels = np.frombuffer(buffer.memory, dtype=np.uint8).reshape(240, 320, 4).copy()
+    finally:
+        server.shutdown()
+
+    assert (pixels == render_pixels(job, 320, 240)).all()
@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from panel import PricePanel
+from session import (
+    SESSION_VALUES_FILE,
+    read_session_history,
+    read_session_options,
+    save_session,
+)
+
+
+START_TIME = datetime(2024, 1, 1)
+END_TIME = datetime(2024, 12, 31, 16, 30)
+OPTIONS = {"time_frame": "1 Year", "normalization": "Rebased", "stocks": ["AAA", "BBB"]}
+
+
+def create_price_panels():
+    dates = pd.bdate_range(START_TIME, END_TIME)
+    values = np.arange(len(dates), dtype="float64")
+    # Tickers on different calendars are aligned once they're saved
+    return {
+        "AAA": PricePanel(dates, ["AAA"], values[:, None]),
+        "BBB": PricePanel(dates[10:], ["BBB"], 2.0 * values[10:, None]),
+    }
+
+
+def test_saved_session_is_read_back(tmp_path):
+    price_panels = create_price_panels()
+
+    save_session(tmp_path, OPTIONS, (START_TIME, END_TIME, price_panels))
+
+    assert read_session_options(tmp_path) == OPTIONS
+    start_time, end_time, read_panels = read_session_history(tmp_path)
+    assert (start_time, end_time) == (START_TIME, END_TIME)
+    assert list(read_panels) == ["AAA", "BBB"]
+    for ticker, price_panel in price_panels.items():
+        dates, values = read_panels[ticker].valid_column(ticker)
+        assert dates.equals(price_panel.dates)
+        assert (values == price_panel.column(ticker)).all()
+
+
+def test_session_without_history_or_with_broken_files_has_no_history(tmp_path):
+    assert read_session_options(tmp_path) is None
+
+    save_session(tmp_path, OPTIONS)
+    assert read_session_options(tmp_path) == OPTIONS
+    assert read_session_history(tmp_path) is None
+
+    save_session(tmp_path, OPTIONS, (START_TIME, END_TIME, create_price_panels()))
+    (tmp_path / SESSION_VALUES_FILE).write_bytes(b"broken")
+    assert read_session_history(tmp_path) is None
@@ -0,0 +1,24 @@
+from PySide2.QtCore import Qt
+
+from stock_list import StockListModel
+
+
+def test_rows_are_enabled_and_checkable(qapp):
+    model = StockListModel()
+    model.extend(["AAPL", "MSFT"])
+
+    flags = int(model.flags(model.index(1)))
+
+    assert flags & int(Qt.ItemIsEnabled)
+    assert flags & int(Qt.ItemIsSelectable)
+    assert flags & int(Qt.ItemIsUserCheckable)
+
+
+def test_check_state_toggles(qapp):
+    model = StockListModel()
+    model.extend(["AAPL"])
+    index = model.index(0)
+
+    assert model.setData(index, Qt.Unchecked, Qt.CheckStateRole)
+
+    assert model.data(index, Qt.CheckStateRole) == Qt.Unchecked
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from store import SeriesStore
+
+
+START_TIME = datetime(2024, 1, 1)
+END_TIME = datetime(2024, 6, 30)
+
+
+def create_bars(start_time=START_TIME, end_time=END_TIME, close=1.0):
+    dates = pd.bdate_range(start_time, end_time, name="Date")
+    return pd.DataFrame(
+        {"Close": np.full(len(dates), close), "Volume": np.full(len(dates), 1000.0)},
+        index=dates,
+    )
+
+
+def test_least_recently_used_series_are_evicted_over_budget():
+    store = SeriesStore()
+    store.put("AAA", "yahoo", create_bars(), START_TIME, END_TIME)
+    series_bytes = store.nbytes
+    store.budget = int(2.5 * series_bytes)
+
+    store.put("BBB", "yahoo", create_bars(), START_TIME, END_TIME)
+    assert store.get("AAA", "yahoo", START_TIME, END_TIME) is not None
+    store.put("CCC", "yahoo", create_bars(), START_TIME, END_TIME)
+
+    assert ("yahoo", "BBB") not in store
+    assert ("yahoo", "AAA") in store and ("yahoo", "CCC") in store
+    assert store.get("BBB", "yahoo", START_TIME, END_TIME) is None
+    assert store.nbytes == 2 * series_bytes <= store.budget
+
+
+def test_overlapping_ranges_are_merged_with_the_newer_bars():
+    store = SeriesStore()
+    later_start, later_end = datetime(2024, 4, 1), datetime(2024, 9, 30)
+
+    store.put("AAA", "yahoo", create_bars(close=1.0), START_TIME, END_TIME)
+    store.put("AAA", "yahoo", create_bars(later_start, later_end, 2.0), later_start, later_end)
+
+    stock_data_df = store.get("AAA", "yahoo", START_TIME, later_end)
+    assert stock_data_df is not None
+    assert len(store) == 1
+    assert stock_data_df.index.equals(pd.bdate_range(START_TIME, later_end, name="Date"))
+    later = stock_data_df.index >= later_start
+    assert (stock_data_df["Close"][~later] == 1.0).all()
+    assert (stock_data_df["Close"][later] == 2.0).all()
+    assert stock_data_df["Volume"].dtype == np.int64
+    assert store.nbytes == stock_data_df.memory_usage(index=True).sum()
@@ -0,0 +1,36 @@
+import numpy as np
+
+from symbols import SymbolIndex
+
+
+def create_index(tmp_path):
+    (tmp_path / "symbols.txt").write_text("Symbol\nAAPL\nAMZN\nMSFT\n")
+    (tmp_path / "nasdaqlisted.txt").write_text(
+        "Symbol|Security Name\nAA|Alcoa\nAAL|American Airlines\nBRK.B|Berkshire\n"
+        "File Creation Time: 0101202400:00|\n"
+    )
+    index_file = tmp_path / "symbols.npy"
+    SymbolIndex(index_file).build([tmp_path / "symbols.txt", tmp_path / "nasdaqlisted.txt"])
+    # A fresh index maps the saved file instead of keeping the built array
+    return SymbolIndex(index_file)
+
+
+def test_saved_index_is_memory_mapped_and_looked_up(tmp_path):
+    index = create_index(tmp_path)
+
+    assert len(index) == 6
+    assert isinstance(index._get_symbols(), np.memmap)
+    assert "aapl" in index and "BRK.B" in index
+    assert "AAP" not in index and "ZZZZ" not in index
+    assert "AAPLAAPLAAPL" not in index
+
+
+def test_index_completes_prefixes_in_sorted_order(tmp_path):
+    index = create_index(tmp_path)
+
+    assert index.complete("a") == ["AA", "AAL", "AAPL", "AMZN"]
+    assert index.complete("AA", limit=2) == ["AA", "AAL"]
+    assert index.complete("BRK.B") == ["BRK.B"]
+    assert index.complete("Z") == []
+    assert index.complete("") == []
+    assert index.suggest("MSFY") == ["MSFT"]